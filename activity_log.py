@@ -0,0 +1,366 @@
+"""
+Activity Log - Segmented append-only log of activity tracker records
+
+Each process writes its own segment files in the log directory and never
+touches another process's segments, so several workers can share one
+directory without locking; readers merge all segments by timestamp.
+
+    <created_ns>-<pid>.seg    records, appended back to back
+    <created_ns>-<pid>.idx    sparse time index of that segment
+
+A record is a length-prefixed binary frame:
+
+    uint32 length | uint32 crc32 | float64 timestamp | JSON [kind, username, data]
+
+where length and crc32 cover the timestamp and the JSON. Readers stop at the
+first frame that is incomplete or fails its checksum, which is where a
+writer crashed or is still appending.
+
+Every index_interval bytes the writer adds (max timestamp so far, offset) to
+the segment's index, and when a segment reaches segment_bytes it appends a
+final entry at the end of the segment and starts a new one. A read since a
+given time skips sealed segments that end before it and seeks the others
+past every record known to be older, so "last N days" reads touch only the
+tail of the log.
+
+Records are written to the OS right away (other processes see them at
+once); fsync runs on a background timer every fsync_interval seconds, so a
+power loss costs at most that much activity.
+"""
+
+import os
+import time
+import zlib
+import json
+import heapq
+import struct
+import atexit
+import threading
+from typing import Any, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+_HEADER = struct.Struct('<II')
+_TIME = struct.Struct('<d')
+_INDEX_ENTRY = struct.Struct('<dQ')
+
+SEGMENT_SUFFIX = '.seg'
+INDEX_SUFFIX = '.idx'
+
+# Frames claiming more than this are treated as corruption
+MAX_RECORD_BYTES = 16 * 1024 * 1024
+
+# Bytes read from a segment at a time; a merged read holds one such buffer per segment
+READ_CHUNK_BYTES = 256 * 1024
+
+
+class LogRecord(NamedTuple):
+    timestamp: float
+    kind: str
+    username: str
+    data: Any
+
+
+def _jsonable(value: Any) -> Any:
+    """json.dumps fallback for numpy scalars and other stray types in activity details"""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def encode_record(timestamp: float, kind: str, username: str, data: Any) -> bytes:
+    body = _TIME.pack(timestamp) + json.dumps([kind, username, data], separators=(',', ':'),
+                                              default=_jsonable).encode('utf-8')
+    return _HEADER.pack(len(body), zlib.crc32(body)) + body
+
+
+def decode_records(buffer: bytes, offset: int = 0) -> Iterator[Tuple[int, LogRecord]]:
+    """
+    Records framed in buffer from offset on
+
+    Yields:
+        (offset just past the record, record), up to the first incomplete
+        or corrupt frame
+    """
+    end = len(buffer)
+    view = memoryview(buffer)
+    while offset + _HEADER.size <= end:
+        length, crc = _HEADER.unpack_from(buffer, offset)
+        start = offset + _HEADER.size
+        if length < _TIME.size or length > MAX_RECORD_BYTES or start + length > end:
+            return
+        body = view[start:start + length]
+        if zlib.crc32(body) != crc:
+            return
+        try:
+            kind, username, data = json.loads(bytes(body[_TIME.size:]))
+        except ValueError:
+            return
+        offset = start + length
+        yield offset, LogRecord(_TIME.unpack_from(body)[0], kind, username, data)
+
+
+class Segment:
+    """One segment file and its sparse time index"""
+
+    __slots__ = ('path', 'index_path', 'entries')
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+        self.entries: List[Tuple[float, int]] = []
+
+    def load_index(self) -> None:
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b''
+        usable = len(data) - len(data) % _INDEX_ENTRY.size
+        self.entries = list(_INDEX_ENTRY.iter_unpack(data[:usable]))
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def end_time(self) -> Optional[float]:
+        """Newest timestamp in a sealed segment, None while it may still grow"""
+        if self.entries and self.entries[-1][1] == self.size():
+            return self.entries[-1][0]
+        return None
+
+    def start_offset(self, since: Optional[float]) -> int:
+        """Offset before which every record is older than since"""
+        offset = 0
+        if since is not None:
+            for max_time, entry_offset in self.entries:
+                if max_time >= since:
+                    break
+                offset = entry_offset
+        return offset
+
+    def read(self, since: Optional[float] = None, username: Optional[str] = None,
+             kinds: Optional[Sequence[str]] = None) -> Iterator[LogRecord]:
+        for record in self._records(self.start_offset(since)):
+            if since is not None and record.timestamp < since:
+                continue
+            if username is not None and record.username != username:
+                continue
+            if kinds is not None and record.kind not in kinds:
+                continue
+            yield record
+
+    def _records(self, offset: int) -> Iterator[LogRecord]:
+        """Records from offset on, read READ_CHUNK_BYTES at a time"""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(offset)
+            buffer = b''
+            while True:
+                chunk = f.read(max(READ_CHUNK_BYTES, self._pending_frame(buffer) - len(buffer)))
+                if not chunk:
+                    return
+                buffer += chunk
+                consumed = 0
+                for consumed, record in decode_records(buffer):
+                    yield record
+                buffer = buffer[consumed:]
+                needed = self._pending_frame(buffer)
+                if needed is None or len(buffer) >= needed:
+                    # A corrupt frame; nothing after it can be trusted
+                    return
+
+    @staticmethod
+    def _pending_frame(buffer: bytes) -> Optional[int]:
+        """Bytes needed to decode the frame at the start of buffer, None if it is corrupt"""
+        if len(buffer) < _HEADER.size:
+            return _HEADER.size
+        length, _ = _HEADER.unpack_from(buffer)
+        if length < _TIME.size or length > MAX_RECORD_BYTES:
+            return None
+        return _HEADER.size + length
+
+
+class ActivityLog:
+    """Append-only activity log in rolling per-process segment files"""
+
+    def __init__(self, directory: str, segment_bytes: int = 16 * 1024 * 1024,
+                 index_interval: int = 64 * 1024, fsync_interval: float = 1.0,
+                 retention_days: Optional[float] = None):
+        """
+        Args:
+            directory: Log directory, created on the first append
+            segment_bytes: Size at which the current segment is sealed and a new one started
+            index_interval: Bytes between sparse index entries
+            fsync_interval: Seconds between background fsyncs; 0 syncs every append
+            retention_days: Sealed segments older than this are deleted when a
+                segment rolls (None keeps everything)
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.index_interval = index_interval
+        self.fsync_interval = fsync_interval
+        self.retention_days = retention_days
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._index_file = None
+        self._segment: Optional[Segment] = None
+        self._size = 0
+        self._indexed_at = 0
+        self._max_time = 0.0
+        self._last_created = 0
+        self._dirty = False
+        self._syncer: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.appended = 0
+        self.syncs = 0
+        atexit.register(self.close)
+
+    def _segment_paths(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directory, name) for name in sorted(names) if name.endswith(SEGMENT_SUFFIX)]
+
+    def segments(self) -> List[Segment]:
+        """All segments in creation order, with their indexes loaded"""
+        segments = []
+        for path in self._segment_paths():
+            segment = Segment(path)
+            segment.load_index()
+            segments.append(segment)
+        return segments
+
+    def _open_segment(self) -> None:
+        """Start a new segment owned by this process; caller holds the lock"""
+        os.makedirs(self.directory, exist_ok=True)
+        created = max(time.time_ns(), self._last_created + 1)
+        self._last_created = created
+        self._segment = Segment(os.path.join(self.directory, f"{created:020d}-{os.getpid()}{SEGMENT_SUFFIX}"))
+        self._file = open(self._segment.path, 'ab')
+        self._index_file = open(self._segment.index_path, 'ab')
+        self._size = 0
+        self._indexed_at = 0
+        self._max_time = 0.0
+
+    def _add_index_entry(self, offset: int) -> None:
+        self._index_file.write(_INDEX_ENTRY.pack(self._max_time, offset))
+        self._index_file.flush()
+        self._indexed_at = offset
+
+    def _seal_segment(self) -> None:
+        """Write the final index entry and close the segment; caller holds the lock"""
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._add_index_entry(self._size)
+        os.fsync(self._index_file.fileno())
+        self._file.close()
+        self._index_file.close()
+        self._file = self._index_file = self._segment = None
+        self._dirty = False
+
+    def append(self, kind: str, username: str, data: Any = None, timestamp: Optional[float] = None) -> float:
+        """
+        Append one record
+
+        Args:
+            kind: Record type, chosen by the caller
+            username: User the record belongs to
+            data: JSON-serializable payload
+            timestamp: Epoch seconds (default: now)
+
+        Returns:
+            The record's timestamp
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        frame = encode_record(timestamp, kind, username, data)
+        with self._lock:
+            if self._file is None:
+                self._open_segment()
+            elif self._size and self._size + len(frame) > self.segment_bytes:
+                self._seal_segment()
+                self._prune()
+                self._open_segment()
+            if self._size - self._indexed_at >= self.index_interval:
+                self._add_index_entry(self._size)
+            self._file.write(frame)
+            self._file.flush()
+            self._size += len(frame)
+            self._max_time = max(self._max_time, timestamp)
+            self.appended += 1
+            if self.fsync_interval <= 0:
+                os.fsync(self._file.fileno())
+            else:
+                self._dirty = True
+                self._start_syncer()
+        return timestamp
+
+    def _start_syncer(self) -> None:
+        if self._syncer is None:
+            self._syncer = threading.Thread(target=self._sync_loop, name='activity-log-fsync', daemon=True)
+            self._syncer.start()
+
+    def _sync_loop(self) -> None:
+        while not self._stop.wait(self.fsync_interval):
+            self.sync()
+
+    def sync(self) -> None:
+        """fsync everything appended so far"""
+        with self._lock:
+            if not self._dirty or self._file is None:
+                return
+            self._dirty = False
+            # fsync a duplicate descriptor outside the lock, so appends are not held up by the disk
+            fd = os.dup(self._file.fileno())
+        try:
+            os.fsync(fd)
+            self.syncs += 1
+        finally:
+            os.close(fd)
+
+    def _prune(self) -> None:
+        if self.retention_days is None:
+            return
+        cutoff = time.time() - self.retention_days * 86400
+        for segment in self.segments():
+            end = segment.end_time()
+            # Only sealed segments: an unsealed one may belong to a live process
+            if end is not None and end < cutoff:
+                for path in (segment.path, segment.index_path):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+
+    def read(self, since: Optional[float] = None, username: Optional[str] = None,
+             kinds: Optional[Sequence[str]] = None) -> Iterator[LogRecord]:
+        """
+        Stream records from every segment, oldest first
+
+        Args:
+            since: Only records at or after this epoch time; earlier sealed
+                segments are skipped without being opened
+            username: Only this user's records
+            kinds: Only records of these kinds
+        """
+        streams = []
+        for segment in self.segments():
+            end = segment.end_time()
+            if since is not None and end is not None and end < since:
+                continue
+            streams.append(segment.read(since, username, kinds))
+        return heapq.merge(*streams, key=lambda record: record.timestamp)
+
+    def close(self) -> None:
+        """Seal the current segment and stop the fsync timer"""
+        self._stop.set()
+        with self._lock:
+            self._seal_segment()
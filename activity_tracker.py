@@ -1,19 +1,267 @@
 """
 Activity Tracker - Tracks user activities and behavioral data for analytics
+
+With an ActivityLog attached, every tracked event is also appended to the
+log, and a new tracker rebuilds its in-memory state by streaming the log, so
+activity survives restarts and is visible to every worker reading the same
+log directory.
+
+Per-user history is held in ring buffers of compact records (epoch float
+timestamps, interned activity types), bounded per user by count and age and
+across all users by a global entry budget. Evicted records can be spilled
+to a separate ActivityLog when the write-ahead log is disabled; with it
+enabled they are already on disk. Summaries come from the daily counters,
+so they stay exact after the records they counted are evicted.
 """
 
-import json 
-from datetime import datetime ,timedelta 
-from typing import Dict ,List 
+import sys 
+import time 
+import heapq 
+import threading 
+from collections import deque 
+from datetime import date ,datetime 
+from typing import Dict ,List ,Optional 
+from activity_log import ActivityLog 
+from config import ACTIVITY_LOG ,ACTIVITY_RETENTION 
+
+# Log record kinds
+ACTIVITY ='activity'
+LOGIN_ATTEMPT ='login'
+PROFILE ='profile'
+
+class ActivityRecord :
+    """One tracked activity; the type is interned, details is None when empty"""
+
+    __slots__ =('timestamp','type','details')
+
+    def __init__ (self ,timestamp :float ,activity_type :str ,details :Optional [Dict ]):
+        self .timestamp =timestamp 
+        self .type =sys .intern (activity_type )
+        self .details =details or None 
+
+    def to_log (self )->Dict :
+        return {'type':self .type ,'details':self .details or {}}
+
+    def to_dict (self )->Dict :
+        return {
+        'timestamp':datetime .fromtimestamp (self .timestamp ).isoformat (),
+        'type':self .type ,
+        'details':self .details or {}
+        }
+
+class LoginRecord :
+    """One tracked login attempt"""
+
+    __slots__ =('timestamp','success','behavioral_score')
+
+    def __init__ (self ,timestamp :float ,success :bool ,behavioral_score :Optional [float ]):
+        self .timestamp =timestamp 
+        self .success =success 
+        self .behavioral_score =behavioral_score 
+
+    def to_log (self )->Dict :
+        return {'success':self .success ,'behavioral_score':self .behavioral_score }
+
+    def to_dict (self )->Dict :
+        return {
+        'timestamp':datetime .fromtimestamp (self .timestamp ).isoformat (),
+        'success':self .success ,
+        'behavioral_score':self .behavioral_score ,
+        'status':'authenticated'if self .success else 'denied'
+        }
+
+class DayCounts :
+    """One user's activity counters for one local calendar day"""
+
+    __slots__ =('activities','logins','successes','fraud_blocks','score_sum','scored')
+
+    def __init__ (self ):
+        self .activities =0 
+        self .logins =0 
+        self .successes =0 
+        self .fraud_blocks =0 
+        self .score_sum =0.0 
+        self .scored =0 
+
+class UserCounts :
+    """A user's DayCounts keyed by date ordinal, and the newest day with activity and logins"""
+
+    __slots__ =('days','last_activity_day','last_login_day')
+
+    def __init__ (self ):
+        self .days ={}
+        self .last_activity_day =None 
+        self .last_login_day =None 
+
+    def day (self ,ordinal :int ,first_kept :Optional [int ]=None )->DayCounts :
+        """Counters of one day, created on first use; a new day drops days before first_kept"""
+        counts =self .days .get (ordinal )
+        if counts is None :
+            if first_kept is not None :
+                for old in [d for d in self .days if d <first_kept ]:
+                    del self .days [old ]
+            counts =self .days [ordinal ]=DayCounts ()
+        return counts 
 
 class ActivityTracker :
     """Tracks user activities, login attempts, and behavioral patterns"""
 
-    def __init__ (self ):
-        """Initialize activity tracker"""
+    def __init__ (self ,log :ActivityLog =None ,max_entries_per_user :int =None ,max_age_days :float =None ,
+    max_total_entries :int =None ,spill :ActivityLog =None ):
+        """
+        Initialize activity tracker
+
+        Args:
+            log: Optional ActivityLog to persist events to and replay on startup
+            max_entries_per_user: Activities and login attempts each kept per user
+                (default: ACTIVITY_RETENTION['max_entries_per_user'])
+            max_age_days: Older records are dropped (default: ACTIVITY_RETENTION['max_age_days'])
+            max_total_entries: Records kept across all users; the oldest go first
+                (default: ACTIVITY_RETENTION['max_total_entries'])
+            spill: Optional ActivityLog that receives evicted records
+        """
+        self .max_entries_per_user =max_entries_per_user or ACTIVITY_RETENTION ['max_entries_per_user']
+        self .max_age_days =max_age_days or ACTIVITY_RETENTION ['max_age_days']
+        self .max_total_entries =max_total_entries or ACTIVITY_RETENTION ['max_total_entries']
         self .activities ={}
         self .login_attempts ={}
         self .behavioral_profiles ={}
+        # username -> UserCounts, maintained on insert so summaries never scan the lists
+        self .counts ={}
+        self .total_entries =0 
+        self .evicted =0 
+        self .log =log 
+        self .spill =spill 
+        # Guards the ring buffers and counters: readers iterate buffers that request threads append to
+        self ._lock =threading .RLock ()
+        self ._replaying =False 
+        self .replayed =0 
+        if log is not None :
+            self .replay ()
+
+    def replay (self )->int :
+        """
+        Rebuild in-memory state by streaming the activity log
+
+        Only the last max_age_days are read: older records would be expired
+        by the next read anyway, and skipping them lets the log skip whole
+        sealed segments. Behavioral profiles older than that are
+        dropped with them.
+
+        Returns:
+            Number of records applied
+        """
+        with self ._lock :
+            self .activities ={}
+            self .login_attempts ={}
+            self .behavioral_profiles ={}
+            self .counts ={}
+            self .total_entries =0 
+            count =0 
+            # Records evicted while replaying are already in the log; don't spill them again
+            self ._replaying =True 
+            try :
+                for record in self .log .read (since =time .time ()-self .max_age_days *86400 ):
+                    self ._apply (record .kind ,record .username ,record .timestamp ,record .data )
+                    count +=1 
+            finally :
+                self ._replaying =False 
+        self .replayed =count 
+        return count 
+
+    def _record (self ,kind :str ,username :str ,data :Dict )->None :
+        """Apply an event to the in-memory state and append it to the log"""
+        timestamp =time .time ()
+        if self .log is not None :
+            self .log .append (kind ,username ,data ,timestamp )
+        with self ._lock :
+            self ._apply (kind ,username ,timestamp ,data )
+
+    def _user_counts (self ,username :str )->UserCounts :
+        counts =self .counts .get (username )
+        if counts is None :
+            counts =self .counts [username ]=UserCounts ()
+        return counts 
+
+    def _retain (self ,history :Dict ,kind :str ,username :str ,record )->None :
+        """Append a record to a user's ring buffer, evicting by count, age and the global budget"""
+        buffer =history .get (username )
+        if buffer is None :
+            buffer =history [sys .intern (username )]=deque (maxlen =self .max_entries_per_user )
+        if len (buffer )==buffer .maxlen :
+            self ._evicted (kind ,username ,buffer [0 ])
+            self .total_entries -=1 
+        buffer .append (record )
+        self .total_entries +=1 
+        self ._expire (buffer ,kind ,username ,record .timestamp )
+        if self .total_entries >self .max_total_entries :
+            self ._enforce_budget ()
+
+    def _expire (self ,buffer :deque ,kind :str ,username :str ,now :float )->None :
+        """Drop records older than max_age_days from the front of a ring buffer"""
+        cutoff =now -self .max_age_days *86400 
+        while buffer and buffer [0 ].timestamp <cutoff :
+            self ._evicted (kind ,username ,buffer .popleft ())
+            self .total_entries -=1 
+
+    def _enforce_budget (self )->None :
+        """Evict the oldest records across all users until 90% of the global budget is used"""
+        heads =[]
+        for kind ,history in ((ACTIVITY ,self .activities ),(LOGIN_ATTEMPT ,self .login_attempts )):
+            for username ,buffer in history .items ():
+                if buffer :
+                    heads .append ((buffer [0 ].timestamp ,kind ,username ))
+        heapq .heapify (heads )
+        target =int (self .max_total_entries *0.9 )
+        while self .total_entries >target and heads :
+            _ ,kind ,username =heapq .heappop (heads )
+            history =self .activities if kind ==ACTIVITY else self .login_attempts 
+            buffer =history [username ]
+            self ._evicted (kind ,username ,buffer .popleft ())
+            self .total_entries -=1 
+            if buffer :
+                heapq .heappush (heads ,(buffer [0 ].timestamp ,kind ,username ))
+            else :
+                del history [username ]
+
+    def _evicted (self ,kind :str ,username :str ,record )->None :
+        self .evicted +=1 
+        if self .spill is not None and not self ._replaying :
+            self .spill .append (kind ,username ,record .to_log (),record .timestamp )
+
+    def _apply (self ,kind :str ,username :str ,timestamp :float ,data :Dict )->None :
+        moment =datetime .fromtimestamp (timestamp )
+        first_kept =moment .toordinal ()-int (self .max_age_days )
+        if kind ==ACTIVITY :
+            self ._retain (self .activities ,kind ,username ,ActivityRecord (timestamp ,data ['type'],data ['details']))
+            ordinal =moment .toordinal ()
+            counts =self ._user_counts (username )
+            day =counts .day (ordinal ,first_kept )
+            day .activities +=1 
+            if data ['type']=='fraud_blocked':
+                day .fraud_blocks +=1 
+            if counts .last_activity_day is None or ordinal >counts .last_activity_day :
+                counts .last_activity_day =ordinal 
+        elif kind ==LOGIN_ATTEMPT :
+            success =data ['success']
+            score =data ['behavioral_score']
+            self ._retain (self .login_attempts ,kind ,username ,LoginRecord (timestamp ,success ,score ))
+            ordinal =moment .toordinal ()
+            counts =self ._user_counts (username )
+            day =counts .day (ordinal ,first_kept )
+            day .logins +=1 
+            if success :
+                day .successes +=1 
+            if score is not None :
+                day .score_sum +=score 
+                day .scored +=1 
+            if counts .last_login_day is None or ordinal >counts .last_login_day :
+                counts .last_login_day =ordinal 
+        elif kind ==PROFILE :
+            self .behavioral_profiles [username ]={
+            'timestamp':moment .isoformat (),
+            'data':data 
+            }
 
     def track_activity (self ,username :str ,activity_type :str ,details :Dict =None )->None :
         """
@@ -24,16 +272,7 @@ class ActivityTracker :
             activity_type: Type of activity (login, logout, enrollment, auth_attempt, etc)
             details: Additional details about the activity
         """
-        if username not in self .activities :
-            self .activities [username ]=[]
-
-        activity ={
-        'timestamp':datetime .now ().isoformat (),
-        'type':activity_type ,
-        'details':details or {}
-        }
-
-        self .activities [username ].append (activity )
+        self ._record (ACTIVITY ,username ,{'type':activity_type ,'details':details or {}})
 
     def track_login_attempt (self ,username :str ,success :bool ,behavioral_score :float =None )->None :
         """
@@ -44,17 +283,9 @@ class ActivityTracker :
             success: Whether login was successful
             behavioral_score: Behavioral anomaly score (0-1), lower is better
         """
-        if username not in self .login_attempts :
-            self .login_attempts [username ]=[]
-
-        attempt ={
-        'timestamp':datetime .now ().isoformat (),
-        'success':success ,
-        'behavioral_score':behavioral_score ,
-        'status':'authenticated'if success else 'denied'
-        }
-
-        self .login_attempts [username ].append (attempt )
+        if behavioral_score is not None :
+            behavioral_score =float (behavioral_score )
+        self ._record (LOGIN_ATTEMPT ,username ,{'success':bool (success ),'behavioral_score':behavioral_score })
 
         self .track_activity (username ,'login_attempt',{
         'success':success ,
@@ -69,10 +300,7 @@ class ActivityTracker :
             username: Username
             profile_data: User's behavioral profile data
         """
-        self .behavioral_profiles [username ]={
-        'timestamp':datetime .now ().isoformat (),
-        'data':profile_data 
-        }
+        self ._record (PROFILE ,username ,profile_data )
 
         self .track_activity (username ,'profile_updated',{
         'profile_size':len (profile_data )
@@ -82,6 +310,9 @@ class ActivityTracker :
         """
         Get activity summary for a user in the last N days
         
+        Sums the user's daily counters for the last N calendar days (today
+        included), so the cost depends on N and not on the amount of history.
+
         Args:
             username: Username
             days: Number of days to look back
@@ -89,42 +320,48 @@ class ActivityTracker :
         Returns:
             Dictionary with activity summary
         """
-        cutoff_time =datetime .now ()-timedelta (days =days )
-
-        activities =self .activities .get (username ,[])
-        login_attempts =self .login_attempts .get (username ,[])
-
-        recent_activities =[
-        a for a in activities 
-        if datetime .fromisoformat (a ['timestamp'])>cutoff_time 
-        ]
+        first_day =date .today ().toordinal ()-days +1 
 
-        recent_logins =[
-        l for l in login_attempts 
-        if datetime .fromisoformat (l ['timestamp'])>cutoff_time 
-        ]
+        total_activities =0 
+        total_logins =0 
+        successful_logins =0 
+        fraud_blocked_count =0 
+        score_sum =0.0 
+        scored =0 
+        last_activity =None 
+        last_login =None 
 
-        fraud_blocked_count = sum(1 for a in recent_activities if a.get('type') == 'fraud_blocked')
-
-        successful_logins =sum (1 for l in recent_logins if l ['success'])
-        failed_logins =sum (1 for l in recent_logins if not l ['success'])
-
-        avg_score =None 
-        if recent_logins :
-            scores =[l ['behavioral_score']for l in recent_logins if l ['behavioral_score']is not None ]
-            if scores :
-                avg_score =sum (scores )/len (scores )
+        with self ._lock :
+            counts =self .counts .get (username )
+            if counts is not None :
+                if len (counts .days )<=days :
+                    buckets =[c for ordinal ,c in counts .days .items ()if ordinal >=first_day ]
+                else :
+                    buckets =[counts .days [ordinal ]for ordinal in range (first_day ,first_day +days )if ordinal in counts .days ]
+                for c in buckets :
+                    total_activities +=c .activities 
+                    total_logins +=c .logins 
+                    successful_logins +=c .successes 
+                    fraud_blocked_count +=c .fraud_blocks 
+                    score_sum +=c .score_sum 
+                    scored +=c .scored 
+                activities =self .activities .get (username )
+                if activities and counts .last_activity_day is not None and counts .last_activity_day >=first_day :
+                    last_activity =activities [-1 ].to_dict ()
+                attempts =self .login_attempts .get (username )
+                if attempts and counts .last_login_day is not None and counts .last_login_day >=first_day :
+                    last_login =attempts [-1 ].to_dict ()
 
         return {
-        'total_activities':len (recent_activities ),
-        'total_login_attempts':len (recent_logins ),
+        'total_activities':total_activities ,
+        'total_login_attempts':total_logins ,
         'successful_logins':successful_logins ,
-        'failed_logins':failed_logins ,
+        'failed_logins':total_logins -successful_logins ,
         'fraud_blocks':fraud_blocked_count ,
-        'success_rate':(successful_logins /max (1 ,len (recent_logins )))*100 ,
-        'average_behavioral_score':avg_score ,
-        'last_activity':recent_activities [-1 ]if recent_activities else None ,
-        'last_login':recent_logins [-1 ]if recent_logins else None 
+        'success_rate':(successful_logins /max (1 ,total_logins ))*100 ,
+        'average_behavioral_score':score_sum /scored if scored else None ,
+        'last_activity':last_activity ,
+        'last_login':last_login 
         }
 
     def get_all_user_activities (self ,username :str ,limit :int =50 )->List [Dict ]:
@@ -138,8 +375,13 @@ class ActivityTracker :
         Returns:
             List of activities (most recent first)
         """
-        activities =self .activities .get (username ,[])
-        return sorted (activities ,key =lambda x :x ['timestamp'],reverse =True )[:limit ]
+        with self ._lock :
+            activities =self .activities .get (username )
+            if not activities :
+                return []
+            self ._expire (activities ,ACTIVITY ,username ,time .time ())
+            newest =heapq .nlargest (limit ,activities ,key =lambda x :x .timestamp )
+        return [a .to_dict ()for a in newest ]
 
     def get_login_history (self ,username :str ,limit :int =20 )->List [Dict ]:
         """
@@ -152,8 +394,13 @@ class ActivityTracker :
         Returns:
             List of login attempts (most recent first)
         """
-        attempts =self .login_attempts .get (username ,[])
-        return sorted (attempts ,key =lambda x :x ['timestamp'],reverse =True )[:limit ]
+        with self ._lock :
+            attempts =self .login_attempts .get (username )
+            if not attempts :
+                return []
+            self ._expire (attempts ,LOGIN_ATTEMPT ,username ,time .time ())
+            newest =heapq .nlargest (limit ,attempts ,key =lambda x :x .timestamp )
+        return [l .to_dict ()for l in newest ]
 
     def get_behavioral_profile (self ,username :str )->Dict :
         """
@@ -191,4 +438,16 @@ class ActivityTracker :
 
         return max (0 ,min (100 ,score ))
 
-activity_tracker =ActivityTracker ()
+def _open_log (directory :str )->ActivityLog :
+    return ActivityLog (
+    directory ,
+    segment_bytes =ACTIVITY_LOG ['segment_bytes'],
+    index_interval =ACTIVITY_LOG ['index_interval'],
+    fsync_interval =ACTIVITY_LOG ['fsync_interval'],
+    retention_days =ACTIVITY_LOG ['retention_days']
+    )
+
+activity_tracker =ActivityTracker (
+_open_log (ACTIVITY_LOG ['directory'])if ACTIVITY_LOG ['enabled']else None ,
+spill =_open_log (ACTIVITY_RETENTION ['spill_directory'])if ACTIVITY_RETENTION ['spill_directory']else None 
+)
@@ -0,0 +1,225 @@
+"""
+Atomic JSON - Locked, crash-safe reads and writes of small JSON files
+
+Every write goes to a temporary file in the same directory and is renamed
+over the target with os.replace, so readers see either the old or the new
+contents, never a truncated file. Read-modify-write cycles hold a per-file
+lock: a threading lock within the process and, where fcntl is available,
+an flock on a <file>.lock sidecar across processes. The sidecar is needed
+because os.replace gives the target a new inode on every write.
+
+WriteBehindJson coalesces bursts of key updates to one file (such as
+banned_hwids.json) into a single locked read-modify-write.
+"""
+
+import os
+import json
+import atexit
+import weakref
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_locks: Dict[str, threading.RLock] = {}
+_locks_guard = threading.Lock()
+
+# Write-behind files with a pending timer; flushed once at interpreter exit
+_write_behind: 'weakref.WeakSet[WriteBehindJson]' = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_write_behind() -> None:
+    for writer in list(_write_behind):
+        writer.flush()
+
+
+def _thread_lock(path: str) -> threading.RLock:
+    with _locks_guard:
+        lock = _locks.get(path)
+        if lock is None:
+            lock = _locks[path] = threading.RLock()
+        return lock
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Hold the lock of one JSON file, across threads and (with fcntl) processes"""
+    path = os.path.abspath(path)
+    with _thread_lock(path):
+        if fcntl is None:
+            yield
+            return
+        with open(path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def read_json(path: str, default: Any = None, cache=None) -> Any:
+    """
+    Parsed contents of a JSON file, or default if it does not exist
+
+    Args:
+        cache: Optional JsonFileCache to serve unchanged files from
+    """
+    if cache is not None:
+        return cache.get(path, default)
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def write_json(path: str, data: Any, cache=None, fsync: bool = False, indent: Optional[int] = 2) -> None:
+    """
+    Atomically replace a JSON file
+
+    Args:
+        cache: Optional JsonFileCache that receives the written data
+        fsync: Flush the data to disk before the rename
+        indent: json.dump indent; None writes compact JSON
+    """
+    tmp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump(data, f, indent=indent)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    if cache is not None:
+        cache.put(path, data)
+
+
+def update_json(path: str, mutate: Callable[[Any], Any], default: Any = None, cache=None) -> Any:
+    """
+    Locked read-modify-write of a JSON file
+
+    Args:
+        path: File to update
+        mutate: Receives the current contents (default if the file does not
+            exist) and returns the new contents, or None to leave the file
+            unchanged
+        default: Contents assumed for a missing file
+        cache: Optional JsonFileCache
+
+    Returns:
+        The new contents, or None if nothing was written
+    """
+    with file_lock(path):
+        data = mutate(read_json(path, default, cache))
+        if data is not None:
+            write_json(path, data, cache)
+        return data
+
+
+class WriteBehindJson:
+    """
+    Buffered key updates to one JSON object file
+
+    set() and delete() only record the change; a background timer applies
+    everything recorded within delay seconds in one locked read-modify-write.
+    Reads see pending changes immediately. Pending changes are flushed by
+    close() and at interpreter exit. With delay 0 (the default) every change
+    is written right away.
+    """
+
+    _DELETED = object()
+
+    def __init__(self, path: str, delay: float = 0.0, cache=None):
+        self.path = path
+        self.delay = delay
+        self.cache = cache
+        self._pending: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self.updates = 0
+        self.writes = 0
+        if delay > 0:
+            _write_behind.add(self)
+
+    def _schedule(self) -> None:
+        if self._timer is None:
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _record(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._pending[key] = value
+            self.updates += 1
+            if self.delay > 0:
+                self._schedule()
+                return
+        self.flush()
+
+    def set(self, key: str, value: Any) -> None:
+        self._record(key, value)
+
+    def delete(self, key: str) -> None:
+        self._record(key, self._DELETED)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._pending:
+                value = self._pending[key]
+                return default if value is self._DELETED else value
+        return read_json(self.path, {}, self.cache).get(key, default)
+
+    def items(self) -> Dict[str, Any]:
+        """File contents with pending changes applied"""
+        data = read_json(self.path, {}, self.cache)
+        with self._lock:
+            return self._apply(data, self._pending)
+
+    def _apply(self, data: Dict[str, Any], pending: Dict[str, Any]) -> Dict[str, Any]:
+        for key, value in pending.items():
+            if value is self._DELETED:
+                data.pop(key, None)
+            else:
+                data[key] = value
+        return data
+
+    def replace(self, data: Dict[str, Any]) -> None:
+        """Drop pending changes and write data right away"""
+        with self._lock:
+            self._pending.clear()
+            with file_lock(self.path):
+                write_json(self.path, data, self.cache)
+            self.writes += 1
+
+    def flush(self) -> bool:
+        """
+        Write pending changes now
+
+        Returns:
+            True if anything was written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._timer = None
+            if not pending:
+                return False
+            update_json(self.path, lambda data: self._apply(data, pending), {}, self.cache)
+            self.writes += 1
+            return True
+
+    def close(self) -> None:
+        """Write pending changes and stop flushing this file at exit"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+        self.flush()
+        _write_behind.discard(self)
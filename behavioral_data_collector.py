@@ -4,22 +4,31 @@ Behavioral Data Collector - Collects typing and mouse movement patterns for auth
 
 import time 
 import json 
-from typing import Dict 
+from typing import Dict ,Union 
 from pynput import keyboard ,mouse 
+from behavioral_session import BehavioralSession ,BehavioralSessionBuilder 
+from feature_extractor import StreamingFeatureAccumulator 
 
 class BehavioralDataCollector :
     """Collects behavioral biometric data including typing dynamics and mouse patterns"""
 
-    def __init__ (self ,duration :int =60 ):
+    def __init__ (self ,duration :int =60 ,columnar :bool =False ,accumulator :StreamingFeatureAccumulator =None ):
         """
         Initialize the data collector
         
         Args:
             duration: Collection duration in seconds
+            columnar: Store events in typed arrays and return a BehavioralSession
+                from collect() instead of lists of dicts
+            accumulator: Optional StreamingFeatureAccumulator fed with every event
+                as it arrives, for scoring while collection is still running
         """
         self .duration =duration 
+        self .columnar =columnar 
+        self .accumulator =accumulator 
         self .keystroke_data =[]
         self .mouse_data =[]
+        self .session_builder =None 
         self .last_key_time =None 
         self .collection_active =False 
         self .last_mouse_position =None 
@@ -42,6 +51,13 @@ class BehavioralDataCollector :
         except AttributeError :
             char =str (key )
 
+        if self .accumulator is not None :
+            self .accumulator .add_keystroke (current_time ,iki ,str (key ))
+
+        if self .session_builder is not None :
+            self .session_builder .add_keystroke (current_time ,iki ,str (key ),char )
+            return 
+
         self .keystroke_data .append ({
         'timestamp':current_time ,
         'char':char ,
@@ -71,6 +87,13 @@ class BehavioralDataCollector :
 
         self .last_mouse_position =(x ,y ,current_time )
 
+        if self .accumulator is not None :
+            self .accumulator .add_mouse (current_time ,distance ,velocity )
+
+        if self .session_builder is not None :
+            self .session_builder .add_mouse (current_time ,x ,y ,distance ,velocity )
+            return 
+
         self .mouse_data .append ({
         'timestamp':current_time ,
         'x':x ,
@@ -79,12 +102,13 @@ class BehavioralDataCollector :
         'velocity':velocity 
         })
 
-    def collect (self )->Dict :
+    def collect (self )->Union [Dict ,BehavioralSession ]:
         """
         Collect behavioral data for the specified duration
         
         Returns:
-            Dictionary containing keystroke and mouse data
+            Dictionary containing keystroke and mouse data, or a BehavioralSession
+            when the collector is columnar
         """
         print (f"\n🔍 Behavioral Data Collection Starting... ({self .duration }s)")
         print ("="*50 )
@@ -96,6 +120,7 @@ class BehavioralDataCollector :
 
         self .keystroke_data =[]
         self .mouse_data =[]
+        self .session_builder =BehavioralSessionBuilder ()if self .columnar else None 
         self .last_key_time =None 
         self .last_mouse_position =None 
         self .collection_active =True 
@@ -118,14 +143,19 @@ class BehavioralDataCollector :
 
         print ("\n✅ Data Collection Complete!")
 
+        if self .session_builder is not None :
+            return self .session_builder .build (duration =self .duration )
+
         return {
         'keystroke_data':self .keystroke_data ,
         'mouse_data':self .mouse_data ,
         'duration':self .duration 
         }
 
-    def save_data (self ,filename :str ,data :Dict ):
+    def save_data (self ,filename :str ,data :Union [Dict ,BehavioralSession ]):
         """Save collected data to file"""
+        if isinstance (data ,BehavioralSession ):
+            data =data .to_dict ()
         with open (filename ,'w')as f :
             json .dump (data ,f ,indent =2 )
         print (f"✅ Data saved to {filename }")
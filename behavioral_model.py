@@ -3,31 +3,111 @@ Behavioral Authentication Model - Trains and authenticates users based on behavi
 """
 
 import numpy as np
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
 import joblib
-from typing import Tuple, Dict, List
+from datetime import datetime
+from typing import Tuple, Dict, List, Union
 from feature_extractor import FeatureExtractor
+from feature_schema import FEATURE_SCHEMA 
+from compiled_forest import CompiledIsolationForest
+from scorers import ISOLATION_FOREST ,SCORERS ,create_scorer 
+import model_artifact
+from config import MODEL_TRAINING 
+
+def _merge_moments (count :int ,mean :np .ndarray ,m2 :np .ndarray ,X :np .ndarray )->Tuple [int ,np .ndarray ,np .ndarray ]:
+    """
+    Merge the rows of X into running (count, mean, M2) statistics
+    
+    Uses the pairwise update of Chan et al., so the result equals the
+    statistics of all rows seen so far without keeping them.
+    """
+    n =len (X )
+    if n ==0 :
+        return count ,mean ,m2 
+    batch_mean =X .mean (axis =0 )
+    batch_m2 =((X -batch_mean )**2 ).sum (axis =0 )
+    if count ==0 :
+        return n ,batch_mean ,batch_m2 
+    total =count +n 
+    delta =batch_mean -mean 
+    mean =mean +delta *(n /total )
+    m2 =m2 +batch_m2 +delta **2 *(count *n /total )
+    return total ,mean ,m2 
 
 class BehavioralAuthenticationModel :
     """AI-based behavioral authentication using Isolation Forest anomaly detection"""
 
-    def __init__ (self ,contamination :float =0.1 ):
+    def __init__ (self ,contamination :float =0.1 ,validate_compiled :bool =False ,scorer :str =None ):
         """
         Initialize the model
         
         Args:
             contamination: Expected proportion of outliers in dataset (0.0-0.5)
+            validate_compiled: Check the scaler-fused compiled forest against
+                scaling plus unfused scoring every time the model is compiled
+            scorer: 'isolation_forest' or a lightweight scorer from scorers.py
+                (default MODEL_TRAINING['scorer'])
         """
-        self .model =IsolationForest (
-        contamination =contamination ,
-        random_state =42 ,
-        n_estimators =100 
-        )
-        self .scaler =StandardScaler ()
+        self .scorer_type =scorer or MODEL_TRAINING ['scorer']
+        if self .scorer_type !=ISOLATION_FOREST and self .scorer_type not in SCORERS :
+            raise ValueError (f"Unknown scorer {self .scorer_type !r}")
+        self .contamination =contamination 
+        self ._model =None 
+        self ._scaler =None 
+        # Compiled forest or lightweight scorer; everything scores through it
+        self .compiled =None 
+        self .validate_compiled =validate_compiled 
         self .is_trained =False 
-        self .feature_names =FeatureExtractor .get_feature_names ()
+        self .feature_names =list (FEATURE_SCHEMA .names )
+        # Columns of FEATURE_SCHEMA vectors this model reads; None when it was trained on the schema as-is
+        self .feature_columns =None 
         self .enrollment_data =[]
+        self .metadata ={}
+        self .feature_count =0 
+        self .feature_mean =None 
+        self .feature_m2 =None 
+
+    @classmethod 
+    def from_scorer (cls ,scorer ,contamination :float =0.1 )->'BehavioralAuthenticationModel':
+        """
+        Wrap an already fitted scorer, e.g. a user's view of the population model
+        
+        Args:
+            scorer: Object with score(X), score_samples(X), offset and fused
+            contamination: Contamination the scorer was fitted with
+        """
+        model =cls (contamination =contamination )
+        model .scorer_type =scorer .model_type 
+        model .compiled =scorer 
+        model .is_trained =True 
+        return model 
+
+    @property 
+    def model (self ):
+        """sklearn IsolationForest used for training, created on first use"""
+        if self ._model is None :
+            from sklearn .ensemble import IsolationForest 
+            self ._model =IsolationForest (
+            contamination =self .contamination ,
+            random_state =MODEL_TRAINING ['random_state'],
+            n_estimators =MODEL_TRAINING ['n_estimators']
+            )
+        return self ._model 
+
+    @model .setter 
+    def model (self ,value ):
+        self ._model =value 
+
+    @property 
+    def scaler (self ):
+        """sklearn StandardScaler fitted on the enrollment data, created on first use"""
+        if self ._scaler is None :
+            from sklearn .preprocessing import StandardScaler 
+            self ._scaler =StandardScaler ()
+        return self ._scaler 
+
+    @scaler .setter 
+    def scaler (self ,value ):
+        self ._scaler =value 
 
     def enroll_user (self ,behavioral_data_list :List [Dict ],num_samples :int =5 )->bool :
         """
@@ -46,21 +126,153 @@ class BehavioralAuthenticationModel :
 
         print (f"\n📝 Enrolling user with {len (behavioral_data_list )} samples...")
 
-        feature_vectors =[]
-        for data in behavioral_data_list :
-            features =FeatureExtractor .extract_all_features (data )
-            feature_vectors .append (features )
+        self .enroll_features (FeatureExtractor .extract_features_batch (behavioral_data_list ))
 
-        self .enrollment_data =np .array (feature_vectors )
+        print (f"✅ User enrolled successfully with {len (self .enrollment_data )} behavior samples")
+        return True 
 
-        self .scaler .fit (self .enrollment_data )
-        scaled_data =self .scaler .transform (self .enrollment_data )
-        self .model .fit (scaled_data )
+    def enroll_features (self ,features :np .ndarray ,feature_names :List [str ]=None ):
+        """
+        Train the model from scratch on an enrollment feature matrix
+        
+        Args:
+            features: Feature matrix of shape (n_samples, n_features) in
+                FEATURE_SCHEMA order
+            feature_names: Train on only these schema features, e.g.
+                feature_schema.CLIENT_FEATURES for web-collected data; the
+                model then reads just those columns of every vector it scores
+        """
+        features =np .atleast_2d (np .asarray (features ,dtype =np .float64 ))
+        FEATURE_SCHEMA .check_width (features ,len (FEATURE_SCHEMA ))
+        self .feature_names =list (feature_names or FEATURE_SCHEMA .names )
+        self .feature_columns =FEATURE_SCHEMA .columns_for (self .feature_names )
+        if self .feature_columns is not None :
+            features =features [:,self .feature_columns ]
+        self .enrollment_data =features 
         self .is_trained =True 
+        self .metadata ={'trained_at':datetime .now ().isoformat (),'feature_schema':FEATURE_SCHEMA .id }
+        self .feature_count ,self .feature_mean ,self .feature_m2 =_merge_moments (0 ,None ,None ,self .enrollment_data )
 
-        print (f"✅ User enrolled successfully with {len (feature_vectors )} behavior samples")
+        if self .scorer_type !=ISOLATION_FOREST :
+            self .compiled =create_scorer (self .scorer_type ).fit (self .enrollment_data ,self .contamination )
+        else :
+            self .scaler .fit (self .enrollment_data )
+            scaled_data =self .scaler .transform (self .enrollment_data )
+            self .model .fit (scaled_data )
+            self .compile ()
+
+    def update (self ,new_data :Union [List [Dict ],np .ndarray ],n_trees :int =None ,max_samples :int =None )->bool :
+        """
+        Update a trained model with new samples instead of retraining it
+        
+        The running feature statistics are merged with the new samples and
+        the scaler is refitted from them. The n_trees oldest trees are then
+        replaced by trees fitted on the most recent enrollment window under
+        the new scaler. All trees are scaler-fused, so the remaining old trees
+        keep working unchanged. Finally the decision offset is recomputed on
+        the window.
+        
+        After an update the compiled forest is the model: it can be saved as
+        an artifact but no longer as a legacy pickle. Lightweight scorers are
+        simply refitted on the window.
+        
+        Args:
+            new_data: List of behavioral data (dicts or BehavioralSessions), or a
+                feature matrix of shape (n_samples, n_features)
+            n_trees: Number of trees to replace (default MODEL_TRAINING['update_trees'])
+            max_samples: Size of the enrollment window kept for refitting
+                (default MODEL_TRAINING['max_enrollment_samples'])
+            
+        Returns:
+            True if the model was updated, False if there were no new samples
+        """
+        if not self .is_trained :
+            raise ValueError ("Model not trained. Please enroll user first.")
+
+        if isinstance (new_data ,np .ndarray ):
+            new_features =np .atleast_2d (np .asarray (new_data ,dtype =np .float64 ))
+        else :
+            new_features =FeatureExtractor .extract_features_batch (new_data )
+        new_features =self ._conform (new_features )
+        if len (new_features )==0 :
+            return False 
+
+        n_trees =n_trees if n_trees is not None else MODEL_TRAINING ['update_trees']
+        max_samples =max_samples if max_samples is not None else MODEL_TRAINING ['max_enrollment_samples']
+
+        if self .compiled is None :
+            self .compile ()
+        compiled =self .compiled 
+        if not compiled .fused :
+            compiled =compiled .fuse_scaler (self .scaler .mean_ ,self .scaler .scale_ )
+
+        self ._ensure_feature_stats ()
+        self .feature_count ,self .feature_mean ,self .feature_m2 =_merge_moments (
+        self .feature_count ,self .feature_mean ,self .feature_m2 ,new_features 
+        )
+
+        window =new_features 
+        if len (self .enrollment_data ):
+            window =np .vstack ([np .atleast_2d (self .enrollment_data ),new_features ])
+        window =window [-max_samples :]
+
+        updates =self .metadata .get ('updates',0 )+1 
+        self .enrollment_data =window 
+        self .metadata =dict (self .metadata ,updates =updates ,updated_at =datetime .now ().isoformat ())
+
+        if self .scorer_type !=ISOLATION_FOREST :
+            self .compiled =create_scorer (self .scorer_type ).fit (window ,self .contamination )
+            return True 
+
+        mean ,scale =self .scaler_parameters ()
+        from sklearn .ensemble import IsolationForest 
+        forest =IsolationForest (
+        contamination =self .contamination ,
+        random_state =MODEL_TRAINING ['random_state']+updates ,
+        n_estimators =n_trees 
+        )
+        forest .fit ((window -mean )/scale )
+        new_trees =CompiledIsolationForest .from_sklearn (forest ).fuse_scaler (mean ,scale )
+
+        updated =compiled .replace_trees (n_trees ,new_trees )
+        updated .recalibrate_offset (window ,self .contamination )
+
+        self .compiled =updated 
+        self ._model =None 
+        self ._scaler =None 
         return True 
 
+    def _ensure_feature_stats (self ):
+        """Initialize the running feature statistics of models that predate them"""
+        if self .feature_count :
+            return 
+        if len (self .enrollment_data ):
+            self .feature_count ,self .feature_mean ,self .feature_m2 =_merge_moments (
+            0 ,None ,None ,np .atleast_2d (self .enrollment_data )
+            )
+        elif self ._scaler is not None and hasattr (self ._scaler ,'mean_'):
+            self .feature_count =int (self ._scaler .n_samples_seen_ )
+            self .feature_mean =self ._scaler .mean_ .copy ()
+            self .feature_m2 =self ._scaler .var_ *self .feature_count 
+        elif isinstance (self .compiled ,CompiledIsolationForest )and self .compiled .fused :
+            self .feature_count =int (self .metadata .get ('enrollment_samples',1 ))or 1 
+            self .feature_mean =np .array (self .compiled .input_mean ,dtype =np .float64 )
+            self .feature_m2 =np .asarray (self .compiled .input_scale ,dtype =np .float64 )**2 *self .feature_count 
+        else :
+            raise ValueError ("Model has no feature statistics to update")
+
+    def scaler_parameters (self )->Tuple [np .ndarray ,np .ndarray ]:
+        """
+        StandardScaler mean and scale implied by the running feature statistics
+        
+        Returns:
+            Tuple of (mean, scale); constant features get a scale of 1 like sklearn
+        """
+        self ._ensure_feature_stats ()
+        scale =np .sqrt (self .feature_m2 /self .feature_count )
+        scale [scale <10 *np .finfo (np .float64 ).eps ]=1.0 
+        return self .feature_mean .copy (),scale 
+
     def authenticate (self ,behavioral_data :Dict ,threshold :float =-0.5 )->Tuple [bool ,float ,str ]:
         """
         Authenticate a user based on behavioral data
@@ -76,15 +288,28 @@ class BehavioralAuthenticationModel :
             return False ,0.0 ,"❌ Model not trained. Please enroll user first."
 
         test_features =FeatureExtractor .extract_all_features (behavioral_data )
-        test_features =test_features .reshape (1 ,-1 )
+        return self .authenticate_features (test_features ,threshold )
 
-        scaled_features =self .scaler .transform (test_features )
-        anomaly_score =self .model .score_samples (scaled_features )[0 ]
-        prediction =self .model .predict (scaled_features )[0 ]
+    def authenticate_features (self ,features :np .ndarray ,threshold :float =-0.5 )->Tuple [bool ,float ,str ]:
+        """
+        Authenticate a user from an already extracted feature vector
+        
+        Args:
+            features: Feature vector, e.g. from StreamingFeatureAccumulator.features()
+            threshold: Anomaly score threshold (lower = stricter). Default -0.5
+            
+        Returns:
+            Tuple of (is_authentic: bool, confidence: float, message: str)
+        """
+        if not self .is_trained :
+            return False ,0.0 ,"❌ Model not trained. Please enroll user first."
 
-        confidence = float(max(0, min(100, (anomaly_score - threshold) * 100)))
+        test_features =np .asarray (features ,dtype =np .float64 ).reshape (1 ,-1 )
+        inliers ,confidences ,scores =self .authenticate_batch (test_features ,threshold )
 
-        is_authentic = bool(prediction == 1)
+        anomaly_score =float (scores [0 ])
+        confidence =float (confidences [0 ])
+        is_authentic =bool (inliers [0 ])
 
         if is_authentic :
             message =f"✅ Authentication SUCCESSFUL | Confidence: {confidence :.1f}%"
@@ -93,22 +318,196 @@ class BehavioralAuthenticationModel :
 
         return is_authentic, confidence, message
 
+    def authenticate_batch (self ,data :Union [List [Dict ],np .ndarray ],threshold :float =-0.5 )->Tuple [np .ndarray ,np .ndarray ,np .ndarray ]:
+        """
+        Authenticate many login attempts at once
+        
+        Features are extracted in one vectorized pass and scored with a single
+        forest evaluation. The decision is one comparison with the decision
+        offset fixed at training time.
+        
+        Args:
+            data: List of behavioral data (dicts or BehavioralSessions), or a
+                feature matrix of shape (n_attempts, n_features)
+            threshold: Anomaly score threshold used for the confidence. Default -0.5
+            
+        Returns:
+            Tuple of (is_authentic, confidence, anomaly_score) arrays
+        """
+        if not self .is_trained :
+            raise ValueError ("Model not trained. Please enroll user first.")
+
+        if self .compiled is None :
+            self .compile ()
+
+        if isinstance (data ,np .ndarray ):
+            features =np .atleast_2d (np .asarray (data ,dtype =np .float64 ))
+        else :
+            features =FeatureExtractor .extract_features_batch (data )
+        features =self ._conform (features )
+
+        if not self .compiled .fused :
+            features =self .scaler .transform (features )
+        scores ,inliers =self .compiled .score (features )
+        confidences =np .clip ((scores -threshold )*100 ,0 ,100 )
+
+        return inliers ,confidences ,scores 
+
+    def compile (self ,fuse_scaler :bool =True ,validate :bool =None )->CompiledIsolationForest :
+        """
+        Flatten the fitted forest into node arrays for fast numpy scoring
+        
+        Called automatically after training and loading. Call it again if
+        self.model or self.scaler is refitted directly.
+        
+        Args:
+            fuse_scaler: Fold the scaler into the split thresholds so raw feature
+                vectors are scored without a transform step
+            validate: Check fused against unfused scores (defaults to validate_compiled)
+        """
+        if self .scorer_type !=ISOLATION_FOREST :
+            return self .compiled 
+        if self ._model is None :
+            raise ValueError ("No sklearn forest to compile; the model was loaded from an artifact or updated incrementally")
+        unfused =CompiledIsolationForest .from_sklearn (self .model )
+        if not fuse_scaler :
+            self .compiled =unfused 
+            return self .compiled 
+
+        fused =unfused .fuse_scaler (self .scaler .mean_ ,self .scaler .scale_ )
+        if validate if validate is not None else self .validate_compiled :
+            self .validate_fused (fused ,unfused )
+
+        self .compiled =fused 
+        return self .compiled 
+
+    def validate_fused (self ,fused :CompiledIsolationForest ,unfused :CompiledIsolationForest ,
+    X :np .ndarray =None ,atol :float =1e-9 )->float :
+        """
+        Check that a scaler-fused forest scores like scaling plus the unfused forest
+        
+        Args:
+            fused: Compiled forest with the scaler folded in
+            unfused: Compiled forest that expects scaled input
+            X: Raw feature vectors to compare on (default: enrollment data plus
+                jittered copies of it)
+            atol: Largest allowed absolute score difference
+            
+        Returns:
+            Largest absolute score difference found
+        """
+        if X is None :
+            X =np .atleast_2d (self .enrollment_data )
+            if len (X )==0 :
+                return 0.0 
+            rng =np .random .default_rng (0 )
+            jitter =rng .normal (scale =self .scaler .scale_ ,size =(8 ,)+X .shape )
+            X =np .vstack ([X ]+list (X +jitter ))
+
+        fused_scores =fused .score_samples (X )
+        unfused_scores =unfused .score_samples (self .scaler .transform (X ))
+        max_difference =float (np .max (np .abs (fused_scores -unfused_scores )))
+        if max_difference >atol :
+            raise ValueError (f"Fused forest disagrees with scaler + forest (max score difference {max_difference :.3g})")
+        return max_difference 
+
     def save_model (self ,filename :str ):
-        """Save trained model and scaler"""
-        joblib .dump ((self .model ,self .scaler ,self .is_trained ),filename )
+        """
+        Save the trained model
+        
+        Files ending in .pkl are written as a joblib pickle of the sklearn
+        objects (legacy format). Anything else is written as a memory-mappable
+        model artifact holding the scaler-fused compiled forest or the
+        lightweight scorer.
+        """
+        if filename .endswith ('.pkl'):
+            if self ._model is None :
+                raise ValueError ("Only sklearn-trained forests can be saved as legacy pickles; save a model artifact instead")
+            joblib .dump ((self .model ,self .scaler ,self .is_trained ,self .compiled ),filename )
+        else :
+            self .write_artifact (filename )
         print (f"✅ Model saved to {filename }")
 
+    def write_artifact (self ,filename :str ):
+        """Atomically write the model as a model artifact"""
+        if self .compiled is None :
+            self .compile ()
+        compiled =self .compiled 
+        if not compiled .fused :
+            compiled =compiled .fuse_scaler (self .scaler .mean_ ,self .scaler .scale_ )
+        model_artifact .save_model (filename ,compiled ,metadata =self ._artifact_metadata (),
+        extra_arrays =self ._artifact_arrays ())
+
+    def _artifact_metadata (self )->Dict :
+        metadata =dict (self .metadata )
+        metadata .update ({
+        'feature_schema':FEATURE_SCHEMA .id if self .feature_columns is None else self .metadata .get ('feature_schema'),
+        'feature_names':self .feature_names ,
+        'n_features':len (self .feature_names ),
+        'contamination':self .contamination ,
+        'enrollment_samples':len (self .enrollment_data )or self .metadata .get ('enrollment_samples',0 ),
+        'feature_count':self .feature_count ,
+        })
+        metadata .pop ('arrays',None )
+        return metadata 
+
+    def _artifact_arrays (self )->Dict [str ,np .ndarray ]:
+        """Enrollment window and running statistics stored next to the scorer"""
+        arrays ={}
+        if len (self .enrollment_data ):
+            arrays ['enrollment']=np .atleast_2d (self .enrollment_data ).astype (np .float32 )
+        if self .feature_count :
+            arrays ['feature_mean']=self .feature_mean 
+            arrays ['feature_m2']=self .feature_m2 
+        return arrays 
+
+    def _conform (self ,features :np .ndarray )->np .ndarray :
+        """
+        Map FEATURE_SCHEMA-ordered vectors onto the columns this model was trained on
+        
+        Raises:
+            FeatureSchemaMismatch: if the vectors have the wrong number of features
+        """
+        if self .feature_columns is None :
+            FEATURE_SCHEMA .check_width (features ,len (self .feature_names ))
+            return features 
+        FEATURE_SCHEMA .check_width (features ,len (FEATURE_SCHEMA ))
+        return features [:,self .feature_columns ]
+
     def load_model (self ,filename :str ):
-        """Load trained model and scaler"""
-        self .model ,self .scaler ,self .is_trained =joblib .load (filename )
+        """Load a trained model from an artifact or a legacy joblib pickle"""
+        if model_artifact .is_artifact (filename ):
+            self .compiled ,manifest ,arrays =model_artifact .load_model (filename )
+            self .scorer_type =manifest ['model_type']
+            self .metadata =manifest 
+            if 'enrollment'in arrays :
+                self .enrollment_data =np .asarray (arrays ['enrollment'],dtype =np .float64 )
+            if 'feature_mean'in arrays :
+                self .feature_count =int (manifest .get ('feature_count',0 ))
+                self .feature_mean =np .array (arrays ['feature_mean'],dtype =np .float64 )
+                self .feature_m2 =np .array (arrays ['feature_m2'],dtype =np .float64 )
+            self .feature_names =manifest .get ('feature_names',self .feature_names )
+            self .feature_columns =FEATURE_SCHEMA .columns_for (self .feature_names ,manifest .get ('feature_schema'))
+            self .contamination =manifest .get ('contamination',self .contamination )
+            self .is_trained =True 
+            print (f"✅ Model loaded from {filename }")
+            return 
+
+        saved =joblib .load (filename )
+        self .scorer_type =ISOLATION_FOREST 
+        self .model ,self .scaler ,self .is_trained =saved [:3 ]
+        self .compiled =saved [3 ]if len (saved )>3 else None 
+        if self .compiled is None and self .is_trained :
+            self .compile ()
         print (f"✅ Model loaded from {filename }")
 
     def get_model_info (self )->Dict :
         """Get information about the trained model"""
         return {
         'is_trained':self .is_trained ,
-        'enrollment_samples':len (self .enrollment_data ),
+        'enrollment_samples':len (self .enrollment_data )or self .metadata .get ('enrollment_samples',0 ),
         'feature_count':len (self .feature_names ),
         'feature_names':self .feature_names ,
-        'model_type':'Isolation Forest'
+        'feature_schema':self .metadata .get ('feature_schema',FEATURE_SCHEMA .id ),
+        'model_type':'Isolation Forest'if self .scorer_type ==ISOLATION_FOREST else self .compiled .display_name 
         }
@@ -0,0 +1,210 @@
+"""
+Behavioral Session - Compact columnar storage for raw keystroke and mouse events
+"""
+
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+MISSING_CODE = -1
+
+
+class BehavioralSession:
+    """
+    Struct-of-arrays container for one collection session.
+
+    Keystrokes are stored as float64 timestamps and IKIs and int16 codes
+    into a per-session vocabulary of key codes and characters. Mouse events
+    are stored as float64 timestamps, coordinates, distances and velocities.
+    Missing IKI, distance and velocity values (None in the dict format) are
+    stored as NaN, missing characters as code -1.
+
+    Conversion is lossless in both directions: dicts converted to a session
+    and back hold the same values, and so does a session converted to dicts
+    and back. Integral coordinates come back as ints, like the collector
+    records them.
+    """
+
+    __slots__ = (
+        'key_timestamps', 'ikis', 'key_codes', 'chars', 'vocabulary',
+        'mouse_timestamps', 'x', 'y', 'distances', 'velocities', 'duration'
+    )
+
+    def __init__(self, key_timestamps=None, ikis=None, key_codes=None, chars=None,
+                 vocabulary: Optional[List[str]] = None, mouse_timestamps=None,
+                 x=None, y=None, distances=None, velocities=None, duration: Any = None):
+        self.key_timestamps = np.asarray(key_timestamps if key_timestamps is not None else [], dtype=np.float64)
+        self.ikis = np.asarray(ikis if ikis is not None else [], dtype=np.float64)
+        self.key_codes = np.asarray(key_codes if key_codes is not None else [], dtype=np.int16)
+        self.chars = np.asarray(chars if chars is not None else [], dtype=np.int16)
+        self.vocabulary = list(vocabulary or [])
+        self.mouse_timestamps = np.asarray(mouse_timestamps if mouse_timestamps is not None else [], dtype=np.float64)
+        self.x = np.asarray(x if x is not None else [], dtype=np.float64)
+        self.y = np.asarray(y if y is not None else [], dtype=np.float64)
+        self.distances = np.asarray(distances if distances is not None else [], dtype=np.float64)
+        self.velocities = np.asarray(velocities if velocities is not None else [], dtype=np.float64)
+        self.duration = duration
+
+    @property
+    def num_keystrokes(self) -> int:
+        return len(self.key_timestamps)
+
+    @property
+    def num_movements(self) -> int:
+        return len(self.mouse_timestamps)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the event arrays"""
+        return sum(getattr(self, name).nbytes for name in (
+            'key_timestamps', 'ikis', 'key_codes', 'chars',
+            'mouse_timestamps', 'x', 'y', 'distances', 'velocities'
+        ))
+
+    def __len__(self) -> int:
+        return self.num_keystrokes + self.num_movements
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'BehavioralSession':
+        """
+        Build a session from the collector's dict format
+
+        Args:
+            data: Dictionary with 'keystroke_data', 'mouse_data' and 'duration'
+
+        Returns:
+            Columnar session holding the same events
+        """
+        builder = BehavioralSessionBuilder()
+        for k in data.get('keystroke_data', []):
+            builder.add_keystroke(k['timestamp'], k.get('iki'), k.get('key_code'), k.get('char'))
+        for m in data.get('mouse_data', []):
+            builder.add_mouse(m['timestamp'], m['x'], m['y'], m.get('distance'), m.get('velocity'))
+        return builder.build(duration=data.get('duration'))
+
+    def to_dict(self) -> Dict:
+        """Convert the session back to the collector's dict format"""
+        vocabulary = self.vocabulary
+
+        def lookup(code: int) -> Optional[str]:
+            return None if code == MISSING_CODE else vocabulary[code]
+
+        def optional(value: float) -> Optional[float]:
+            return None if value != value else value
+
+        def coordinate(value: float):
+            return int(value) if value.is_integer() else value
+
+        keystroke_data = [
+            {
+                'timestamp': timestamp,
+                'char': lookup(char),
+                'iki': optional(iki),
+                'key_code': lookup(key_code)
+            }
+            for timestamp, char, iki, key_code in zip(
+                self.key_timestamps.tolist(), self.chars.tolist(),
+                self.ikis.tolist(), self.key_codes.tolist()
+            )
+        ]
+
+        mouse_data = [
+            {
+                'timestamp': timestamp,
+                'x': coordinate(x),
+                'y': coordinate(y),
+                'distance': optional(distance),
+                'velocity': optional(velocity)
+            }
+            for timestamp, x, y, distance, velocity in zip(
+                self.mouse_timestamps.tolist(), self.x.tolist(), self.y.tolist(),
+                self.distances.tolist(), self.velocities.tolist()
+            )
+        ]
+
+        return {
+            'keystroke_data': keystroke_data,
+            'mouse_data': mouse_data,
+            'duration': self.duration
+        }
+
+    def __repr__(self) -> str:
+        return (f"BehavioralSession(keystrokes={self.num_keystrokes}, "
+                f"movements={self.num_movements}, nbytes={self.nbytes})")
+
+
+class BehavioralSessionBuilder:
+    """Appends events one at a time into growable typed buffers"""
+
+    def __init__(self, capacity: int = 256):
+        self._key_count = 0
+        self._mouse_count = 0
+        self._key_timestamps = np.empty(capacity, dtype=np.float64)
+        self._ikis = np.empty(capacity, dtype=np.float64)
+        self._key_codes = np.empty(capacity, dtype=np.int16)
+        self._chars = np.empty(capacity, dtype=np.int16)
+        self._mouse_timestamps = np.empty(capacity, dtype=np.float64)
+        self._x = np.empty(capacity, dtype=np.float64)
+        self._y = np.empty(capacity, dtype=np.float64)
+        self._distances = np.empty(capacity, dtype=np.float64)
+        self._velocities = np.empty(capacity, dtype=np.float64)
+        self._vocabulary: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def _intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return MISSING_CODE
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self._vocabulary)
+            self._codes[value] = code
+            self._vocabulary.append(value)
+        return code
+
+    def _grow(self, buffers: List[str]) -> None:
+        for name in buffers:
+            old = getattr(self, name)
+            new = np.empty(max(1, len(old) * 2), dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add_keystroke(self, timestamp: float, iki: Optional[float], key_code: Optional[str],
+                      char: Optional[str] = None) -> None:
+        """Append one keystroke event"""
+        i = self._key_count
+        if i == len(self._key_timestamps):
+            self._grow(['_key_timestamps', '_ikis', '_key_codes', '_chars'])
+        self._key_timestamps[i] = timestamp
+        self._ikis[i] = np.nan if iki is None else iki
+        self._key_codes[i] = self._intern(key_code)
+        self._chars[i] = self._intern(char)
+        self._key_count = i + 1
+
+    def add_mouse(self, timestamp: float, x: float, y: float,
+                  distance: Optional[float], velocity: Optional[float]) -> None:
+        """Append one mouse movement event"""
+        i = self._mouse_count
+        if i == len(self._mouse_timestamps):
+            self._grow(['_mouse_timestamps', '_x', '_y', '_distances', '_velocities'])
+        self._mouse_timestamps[i] = timestamp
+        self._x[i] = x
+        self._y[i] = y
+        self._distances[i] = np.nan if distance is None else distance
+        self._velocities[i] = np.nan if velocity is None else velocity
+        self._mouse_count = i + 1
+
+    def build(self, duration: Any = None) -> BehavioralSession:
+        """Return a session holding copies of the events appended so far"""
+        k, m = self._key_count, self._mouse_count
+        return BehavioralSession(
+            key_timestamps=self._key_timestamps[:k].copy(),
+            ikis=self._ikis[:k].copy(),
+            key_codes=self._key_codes[:k].copy(),
+            chars=self._chars[:k].copy(),
+            vocabulary=list(self._vocabulary),
+            mouse_timestamps=self._mouse_timestamps[:m].copy(),
+            x=self._x[:m].copy(),
+            y=self._y[:m].copy(),
+            distances=self._distances[:m].copy(),
+            velocities=self._velocities[:m].copy(),
+            duration=duration
+        )
@@ -0,0 +1,126 @@
+"""
+Benchmark Scorers - Compare scorer backends on accuracy, latency and model size
+
+Every backend is enrolled on the same per-user enrollment matrices and tested
+on the same genuine and impostor feature vectors:
+
+    python benchmark_scorers.py [--users 50] [--enroll 5] [--seed 0]
+
+Reported per backend: false reject rate (genuine attempts rejected), false
+accept rate (other users' attempts accepted), ROC AUC of the raw scores,
+training time per user, single-attempt and batched scoring latency, and the
+size of the stored model.
+"""
+
+import time
+import argparse
+import numpy as np
+from behavioral_model import BehavioralAuthenticationModel
+from feature_extractor import FeatureExtractor
+from scorers import ISOLATION_FOREST, SCORERS
+
+BACKENDS = [ISOLATION_FOREST] + sorted(SCORERS)
+
+
+def synthetic_population(n_users: int, n_enroll: int, n_test: int, seed: int):
+    """
+    Per-user enrollment and genuine test features around a shared population center
+
+    Returns:
+        Tuple of (enrollment, genuine) arrays of shape (users, samples, features)
+    """
+    rng = np.random.default_rng(seed)
+    timestamps = np.cumsum(rng.uniform(0.2, 0.5, 90))
+    center = FeatureExtractor.extract_all_features({
+        'keystroke_data': [{'timestamp': t, 'iki': iki, 'key_code': key, 'char': key}
+                           for t, iki, key in zip(timestamps, rng.uniform(150, 400, 90), rng.choice(list('abcdef '), 90))],
+        'mouse_data': [{'timestamp': t, 'x': 0, 'y': 0, 'distance': d, 'velocity': v}
+                       for t, d, v in zip(np.linspace(0, 30, 300), rng.uniform(10, 100, 300), rng.uniform(100, 500, 300))],
+        'duration': 30
+    })
+    spread = np.abs(center) + 1.0
+    user_means = center + rng.normal(scale=0.25, size=(n_users, 1, len(center))) * spread
+    within = rng.uniform(0.05, 0.15, size=(n_users, 1, len(center))) * spread
+
+    def sessions(n):
+        return np.maximum(user_means + rng.normal(size=(n_users, n, len(center))) * within, 0.0)
+
+    return sessions(n_enroll), sessions(n_test)
+
+
+def roc_auc(genuine: np.ndarray, impostor: np.ndarray) -> float:
+    """Probability that a genuine attempt outscores an impostor attempt"""
+    scores = np.concatenate([genuine, impostor])
+    ranks = np.argsort(np.argsort(scores, kind='mergesort'), kind='mergesort') + 1
+    genuine_ranks = ranks[:len(genuine)].sum()
+    return float((genuine_ranks - len(genuine) * (len(genuine) + 1) / 2) / (len(genuine) * len(impostor)))
+
+
+def benchmark(backend: str, enrollment: np.ndarray, genuine: np.ndarray, repeats: int = 200) -> dict:
+    n_users = len(enrollment)
+    models = []
+    start = time.perf_counter()
+    for user in range(n_users):
+        model = BehavioralAuthenticationModel(scorer=backend)
+        model.enroll_features(enrollment[user])
+        models.append(model)
+    train_seconds = (time.perf_counter() - start) / n_users
+
+    genuine_scores, impostor_scores = [], []
+    rejected = accepted = impostor_attempts = 0
+    for user, model in enumerate(models):
+        scores, inliers = model.compiled.score(genuine[user])
+        genuine_scores.append(scores)
+        rejected += int((~inliers).sum())
+
+        others = np.delete(genuine, user, axis=0).reshape(-1, genuine.shape[2])
+        scores, inliers = model.compiled.score(others)
+        impostor_scores.append(scores)
+        accepted += int(inliers.sum())
+        impostor_attempts += len(others)
+
+    model = models[0]
+    attempt = genuine[0, :1]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.authenticate_batch(attempt)
+    single_us = (time.perf_counter() - start) / repeats * 1e6
+
+    batch = genuine.reshape(-1, genuine.shape[2])
+    start = time.perf_counter()
+    model.authenticate_batch(batch)
+    batch_us = (time.perf_counter() - start) / len(batch) * 1e6
+
+    return {
+        'frr': rejected / genuine[:, :, 0].size,
+        'far': accepted / impostor_attempts,
+        'auc': float(np.mean([roc_auc(g, i) for g, i in zip(genuine_scores, impostor_scores)])),
+        'train_ms': train_seconds * 1000,
+        'single_us': single_us,
+        'batch_us': batch_us,
+        'model_bytes': model.compiled.nbytes
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare scorer backends on the same enrollment data")
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--enroll', type=int, default=5, help="enrollment samples per user")
+    parser.add_argument('--test', type=int, default=20, help="genuine test samples per user")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backends', nargs='+', default=BACKENDS, choices=BACKENDS)
+    args = parser.parse_args()
+
+    enrollment, genuine = synthetic_population(args.users, args.enroll, args.test, args.seed)
+    print(f"{args.users} users, {args.enroll} enrollment and {args.test} test samples each, "
+          f"{enrollment.shape[2]} features\n")
+    print(f"{'backend':<18}{'FRR':>7}{'FAR':>7}{'AUC':>7}{'train ms':>10}{'1 attempt us':>14}"
+          f"{'batched us':>12}{'bytes':>9}")
+    for backend in args.backends:
+        r = benchmark(backend, enrollment, genuine)
+        print(f"{backend:<18}{r['frr']:>7.3f}{r['far']:>7.3f}{r['auc']:>7.3f}{r['train_ms']:>10.2f}"
+              f"{r['single_us']:>14.1f}{r['batch_us']:>12.2f}{r['model_bytes']:>9}")
+
+
+if __name__ == "__main__":
+    main()
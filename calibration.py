@@ -0,0 +1,53 @@
+"""
+Calibration - Per-profile score thresholds from leave-one-out enrollment scores
+
+Scoring a user's enrollment samples with a profile computed from those same
+samples makes them look more typical than a fresh login will be, and with a
+handful of samples the bias is large. The population model therefore
+scores every enrollment sample against the mean of the user's other samples
+and stores quantiles of those leave-one-out scores; the quantile at the
+contamination level is the user's decision offset. Per-user forests and
+scorers keep the offset they were fitted with.
+"""
+
+import numpy as np
+
+# Quantile levels stored per user; the contamination level is added to these
+LEVELS = (0.0, 0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0)
+
+
+def calibration_levels(contamination: float) -> np.ndarray:
+    """Quantile levels to store, always including the decision level"""
+    return np.unique(np.append(LEVELS, contamination))
+
+
+def quantile_thresholds(scores: np.ndarray, levels: np.ndarray) -> np.ndarray:
+    """Thresholds for one user's held-out scores"""
+    return np.quantile(scores, levels)
+
+
+def group_quantile_thresholds(scores: np.ndarray, counts: np.ndarray, levels: np.ndarray) -> np.ndarray:
+    """
+    Thresholds for many users at once
+
+    Args:
+        scores: Held-out scores of all users, concatenated user by user
+        counts: Number of scores per user
+        levels: Quantile levels
+
+    Returns:
+        Array of shape (n_users, n_levels); rows of users with fewer than two
+        scores are NaN
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    result = np.full((len(counts), len(levels)), np.nan)
+    if len(counts) == 0 or counts.max() == 0:
+        return result
+    padded = np.full((len(counts), int(counts.max())), np.nan)
+    columns = np.arange(len(scores)) - np.repeat(np.cumsum(counts) - counts, counts)
+    padded[np.repeat(np.arange(len(counts)), counts), columns] = scores
+    several = counts > 1
+    if several.any():
+        result[several] = np.nanquantile(padded[several], levels, axis=1).T
+    return result
+
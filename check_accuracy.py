@@ -0,0 +1,82 @@
+"""
+Check Accuracy - FAR/FRR regression check on a synthetic population
+
+Enrolls every user of a SyntheticPopulation through
+BehavioralAuthenticationModel, then authenticates fresh genuine sessions,
+impostor sessions and bot sessions against each user. Exits with status 1
+when a rate is above its limit, so a change to training or scoring that
+quietly raises acceptance of impostors fails the check:
+
+    python check_accuracy.py [--users 30] [--enroll 10] [--max-far 0.15] [--max-frr 0.35]
+
+The limits hold with some margin for the default sizes and seed; lower
+them when a change is meant to improve accuracy.
+"""
+
+import sys
+import argparse
+import numpy as np
+from behavioral_model import BehavioralAuthenticationModel
+from scorers import ISOLATION_FOREST, SCORERS
+from synthetic_population import BOTS, IMPOSTORS, USERS, SyntheticPopulation
+
+BACKENDS = [ISOLATION_FOREST] + sorted(SCORERS)
+
+
+def error_rates(backend: str, population: SyntheticPopulation, n_enroll: int, n_test: int) -> dict:
+    """
+    FRR of genuine sessions and FAR of impostors and bots, over all users
+
+    Enrollment and genuine test sessions come from different streams, so
+    no test session was seen during enrollment.
+    """
+    enrollment = population.features(n_enroll, USERS, stream=0)
+    genuine = population.features(n_test, USERS, stream=1)
+    impostors = population.features(n_test, IMPOSTORS).reshape(-1, enrollment.shape[2])
+    bots = population.features(n_test, BOTS).reshape(-1, enrollment.shape[2])
+
+    rejected = impostors_accepted = bots_accepted = 0
+    for user in range(len(enrollment)):
+        model = BehavioralAuthenticationModel(scorer=backend)
+        model.enroll_features(enrollment[user])
+        rejected += int((~model.authenticate_batch(genuine[user])[0]).sum())
+        impostors_accepted += int(model.authenticate_batch(impostors)[0].sum())
+        if len(bots):
+            bots_accepted += int(model.authenticate_batch(bots)[0].sum())
+
+    n_users = len(enrollment)
+    return {
+        'frr': rejected / genuine[:, :, 0].size,
+        'far': impostors_accepted / (n_users * len(impostors)),
+        'bot_far': bots_accepted / (n_users * len(bots)) if len(bots) else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when FAR or FRR on a synthetic population exceeds its limit")
+    parser.add_argument('--users', type=int, default=30)
+    parser.add_argument('--impostors', type=int, default=30)
+    parser.add_argument('--bots', type=int, default=10)
+    parser.add_argument('--enroll', type=int, default=10, help="enrollment sessions per user")
+    parser.add_argument('--test', type=int, default=20, help="test sessions per user, impostor and bot")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backends', nargs='+', default=[ISOLATION_FOREST], choices=BACKENDS)
+    parser.add_argument('--max-far', type=float, default=0.15, help="limit for impostor and bot acceptance")
+    parser.add_argument('--max-frr', type=float, default=0.35, help="limit for genuine rejection")
+    args = parser.parse_args()
+
+    population = SyntheticPopulation(args.users, args.impostors, args.bots, seed=args.seed)
+    failed = False
+    print(f"{'backend':<18}{'FRR':>7}{'FAR':>7}{'bot FAR':>9}")
+    for backend in args.backends:
+        r = error_rates(backend, population, args.enroll, args.test)
+        over = [name for name, value, limit in (('FRR', r['frr'], args.max_frr), ('FAR', r['far'], args.max_far),
+                                                ('bot FAR', r['bot_far'], args.max_far)) if value > limit]
+        failed = failed or bool(over)
+        print(f"{backend:<18}{r['frr']:>7.3f}{r['far']:>7.3f}{r['bot_far']:>9.3f}"
+              + (f"   FAILED: {', '.join(over)} over limit" if over else ""))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
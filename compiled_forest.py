@@ -0,0 +1,257 @@
+"""
+Compiled Forest - Numpy-only Isolation Forest scorer built from a fitted sklearn model
+"""
+
+import numpy as np
+from typing import Optional, Tuple
+
+LEAF = -1
+
+
+def average_path_length(n_samples) -> np.ndarray:
+    """
+    Average path length of an unsuccessful BST search in a tree of n samples
+
+    Same definition as sklearn's isolation forest uses for the depth
+    correction at leaves and for score normalization.
+    """
+    n = np.asarray(n_samples, dtype=np.float64)
+    result = np.zeros_like(n)
+    result[n == 2] = 1.0
+    deep = n > 2
+    result[deep] = 2.0 * (np.log(n[deep] - 1.0) + np.euler_gamma) - 2.0 * (n[deep] - 1.0) / n[deep]
+    return result
+
+
+class CompiledIsolationForest:
+    """
+    Isolation Forest flattened into contiguous node arrays.
+
+    All trees share one set of arrays: for node i, feature[i] and
+    threshold[i] describe the split (feature is -1 at leaves), left[i] and
+    right[i] are global child indices (leaves point to themselves) and
+    path_length[i] is the node depth plus the average path length correction
+    for the samples that reached it. roots[t] is the root of tree t.
+
+    A StandardScaler in front of the forest can be folded into the split
+    thresholds with fuse_scaler(), after which raw feature vectors are scored
+    directly. input_mean and input_scale then record the fused scaler.
+
+    Scoring walks all trees for all samples at once, one level per
+    iteration, and returns the same score as IsolationForest.score_samples
+    together with the predict() decision.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray,
+                 right: np.ndarray, path_length: np.ndarray, roots: np.ndarray,
+                 tree_norm: np.ndarray, offset: float, max_depth: int,
+                 input_mean: Optional[np.ndarray] = None, input_scale: Optional[np.ndarray] = None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.path_length = path_length
+        self.roots = roots
+        self.tree_norm = tree_norm
+        self.offset = float(offset)
+        self.max_depth = int(max_depth)
+        self.input_mean = input_mean
+        self.input_scale = input_scale
+
+    @property
+    def fused(self) -> bool:
+        return self.input_scale is not None
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (
+            self.feature, self.threshold, self.left, self.right,
+            self.path_length, self.roots, self.tree_norm
+        ))
+
+    @classmethod
+    def from_sklearn(cls, forest) -> 'CompiledIsolationForest':
+        """
+        Flatten a fitted sklearn IsolationForest
+
+        Args:
+            forest: Fitted sklearn.ensemble.IsolationForest
+
+        Returns:
+            Compiled forest scoring identically to the sklearn model
+        """
+        subsample_features = forest._max_features != forest.n_features_in_
+
+        features, thresholds, lefts, rights, path_lengths, roots = [], [], [], [], [], []
+        max_depth = 0
+        base = 0
+
+        for estimator, tree_features in zip(forest.estimators_, forest.estimators_features_):
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            left = tree.children_left.astype(np.int64)
+            right = tree.children_right.astype(np.int64)
+            is_leaf = left == -1
+
+            depth = np.zeros(n_nodes, dtype=np.int64)
+            for node in range(n_nodes):
+                if not is_leaf[node]:
+                    depth[left[node]] = depth[node] + 1
+                    depth[right[node]] = depth[node] + 1
+            max_depth = max(max_depth, int(depth.max()))
+
+            feature = tree.feature.astype(np.int64)
+            if subsample_features:
+                feature = np.asarray(tree_features, dtype=np.int64)[feature]
+
+            node_ids = np.arange(n_nodes, dtype=np.int64)
+            features.append(np.where(is_leaf, LEAF, feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, left) + base)
+            rights.append(np.where(is_leaf, node_ids, right) + base)
+            path_lengths.append(depth + average_path_length(tree.n_node_samples))
+            roots.append(base)
+            base += n_nodes
+
+        n_trees = len(roots)
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.int32),
+            right=np.concatenate(rights).astype(np.int32),
+            path_length=np.concatenate(path_lengths).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            tree_norm=np.full(n_trees, average_path_length([forest._max_samples])[0]),
+            offset=forest.offset_,
+            max_depth=max_depth
+        )
+
+    def fuse_scaler(self, mean: np.ndarray, scale: np.ndarray) -> 'CompiledIsolationForest':
+        """
+        Fold a StandardScaler into the split thresholds
+
+        Each node compares (x[f] - mean[f]) / scale[f] <= t, which for a
+        positive scale is the same as x[f] <= t * scale[f] + mean[f].
+
+        Args:
+            mean: Scaler mean_ per feature
+            scale: Scaler scale_ per feature (strictly positive)
+
+        Returns:
+            New compiled forest that scores unscaled feature vectors
+        """
+        if self.fused:
+            raise ValueError("forest already has a fused scaler")
+
+        mean = np.asarray(mean, dtype=np.float64)
+        scale = np.asarray(scale, dtype=np.float64)
+        split = self.feature != LEAF
+        feature = np.where(split, self.feature, 0)
+        threshold = np.where(split, self.threshold * scale[feature] + mean[feature], 0.0)
+
+        return CompiledIsolationForest(
+            feature=self.feature,
+            threshold=threshold,
+            left=self.left,
+            right=self.right,
+            path_length=self.path_length,
+            roots=self.roots,
+            tree_norm=self.tree_norm,
+            offset=self.offset,
+            max_depth=self.max_depth,
+            input_mean=mean,
+            input_scale=scale
+        )
+
+    def replace_trees(self, n_oldest: int, new_trees: 'CompiledIsolationForest') -> 'CompiledIsolationForest':
+        """
+        Drop the oldest trees and append the trees of another forest
+
+        Trees are kept in age order, oldest first. Both forests must be
+        scaler-fused: their thresholds are then in raw feature space and trees
+        fitted under different scalers can be mixed freely. The offset is
+        copied from new_trees; recompute it for the combined forest with
+        recalibrate_offset().
+
+        Args:
+            n_oldest: Number of trees to remove from the front
+            new_trees: Fused forest whose trees are appended
+
+        Returns:
+            New compiled forest; input_mean and input_scale come from new_trees
+        """
+        if not (self.fused and new_trees.fused):
+            raise ValueError("only scaler-fused forests can exchange trees")
+        n_oldest = min(max(int(n_oldest), 0), self.n_trees)
+
+        start = int(self.roots[n_oldest]) if n_oldest < self.n_trees else self.n_nodes
+        base = self.n_nodes - start
+        kept = slice(start, None)
+
+        return CompiledIsolationForest(
+            feature=np.concatenate([self.feature[kept], new_trees.feature]),
+            threshold=np.concatenate([self.threshold[kept], new_trees.threshold]),
+            left=np.concatenate([self.left[kept] - start, new_trees.left + base]).astype(np.int32),
+            right=np.concatenate([self.right[kept] - start, new_trees.right + base]).astype(np.int32),
+            path_length=np.concatenate([self.path_length[kept], new_trees.path_length]),
+            roots=np.concatenate([self.roots[n_oldest:] - start, new_trees.roots + base]).astype(np.int32),
+            tree_norm=np.concatenate([self.tree_norm[n_oldest:], new_trees.tree_norm]),
+            offset=new_trees.offset,
+            max_depth=max(self.max_depth, new_trees.max_depth),
+            input_mean=new_trees.input_mean,
+            input_scale=new_trees.input_scale
+        )
+
+    def recalibrate_offset(self, X: np.ndarray, contamination: float) -> float:
+        """
+        Set the decision offset so a contamination share of X scores as outliers
+
+        Same rule IsolationForest.fit uses for a numeric contamination.
+        """
+        self.offset = float(np.percentile(self.score_samples(X), 100.0 * contamination))
+        return self.offset
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        """Leaf reached by every sample in every tree, shape (n_samples, n_trees)"""
+        n_samples = X.shape[0]
+        nodes = np.broadcast_to(self.roots, (n_samples, self.n_trees)).copy()
+        rows = np.arange(n_samples)[:, None]
+
+        for _ in range(self.max_depth):
+            feature = self.feature[nodes]
+            values = X[rows, np.maximum(feature, 0)]
+            nodes = np.where(values <= self.threshold[nodes], self.left[nodes], self.right[nodes])
+
+        return nodes
+
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        """Anomaly score per sample; same values as IsolationForest.score_samples"""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        if not self.fused:
+            # sklearn trees compare float32 inputs against float64 thresholds
+            X = X.astype(np.float32).astype(np.float64)
+        depths = self.path_length[self._leaves(X)]
+        # A tree fitted on a single sample has no normalization; sklearn scores it as 1
+        ratios = np.divide(depths, self.tree_norm, out=np.ones_like(depths), where=self.tree_norm != 0)
+        return -(2 ** -ratios.mean(axis=1))
+
+    def score(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score samples and decide in one traversal
+
+        Args:
+            X: One feature vector or a matrix of shape (n_samples, n_features)
+
+        Returns:
+            Tuple of (scores, is_inlier) arrays; is_inlier matches predict() == 1
+        """
+        scores = self.score_samples(X)
+        return scores, scores - self.offset >= 0
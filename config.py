@@ -14,6 +14,10 @@ MODEL_TRAINING ={
 'contamination':0.1 ,
 'random_state':42 ,
 'n_estimators':100 ,
+'scorer':'isolation_forest',
+'population_model':False ,
+'update_trees':10 ,
+'max_enrollment_samples':256 ,
 }
 
 AUTHENTICATION ={
@@ -21,11 +25,20 @@ AUTHENTICATION ={
 'strict_threshold':-0.3 ,
 'lenient_threshold':-0.7 ,
 'confidence_threshold':50 ,
+'max_batch_sessions':1000 ,
+'update_on_success':False ,
 }
 
 USER_MANAGEMENT ={
 'users_directory':'users',
-'model_filename':'model.pkl',
+'model_filename':'model.bin',
+'legacy_model_filename':'model.pkl',
+'population_model_filename':'population.bin',
+'user_store':'filesystem',
+'user_database_filename':'users.db',
+'user_layout':'flat',
+'user_index_filename':'users.idx',
+'ban_write_delay':0 ,
 'metadata_filename':'metadata.json',
 'session_filename_pattern':'session_{}.json',
 }
@@ -45,9 +58,42 @@ FEATURES ={
 PERFORMANCE ={
 'batch_size':5 ,
 'max_cache_size':100 ,
+'model_cache_max_bytes':256 *1024 *1024 ,
+'model_cache_warm_users':0 ,
+'config_cache_size':10000 ,
+'training_workers':None ,
+'training_queue_size':100 ,
+'max_live_streams':1000 ,
+'live_stream_ttl':1800 ,
 'enable_optimization':True ,
 }
 
+ACTIVITY_LOG ={
+'enabled':False ,
+'directory':'activity_log',
+'segment_bytes':16 *1024 *1024 ,
+'index_interval':64 *1024 ,
+'fsync_interval':1.0 ,
+'retention_days':90 ,
+}
+
+ACTIVITY_RETENTION ={
+'max_entries_per_user':1000 ,
+'max_age_days':90 ,
+'max_total_entries':1000000 ,
+'spill_directory':None ,
+}
+
+PASSWORD_HASHING ={
+'version':1 ,
+'schemes':{
+1 :{'algorithm':'sha256','iterations':100000 },
+},
+'workers':None ,
+'max_pending':32 ,
+'timeout':10.0 ,
+}
+
 SECURITY ={
 'enable_encryption':False ,
 'hash_passwords':False ,
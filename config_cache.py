@@ -0,0 +1,137 @@
+"""
+Config Cache - Process-wide LRU cache of parsed JSON files
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Cached contents of a file that does not exist
+_MISSING = object()
+
+
+class JsonFileCache:
+    """
+    Caches parsed JSON files per path.
+
+    Entries are validated against the file's (mtime, inode, size) on every
+    lookup, so a file rewritten by another process costs one os.stat and a
+    re-parse, and an unchanged or still missing file costs only the
+    os.stat. Writers in this process call put() with the data they just
+    wrote (or invalidate()), so their own writes never need a re-read. The
+    cache is bounded by entry count and evicts least recently used paths
+    first.
+
+    Lookups return a shallow copy, so callers may change the top-level
+    fields of what they get without touching the cached value.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[Tuple[int, int, int], Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _signature(path: str) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    @staticmethod
+    def _copy(data: Any) -> Any:
+        if isinstance(data, dict):
+            return dict(data)
+        if isinstance(data, list):
+            return list(data)
+        return data
+
+    def get(self, path: str, default: Any = None) -> Any:
+        """
+        Parsed contents of a JSON file
+
+        Args:
+            path: File to read
+            default: Returned if the file does not exist
+
+        Returns:
+            Shallow copy of the parsed JSON, or default
+        """
+        signature = self._signature(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                if entry[0] == signature:
+                    self._entries.move_to_end(path)
+                    self.hits += 1
+                    return default if entry[1] is _MISSING else self._copy(entry[1])
+                del self._entries[path]
+                self.invalidations += 1
+            self.misses += 1
+
+        if signature is None:
+            self._store(path, None, _MISSING)
+            return default
+
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return default
+
+        self._store(path, signature, data)
+        return self._copy(data)
+
+    def put(self, path: str, data: Any) -> None:
+        """Record data this process just wrote to path (write-through)"""
+        signature = self._signature(path)
+        if signature is None:
+            self.invalidate(path)
+        else:
+            self._store(path, signature, self._copy(data))
+
+    def _store(self, path: str, signature: Optional[Tuple[int, int, int]], data: Any) -> None:
+        with self._lock:
+            self._entries[path] = (signature, data)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, path: str) -> None:
+        """Forget the cached contents of a file"""
+        with self._lock:
+            if self._entries.pop(path, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        """Forget every cached file under a directory"""
+        with self._lock:
+            for path in [p for p in self._entries if p.startswith(prefix)]:
+                del self._entries[path]
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'cached_files': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0
+            }
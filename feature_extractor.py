@@ -3,7 +3,88 @@ Feature Extractor - Extracts behavioral biometric features from raw data
 """
 
 import numpy as np 
-from typing import Dict ,List ,Tuple 
+from typing import Dict ,List ,Tuple ,Union 
+from behavioral_session import BehavioralSession 
+
+KEYSTROKE_FEATURES =[
+'iki_mean','iki_std','iki_min','iki_max','iki_median','iki_q25','iki_q75',
+'total_keystrokes','keystroke_rate','unique_keys'
+]
+
+MOUSE_FEATURES =[
+'distance_mean','distance_std','distance_min','distance_max',
+'distance_median','distance_total','velocity_mean','velocity_std',
+'velocity_min','velocity_max','velocity_median','total_movements','movement_rate'
+]
+
+
+def _segment_starts (counts :np .ndarray )->np .ndarray :
+    """Start offset of each segment in a ragged array given per-segment lengths"""
+    starts =np .zeros (len (counts ),dtype =np .int64 )
+    np .cumsum (counts [:-1 ],out =starts [1 :])
+    return starts 
+
+
+def _segment_stats (values :np .ndarray ,counts :np .ndarray )->Dict [str ,np .ndarray ]:
+    """
+    Per-segment reductions over a ragged array
+
+    Every segment must be non-empty. Percentiles use the same linear
+    interpolation as np.percentile and the median matches np.median.
+
+    Args:
+        values: Concatenated values of all segments
+        counts: Length of each segment
+
+    Returns:
+        Dictionary of per-segment mean, std, min, max, sum, median, q25 and q75
+    """
+    starts =_segment_starts (counts )
+    seg_ids =np .repeat (np .arange (len (counts )),counts )
+
+    totals =np .add .reduceat (values ,starts )
+    means =totals /counts
+    deviations =values -means [seg_ids ]
+    stds =np .sqrt (np .add .reduceat (deviations *deviations ,starts )/counts )
+
+    order =np .lexsort ((values ,seg_ids ))
+    sorted_values =values [order ]
+    last =counts -1
+
+    def percentile (q :float )->np .ndarray :
+        position =last *(q /100.0 )
+        lower =np .floor (position ).astype (np .int64 )
+        upper =np .minimum (lower +1 ,last )
+        t =position -lower
+        a =sorted_values [starts +lower ]
+        b =sorted_values [starts +upper ]
+        diff =b -a
+        return np .where (t >=0.5 ,b -diff *(1 -t ),a +diff *t )
+
+    middle_low =sorted_values [starts +last //2 ]
+    middle_high =sorted_values [starts +counts //2 ]
+
+    return {
+    'mean':means ,
+    'std':stds ,
+    'min':sorted_values [starts ],
+    'max':sorted_values [starts +last ],
+    'sum':totals ,
+    'median':(middle_low +middle_high )/2 ,
+    'q25':percentile (25 ),
+    'q75':percentile (75 ),
+    }
+
+
+def _concatenate (chunks :List )->np .ndarray :
+    """Concatenate per-session value lists or arrays into one float64 array"""
+    return np .concatenate ([np .asarray (chunk ,dtype =np .float64 )for chunk in chunks ])
+
+
+def _event_rate (counts :np .ndarray ,spans :np .ndarray )->np .ndarray :
+    """Events per second as computed by the per-session extractor"""
+    return np .where (counts >1 ,counts /np .maximum (1 ,spans ),0 )
+
 
 class FeatureExtractor :
     """Extract behavioral biometric features from keystroke and mouse data"""
@@ -89,52 +170,336 @@ class FeatureExtractor :
         return features 
 
     @staticmethod 
-    def extract_all_features (data :Dict )->np .ndarray :
+    def extract_all_features (data :Union [Dict ,BehavioralSession ])->np .ndarray :
         """
         Extract all features and return as feature vector
         
         Args:
-            data: Raw behavioral data from collector
+            data: Raw behavioral data from collector, as a dict or a BehavioralSession
             
         Returns:
             Feature vector as numpy array
         """
+        if isinstance (data ,BehavioralSession ):
+            return FeatureExtractor .extract_features_batch ([data ])[0 ]
+
         keystroke_features =FeatureExtractor .extract_keystroke_features (data .get ('keystroke_data',[]))
         mouse_features =FeatureExtractor .extract_mouse_features (data .get ('mouse_data',[]))
 
         feature_vector =[]
 
-        feature_order_keystroke =[
-        'iki_mean','iki_std','iki_min','iki_max','iki_median','iki_q25','iki_q75',
-        'total_keystrokes','keystroke_rate','unique_keys'
-        ]
-
-        feature_order_mouse =[
-        'distance_mean','distance_std','distance_min','distance_max',
-        'distance_median','distance_total','velocity_mean','velocity_std',
-        'velocity_min','velocity_max','velocity_median','total_movements','movement_rate'
-        ]
-
-        for feature in feature_order_keystroke :
+        for feature in KEYSTROKE_FEATURES :
             feature_vector .append (keystroke_features .get (feature ,0 ))
 
-        for feature in feature_order_mouse :
+        for feature in MOUSE_FEATURES :
             feature_vector .append (mouse_features .get (feature ,0 ))
 
         return np .array (feature_vector )
 
+    @staticmethod 
+    def extract_features_batch (sessions :List [Union [Dict ,BehavioralSession ]])->np .ndarray :
+        """
+        Extract feature vectors for many sessions in one vectorized pass
+        
+        Event values of all sessions are concatenated into ragged arrays and
+        reduced per session with segment offsets, so the cost is a handful of
+        numpy calls regardless of the number of sessions. Produces the same
+        values as extract_all_features applied to each session.
+        
+        Args:
+            sessions: List of raw behavioral data dictionaries or BehavioralSession objects
+            
+        Returns:
+            Feature matrix of shape (len(sessions), 23)
+        """
+        n_sessions =len (sessions )
+        features =np .zeros ((n_sessions ,len (KEYSTROKE_FEATURES )+len (MOUSE_FEATURES )))
+        if n_sessions ==0 :
+            return features 
+
+        ikis ,iki_counts =[],np .ones (n_sessions ,dtype =np .int64 )
+        distances ,distance_counts =[],np .ones (n_sessions ,dtype =np .int64 )
+        velocities ,velocity_counts =[],np .ones (n_sessions ,dtype =np .int64 )
+        keystrokes =np .zeros (n_sessions )
+        keystroke_spans =np .zeros (n_sessions )
+        unique_keys =np .zeros (n_sessions )
+        movements =np .zeros (n_sessions )
+        movement_spans =np .zeros (n_sessions )
+        no_values =np .zeros (1 )
+
+        # Sessions without usable values contribute a single 0, which is what the
+        # per-session path falls back to and yields all-zero statistics.
+        for i ,data in enumerate (sessions ):
+            if isinstance (data ,BehavioralSession ):
+                values =data .ikis [~np .isnan (data .ikis )]
+                ikis .append (values if len (values )else no_values )
+                keystrokes [i ]=data .num_keystrokes 
+                if data .num_keystrokes :
+                    keystroke_spans [i ]=data .key_timestamps [-1 ]-data .key_timestamps [0 ]
+                    unique_keys [i ]=len (np .unique (data .key_codes ))
+
+                values =data .distances [~np .isnan (data .distances )]
+                distances .append (values if len (values )else no_values )
+                values =data .velocities [~np .isnan (data .velocities )]
+                velocities .append (values if len (values )else no_values )
+                movements [i ]=data .num_movements 
+                if data .num_movements :
+                    movement_spans [i ]=data .mouse_timestamps [-1 ]-data .mouse_timestamps [0 ]
+            else :
+                keystroke_data =data .get ('keystroke_data',[])
+                ikis .append ([k ['iki']for k in keystroke_data if k ['iki']is not None ]or [0 ])
+                keystrokes [i ]=len (keystroke_data )
+                if keystroke_data :
+                    keystroke_spans [i ]=keystroke_data [-1 ]['timestamp']-keystroke_data [0 ]['timestamp']
+                    unique_keys [i ]=len (set (k ['key_code']for k in keystroke_data ))
+
+                mouse_data =data .get ('mouse_data',[])
+                distances .append ([m ['distance']for m in mouse_data if m ['distance']is not None ]or [0 ])
+                velocities .append ([m ['velocity']for m in mouse_data if m ['velocity']is not None ]or [0 ])
+                movements [i ]=len (mouse_data )
+                if mouse_data :
+                    movement_spans [i ]=mouse_data [-1 ]['timestamp']-mouse_data [0 ]['timestamp']
+
+            iki_counts [i ]=len (ikis [-1 ])
+            distance_counts [i ]=len (distances [-1 ])
+            velocity_counts [i ]=len (velocities [-1 ])
+
+        iki =_segment_stats (_concatenate (ikis ),iki_counts )
+        distance =_segment_stats (_concatenate (distances ),distance_counts )
+        velocity =_segment_stats (_concatenate (velocities ),velocity_counts )
+
+        columns =[
+        iki ['mean'],iki ['std'],iki ['min'],iki ['max'],iki ['median'],iki ['q25'],iki ['q75'],
+        keystrokes ,_event_rate (keystrokes ,keystroke_spans ),unique_keys ,
+        distance ['mean'],distance ['std'],distance ['min'],distance ['max'],
+        distance ['median'],distance ['sum'],velocity ['mean'],velocity ['std'],
+        velocity ['min'],velocity ['max'],velocity ['median'],movements ,_event_rate (movements ,movement_spans ),
+        ]
+        for j ,column in enumerate (columns ):
+            features [:,j ]=column 
+
+        return features 
+
     @staticmethod 
     def get_feature_names ()->List [str ]:
         """Get the list of all feature names in order"""
-        keystroke_features =[
-        'iki_mean','iki_std','iki_min','iki_max','iki_median','iki_q25','iki_q75',
-        'total_keystrokes','keystroke_rate','unique_keys'
-        ]
+        return KEYSTROKE_FEATURES +MOUSE_FEATURES 
 
-        mouse_features =[
-        'distance_mean','distance_std','distance_min','distance_max',
-        'distance_median','distance_total','velocity_mean','velocity_std',
-        'velocity_min','velocity_max','velocity_median','total_movements','movement_rate'
-        ]
 
-        return keystroke_features +mouse_features 
+# Streams keep their values and compute exact percentiles up to this many
+# observations, then switch to P-square estimates seeded from them
+EXACT_QUANTILE_VALUES =512 
+
+
+class _P2Quantile :
+    """
+    Streaming quantile estimate with the P-square algorithm (Jain & Chlamtac)
+
+    Keeps five markers and updates them in O(1) per observation. The markers
+    are seeded from the sorted values seen so far, at the ranks they would
+    have reached had the estimator run from the start.
+    """
+
+    def __init__ (self ,q :float ,sorted_values :List [float ]):
+        n =len (sorted_values )
+        self .q =q 
+        self .count =n 
+        self .increments =[0.0 ,q /2 ,q ,(1 +q )/2 ,1.0 ]
+        self .desired =[1.0 +p *(n -1 )for p in self .increments ]
+        positions =[]
+        for i ,p in enumerate (self .increments ):
+            position =min (max (1 +round (p *(n -1 )),positions [-1 ]+1 if positions else 1 ),n -4 +i )
+            positions .append (float (position ))
+        self .positions =positions 
+        self .heights =[float (sorted_values [int (position )-1 ])for position in positions ]
+
+    def add (self ,x :float )->None :
+        self .count +=1 
+        heights =self .heights 
+
+        if x <heights [0 ]:
+            heights [0 ]=x 
+            k =0 
+        elif x >=heights [4 ]:
+            heights [4 ]=x 
+            k =3 
+        else :
+            k =0 
+            while x >=heights [k +1 ]:
+                k +=1 
+
+        positions =self .positions 
+        for i in range (k +1 ,5 ):
+            positions [i ]+=1 
+        for i in range (5 ):
+            self .desired [i ]+=self .increments [i ]
+
+        for i in (1 ,2 ,3 ):
+            d =self .desired [i ]-positions [i ]
+            if (d >=1 and positions [i +1 ]-positions [i ]>1 )or (d <=-1 and positions [i -1 ]-positions [i ]<-1 ):
+                d =1 if d >0 else -1 
+                candidate =heights [i ]+d /(positions [i +1 ]-positions [i -1 ])*(
+                (positions [i ]-positions [i -1 ]+d )*(heights [i +1 ]-heights [i ])/(positions [i +1 ]-positions [i ])+
+                (positions [i +1 ]-positions [i ]-d )*(heights [i ]-heights [i -1 ])/(positions [i ]-positions [i -1 ])
+                )
+                if not heights [i -1 ]<candidate <heights [i +1 ]:
+                    candidate =heights [i ]+d *(heights [i +d ]-heights [i ])/(positions [i +d ]-positions [i ])
+                heights [i ]=candidate 
+                positions [i ]+=d 
+
+    def value (self )->float :
+        return self .heights [2 ]
+
+
+class _RunningStats :
+    """
+    Welford mean/variance plus running min, max, sum and quantiles
+
+    Quantiles are exact np.percentile values over the first
+    EXACT_QUANTILE_VALUES observations, which covers typical login sessions,
+    and P-square estimates after that.
+    """
+
+    def __init__ (self ,quantiles :Tuple =(0.5 ,)):
+        self .count =0 
+        self .mean =0.0 
+        self .m2 =0.0 
+        self .total =0.0 
+        self .minimum =0.0 
+        self .maximum =0.0 
+        self .levels =quantiles 
+        self .values =[]
+        self .quantiles ={}
+
+    def add (self ,x :float )->None :
+        self .count +=1 
+        delta =x -self .mean 
+        self .mean +=delta /self .count 
+        self .m2 +=delta *(x -self .mean )
+        self .total +=x 
+        if self .count ==1 :
+            self .minimum =self .maximum =x 
+        elif x <self .minimum :
+            self .minimum =x 
+        elif x >self .maximum :
+            self .maximum =x 
+
+        if self .values is None :
+            for estimator in self .quantiles .values ():
+                estimator .add (x )
+            return 
+        self .values .append (x )
+        if len (self .values )>EXACT_QUANTILE_VALUES :
+            values =sorted (self .values )
+            self .quantiles ={q :_P2Quantile (q ,values )for q in self .levels }
+            self .values =None 
+
+    @property 
+    def std (self )->float :
+        return (self .m2 /self .count )**0.5 if self .count else 0.0 
+
+    def quantile (self ,q :float )->float :
+        if self .values is None :
+            return self .quantiles [q ].value ()
+        return float (np .percentile (self .values ,q *100 ))if self .values else 0.0 
+
+
+class StreamingFeatureAccumulator :
+    """
+    Incremental version of FeatureExtractor for live sessions
+
+    Events are folded into running statistics in O(1) each, so the 23-feature
+    vector can be emitted at any moment without keeping the event history.
+    Mean, std, min, max, totals, counts and rates are exact; medians and
+    quartiles are exact for the first EXACT_QUANTILE_VALUES values of each
+    statistic and P-square estimates beyond that.
+    """
+
+    def __init__ (self ):
+        self .reset ()
+
+    def reset (self )->None :
+        """Forget all events seen so far"""
+        self .iki =_RunningStats ((0.25 ,0.5 ,0.75 ))
+        self .distance =_RunningStats ()
+        self .velocity =_RunningStats ()
+        self .keystrokes =0 
+        self .movements =0 
+        self .first_key_time =None 
+        self .last_key_time =None 
+        self .first_mouse_time =None 
+        self .last_mouse_time =None 
+        self .key_codes =set ()
+
+    def add_keystroke (self ,timestamp :float ,iki :float =None ,key_code :str =None )->None :
+        """Fold one keystroke event into the running statistics"""
+        self .keystrokes +=1 
+        if self .first_key_time is None :
+            self .first_key_time =timestamp 
+        self .last_key_time =timestamp 
+        self .key_codes .add (key_code )
+        if iki is not None :
+            self .iki .add (iki )
+
+    def add_mouse (self ,timestamp :float ,distance :float =None ,velocity :float =None )->None :
+        """Fold one mouse movement event into the running statistics"""
+        self .movements +=1 
+        if self .first_mouse_time is None :
+            self .first_mouse_time =timestamp 
+        self .last_mouse_time =timestamp 
+        if distance is not None :
+            self .distance .add (distance )
+        if velocity is not None :
+            self .velocity .add (velocity )
+
+    def update (self ,data :Union [Dict ,BehavioralSession ])->None :
+        """
+        Fold a chunk of events into the running statistics
+        
+        Args:
+            data: Events in the collector's dict format or as a BehavioralSession
+        """
+        if isinstance (data ,BehavioralSession ):
+            data =data .to_dict ()
+        for k in data .get ('keystroke_data',[]):
+            self .add_keystroke (k ['timestamp'],k .get ('iki'),k .get ('key_code'))
+        for m in data .get ('mouse_data',[]):
+            self .add_mouse (m ['timestamp'],m .get ('distance'),m .get ('velocity'))
+
+    @property 
+    def event_count (self )->int :
+        return self .keystrokes +self .movements 
+
+    def features (self )->np .ndarray :
+        """
+        Emit the current feature vector
+        
+        Returns:
+            Feature vector in FeatureExtractor.get_feature_names() order
+        """
+        vector =np .zeros (len (KEYSTROKE_FEATURES )+len (MOUSE_FEATURES ))
+
+        if self .keystrokes :
+            iki =self .iki 
+            span =self .last_key_time -self .first_key_time 
+            vector [:len (KEYSTROKE_FEATURES )]=[
+            iki .mean ,iki .std ,iki .minimum ,iki .maximum ,
+            iki .quantile (0.5 ),iki .quantile (0.25 ),iki .quantile (0.75 ),
+            self .keystrokes ,
+            self .keystrokes /max (1 ,span )if self .keystrokes >1 else 0 ,
+            len (self .key_codes ),
+            ]
+
+        if self .movements :
+            distance ,velocity =self .distance ,self .velocity 
+            span =self .last_mouse_time -self .first_mouse_time 
+            vector [len (KEYSTROKE_FEATURES ):]=[
+            distance .mean ,distance .std ,distance .minimum ,distance .maximum ,
+            distance .quantile (0.5 ),distance .total ,
+            velocity .mean ,velocity .std ,velocity .minimum ,velocity .maximum ,
+            velocity .quantile (0.5 ),
+            self .movements ,
+            self .movements /max (1 ,span )if self .movements >1 else 0 ,
+            ]
+
+        return vector 
@@ -0,0 +1,222 @@
+"""
+Feature Schema - One versioned definition of the behavioral feature vector
+
+Every scoring path builds its vectors through FEATURE_SCHEMA: the CLI and
+streaming paths from raw keystroke and mouse events (FeatureExtractor), the
+web paths from the feature dictionaries computed by behavioral_collector.js.
+Both land in the same column order, as float32, the precision the compiled
+forest compares at anyway.
+
+The browser computes only some of the features, and not all of them the way
+FeatureExtractor does. CLIENT_FEATURES lists the ones it does compute with
+the same meaning; models trained on web data read only those columns, and
+missing() reports which of a model's features a payload would leave at their
+default instead of silently scoring zeros.
+
+Model artifacts record the schema id and feature names they were trained
+with. A model whose features are a reordering or subset of the current
+schema (directly or through aliases) is scored through a column mapping;
+anything else raises FeatureSchemaMismatch instead of being scored on
+misaligned columns.
+"""
+
+import numpy as np
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+from feature_extractor import FeatureExtractor, KEYSTROKE_FEATURES, MOUSE_FEATURES
+
+SCHEMA_NAME = 'behavioral'
+SCHEMA_VERSION = 1
+
+# Keys behavioral_collector.js uses for features the schema names differently
+CLIENT_ALIASES = {
+    'velocity_mean': ('mouse_velocity',),
+    'velocity_max': ('mouse_velocity_max',),
+    'distance_total': ('mouse_distance',),
+    'distance_mean': ('mouse_distance_mean',),
+}
+
+# Features behavioral_collector.js computes with the same meaning as FeatureExtractor.
+# Its keystroke_rate is taken over mouse timestamps and its click_rate and
+# mouse_acceleration have no schema column, so none of those are used.
+CLIENT_FEATURES = [
+    'iki_mean', 'iki_std', 'iki_min', 'iki_max', 'total_keystrokes', 'unique_keys',
+    'distance_mean', 'distance_total', 'velocity_mean', 'velocity_max',
+]
+
+
+class FeatureSchemaMismatch(ValueError):
+    """Raised when a feature vector or model does not match the feature schema"""
+
+
+class FeatureSpec:
+    """One column of the feature vector"""
+
+    __slots__ = ('name', 'index', 'dtype', 'default', 'aliases')
+
+    def __init__(self, name: str, index: int, dtype=np.float32, default: float = 0.0,
+                 aliases: Tuple[str, ...] = ()):
+        self.name = name
+        self.index = index
+        self.dtype = np.dtype(dtype)
+        self.default = default
+        self.aliases = tuple(aliases)
+
+    def __repr__(self) -> str:
+        return f"FeatureSpec({self.name!r}, index={self.index})"
+
+
+class FeatureSchema:
+    """
+    Ordered, versioned set of FeatureSpecs
+
+    Lookups are compiled once: every name and alias maps straight to its
+    column, so filling a vector from a dictionary is one pass over the
+    dictionary's keys.
+    """
+
+    def __init__(self, name: str, version: int, specs: Sequence[FeatureSpec]):
+        self.name = name
+        self.version = version
+        self.specs = list(specs)
+        self.names = [spec.name for spec in self.specs]
+        self.defaults = np.array([spec.default for spec in self.specs], dtype=np.float32)
+        self.lookup = {}
+        for spec in self.specs:
+            for key in (spec.name,) + spec.aliases:
+                self.lookup[key] = spec.index
+
+    @classmethod
+    def from_names(cls, name: str, version: int, names: Iterable[str],
+                   aliases: Optional[Mapping[str, Tuple[str, ...]]] = None) -> 'FeatureSchema':
+        aliases = aliases or {}
+        return cls(name, version, [FeatureSpec(feature, i, aliases=aliases.get(feature, ()))
+                                   for i, feature in enumerate(names)])
+
+    @property
+    def id(self) -> str:
+        return f"{self.name}/{self.version}"
+
+    def __len__(self) -> int:
+        return len(self.specs)
+
+    def vector(self) -> np.ndarray:
+        """Fresh vector filled with the feature defaults"""
+        return self.defaults.copy()
+
+    def matrix(self, n: int) -> np.ndarray:
+        """Fresh (n, n_features) matrix filled with the feature defaults"""
+        return np.tile(self.defaults, (n, 1))
+
+    def from_client(self, features: Mapping, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Vector from a client-computed feature dictionary
+
+        Unknown keys are ignored and missing features keep their default.
+
+        Args:
+            features: Dictionary from behavioral_collector.js extractFeatures()
+            out: Vector to fill in place (default: a new one)
+        """
+        if out is None:
+            out = self.vector()
+        else:
+            out[:] = self.defaults
+        lookup = self.lookup
+        for key, value in features.items():
+            column = lookup.get(key)
+            if column is not None and value is not None:
+                out[column] = value
+        return out
+
+    def missing(self, features: Mapping, names: Sequence[str]) -> List[str]:
+        """
+        Features among names that a client dictionary has no value for
+
+        from_client leaves these at their default, so a model reading any of
+        them would score a made-up value.
+        """
+        present = {self.lookup[key] for key, value in features.items()
+                   if value is not None and key in self.lookup}
+        return [name for name in names if self.lookup[name] not in present]
+
+    def from_client_batch(self, dicts: Sequence[Mapping]) -> np.ndarray:
+        """Matrix of from_client vectors, one row per dictionary"""
+        out = self.matrix(len(dicts))
+        lookup = self.lookup
+        for row, features in zip(out, dicts):
+            for key, value in features.items():
+                column = lookup.get(key)
+                if column is not None and value is not None:
+                    row[column] = value
+        return out
+
+    def from_events(self, sessions: List, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Matrix from raw keystroke and mouse events
+
+        Args:
+            sessions: Behavioral data dicts or BehavioralSessions
+            out: (len(sessions), n_features) matrix to fill in place
+        """
+        features = FeatureExtractor.extract_features_batch(sessions)
+        if out is None:
+            return features.astype(np.float32)
+        out[:] = features
+        return out
+
+    def columns_for(self, feature_names: Sequence[str], schema_id: Optional[str] = None) -> Optional[np.ndarray]:
+        """
+        Columns of this schema's vectors that a model trained on feature_names reads
+
+        Args:
+            feature_names: Feature names recorded with the model
+            schema_id: Schema id recorded with the model, if any
+
+        Returns:
+            None if the model was trained on this schema as-is, otherwise an
+            index array selecting and ordering the model's columns. A model
+            recorded under another schema id always gets the explicit
+            mapping, even when its feature names match this schema's.
+
+        Raises:
+            FeatureSchemaMismatch: if a model feature is not in this schema
+        """
+        names = list(feature_names)
+        if names == self.names and schema_id in (None, self.id):
+            return None
+        missing = [name for name in names if name not in self.lookup]
+        if missing:
+            raise FeatureSchemaMismatch(
+                f"Model trained with schema {schema_id or 'unversioned'} uses features "
+                f"{missing} not in schema {self.id}; retrain it (retrain_all.py)")
+        return np.array([self.lookup[name] for name in names], dtype=np.int64)
+
+    def to_schema(self, X: np.ndarray, feature_names: Sequence[str],
+                  schema_id: Optional[str] = None) -> np.ndarray:
+        """
+        Rearrange a matrix stored in another feature order into this schema
+
+        Features the stored matrix lacks get their default, so enrollment
+        data persisted under an older schema can be retrained.
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        self.check_width(X, len(feature_names))
+        columns = self.columns_for(feature_names, schema_id)
+        if columns is None:
+            return X
+        out = self.matrix(len(X)).astype(np.float64)
+        out[:, columns] = X
+        return out
+
+    def check_width(self, X: np.ndarray, expected: int) -> None:
+        """Raise FeatureSchemaMismatch unless X has expected columns"""
+        if X.shape[-1] != expected:
+            raise FeatureSchemaMismatch(
+                f"Feature vector has {X.shape[-1]} values, expected {expected} ({self.id})")
+
+    def to_dict(self) -> Dict:
+        return {'id': self.id, 'features': self.names}
+
+
+FEATURE_SCHEMA = FeatureSchema.from_names(SCHEMA_NAME, SCHEMA_VERSION, KEYSTROKE_FEATURES + MOUSE_FEATURES,
+                                          CLIENT_ALIASES)
@@ -10,6 +10,7 @@ class AuthenticationApp :
 
     def __init__ (self ):
         self .manager =UserManager ()
+        self .manager .warm_model_cache ()
 
     def display_menu (self ):
         """Display main menu"""
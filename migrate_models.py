@@ -0,0 +1,57 @@
+"""
+Migrate Models - Convert legacy joblib model.pkl files to model artifacts
+"""
+
+import os
+import argparse
+from behavioral_model import BehavioralAuthenticationModel
+from config import USER_MANAGEMENT
+from user_store import iter_user_dirs
+
+
+def migrate_user(user_path: str, keep_pickle: bool = False) -> bool:
+    """
+    Convert one user's model.pkl into a model artifact
+
+    Returns:
+        True if the user's model was converted
+    """
+    legacy_file = os.path.join(user_path, USER_MANAGEMENT['legacy_model_filename'])
+    model_file = os.path.join(user_path, USER_MANAGEMENT['model_filename'])
+
+    model = BehavioralAuthenticationModel()
+    model.load_model(legacy_file)
+    if not model.is_trained:
+        print(f"Skipping untrained model {legacy_file}")
+        return False
+
+    model.save_model(model_file)
+    if not keep_pickle:
+        os.remove(legacy_file)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert legacy model.pkl files to model artifacts")
+    parser.add_argument('--users-dir', default=USER_MANAGEMENT['users_directory'])
+    parser.add_argument('--keep-pickle', action='store_true', help="keep model.pkl after converting")
+    args = parser.parse_args()
+
+    legacy_files = [os.path.join(user_path, USER_MANAGEMENT['legacy_model_filename'])
+                    for _, user_path in iter_user_dirs(args.users_dir)]
+    legacy_files = [legacy_file for legacy_file in legacy_files if os.path.exists(legacy_file)]
+    converted = 0
+    failed = 0
+    for legacy_file in sorted(legacy_files):
+        try:
+            if migrate_user(os.path.dirname(legacy_file), keep_pickle=args.keep_pickle):
+                converted += 1
+        except Exception as e:
+            failed += 1
+            print(f"Error converting {legacy_file}: {e}")
+
+    print(f"Migration complete. Converted {converted} model(s), {failed} failed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Migrate User Layout - Move user directories between the flat and sharded layouts
+
+    python migrate_user_layout.py [--users-dir users] [--to sharded|flat] [--reindex] [--dry-run]
+
+Safe to run while the app is serving: each directory is moved with a single
+os.rename while holding the lock of its config.json, and the user store
+finds users in either layout, so every user stays reachable throughout.
+Set USER_MANAGEMENT['user_layout'] to the new layout once it finishes, then
+run it again to move any users created under the old setting in between.
+The user index is built if it is missing; --reindex rebuilds it from disk.
+"""
+
+import os
+import time
+import argparse
+from atomic_json import file_lock
+from config import USER_MANAGEMENT
+from user_store import CONFIG_FILENAME, FLAT, SHARDED, FileSystemUserStore, is_shard_name, iter_user_dirs, layout_path
+
+
+def move_user(users_dir: str, username: str, source: str, target: str) -> None:
+    """Move one user directory, holding its config.json lock"""
+    with file_lock(os.path.join(source, CONFIG_FILENAME)):
+        if target.startswith(source + os.sep):
+            # User 'ab' whose own shard is users/ab/: step aside so the shard directory can be created
+            staging = os.path.join(users_dir, f".moving-{username}")
+            os.rename(source, staging)
+            source = staging
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.rename(source, target)
+    # Drop shard directories the move emptied
+    parent = os.path.dirname(source)
+    while os.path.abspath(parent) != os.path.abspath(users_dir):
+        try:
+            os.rmdir(parent)
+        except OSError:
+            break
+        parent = os.path.dirname(parent)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move user directories to the flat or sharded layout")
+    parser.add_argument('--users-dir', default=USER_MANAGEMENT['users_directory'])
+    parser.add_argument('--to', choices=[FLAT, SHARDED], default=SHARDED)
+    parser.add_argument('--reindex', action='store_true', help="rebuild the user index from disk")
+    parser.add_argument('--dry-run', action='store_true', help="only report what would move")
+    parser.add_argument('--report-every', type=int, default=1000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    moved = unchanged = failed = 0
+    # Materialize first: renaming while os.scandir walks the same directories may skip or repeat entries.
+    # Users named like a shard directory ('ab') move first to the sharded layout, so their directory
+    # is gone before users/ab/ is needed as a shard, and last to the flat one, once users/ab/ is empty.
+    users = list(iter_user_dirs(args.users_dir))
+    users.sort(key=lambda user: is_shard_name(user[0]) != (args.to == SHARDED))
+    for username, source in users:
+        target = layout_path(args.users_dir, username, args.to)
+        if os.path.abspath(source) == os.path.abspath(target):
+            unchanged += 1
+            continue
+        if os.path.exists(target):
+            failed += 1
+            print(f"Skipping {username}: {target} already exists")
+            continue
+        if not args.dry_run:
+            try:
+                move_user(args.users_dir, username, source, target)
+            except OSError as e:
+                failed += 1
+                print(f"Error moving {username}: {e}")
+                continue
+        moved += 1
+        if moved % args.report_every == 0:
+            print(f"{moved} users moved")
+
+    if not args.dry_run:
+        store = FileSystemUserStore(args.users_dir, layout=args.to)
+        if args.reindex:
+            print(f"Indexed {store.rebuild_index()} user(s)")
+        else:
+            print(f"Index holds {store.count_users()} user(s)")
+
+    elapsed = time.perf_counter() - start
+    verb = "would move" if args.dry_run else "moved"
+    print(f"Layout migration to '{args.to}' complete in {elapsed:.1f}s: {moved} user(s) {verb}, "
+          f"{unchanged} already in place, {failed} failed")
+    if not args.dry_run and args.to != USER_MANAGEMENT['user_layout']:
+        print(f"Set USER_MANAGEMENT['user_layout'] = '{args.to}' and run again to catch users created meanwhile")
+
+
+if __name__ == "__main__":
+    main()
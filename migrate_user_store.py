@@ -0,0 +1,70 @@
+"""
+Migrate User Store - Copy a filesystem users/ tree into the SQLite user store
+
+    python migrate_user_store.py [--users-dir users] [--database users/users.db] [--batch-size 500]
+
+User directories are streamed with os.scandir and written in batches, one
+transaction per batch, so memory stays flat for any number of users.
+Records are inserted or replaced, so the migration can be re-run. Model
+artifacts stay where they are. Set USER_MANAGEMENT['user_store'] to
+'sqlite' afterwards.
+"""
+
+import os
+import json
+import time
+import argparse
+from typing import Dict, Iterator, Tuple
+from config import USER_MANAGEMENT
+from user_store import CONFIG_FILENAME, FileSystemUserStore, SQLiteUserStore, iter_user_dirs
+
+
+def iter_records(users_dir: str) -> Iterator[Tuple[str, Dict]]:
+    """Yield (username, record) for every user directory; record is None if unreadable"""
+    for username, user_path in iter_user_dirs(users_dir):
+        try:
+            with open(os.path.join(user_path, CONFIG_FILENAME), 'r') as f:
+                record = json.load(f)
+            record['username'] = username
+        except (OSError, ValueError):
+            record = None
+        yield username, record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy users/*/config.json and HWID bans into SQLite")
+    parser.add_argument('--users-dir', default=USER_MANAGEMENT['users_directory'])
+    parser.add_argument('--database', default=None,
+                        help="database file (default: <users-dir>/" + USER_MANAGEMENT['user_database_filename'] + ")")
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    source = FileSystemUserStore(args.users_dir)
+    target = SQLiteUserStore(args.users_dir, args.database)
+    start = time.perf_counter()
+    migrated = skipped = 0
+    batch = []
+    for username, record in iter_records(args.users_dir):
+        if record is None:
+            skipped += 1
+            print(f"Skipping {username}: no readable {CONFIG_FILENAME}")
+            continue
+        batch.append(record)
+        if len(batch) >= args.batch_size:
+            migrated += target.put_many(batch)
+            batch = []
+            print(f"{migrated} users migrated")
+    if batch:
+        migrated += target.put_many(batch)
+
+    bans = source.hwid_bans()
+    target.ban_hwids(bans)
+    target.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Migration complete in {elapsed:.1f}s: {migrated} user(s) and {len(bans)} HWID ban(s) "
+          f"copied to {target.database}, {skipped} skipped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Model Artifact - Versioned, memory-mappable on-disk format for trained models
+
+Layout of an artifact file:
+
+    8 bytes   magic b'SXMODEL\\0'
+    8 bytes   little-endian length of the JSON manifest
+    N bytes   UTF-8 JSON manifest, space padded so the data starts 64-byte aligned
+    ...       raw little-endian arrays, each 64-byte aligned
+
+Besides Isolation Forests, artifacts hold the lightweight scorers from
+scorers.py; the manifest's model_type says which.
+
+The manifest records the format version, the feature schema, scaler
+parameters, the decision offset, training metadata and the dtype, shape and
+offset of every array. Loading maps the file read-only and returns views
+into the mapping, so nothing is copied or unpickled and sklearn is not
+needed.
+"""
+
+import json
+import os
+import struct
+import tempfile
+import numpy as np
+from typing import Dict, Optional, Tuple
+from compiled_forest import CompiledIsolationForest
+from scorers import SCORERS, FittedScorer
+
+MAGIC = b'SXMODEL\0'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+FOREST_ARRAYS = ('feature', 'threshold', 'left', 'right', 'path_length', 'roots', 'tree_norm')
+
+
+def _align(n: int) -> int:
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def is_artifact(path: str) -> bool:
+    """Check whether a file starts with the artifact magic bytes"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_artifact(path: str, arrays: Dict[str, np.ndarray], manifest: Dict) -> None:
+    """
+    Write arrays and a manifest to an artifact file atomically
+
+    The file is written to a temporary name in the same directory and moved
+    into place with os.replace, so readers see either the old or the new
+    artifact, never a partial one.
+
+    Args:
+        path: Destination file
+        arrays: Named arrays to store
+        manifest: JSON-serializable metadata; 'arrays' and 'format_version' are filled in
+    """
+    layout = {}
+    offset = 0
+    contiguous = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        array = array.astype(array.dtype.newbyteorder('<'), copy=False)
+        contiguous[name] = array
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _align(offset + array.nbytes)
+
+    manifest = dict(manifest, format_version=FORMAT_VERSION, arrays=layout)
+    header = json.dumps(manifest, separators=(',', ':')).encode('utf-8')
+    data_start = _align(len(MAGIC) + 8 + len(header))
+    header += b' ' * (data_start - len(MAGIC) - 8 - len(header))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.model-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(header)))
+            f.write(header)
+            for name, array in contiguous.items():
+                f.seek(data_start + layout[name]['offset'])
+                f.write(array.tobytes())
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_artifact(path: str, mmap: bool = True) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """
+    Read an artifact file
+
+    Args:
+        path: Artifact file
+        mmap: Return read-only views into a memory map instead of loading copies
+
+    Returns:
+        Tuple of (arrays, manifest)
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a model artifact")
+        (header_len,) = struct.unpack('<Q', f.read(8))
+        manifest = json.loads(f.read(header_len).decode('utf-8'))
+
+    version = manifest.get('format_version')
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact version {version} (expected {FORMAT_VERSION})")
+
+    data_start = len(MAGIC) + 8 + header_len
+    if mmap:
+        buffer = np.memmap(path, dtype=np.uint8, mode='r', offset=data_start)
+    else:
+        with open(path, 'rb') as f:
+            f.seek(data_start)
+            buffer = np.frombuffer(f.read(), dtype=np.uint8)
+
+    arrays = {}
+    for name, spec in manifest['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        start = spec['offset']
+        arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+    return arrays, manifest
+
+
+def save_forest(path: str, compiled: CompiledIsolationForest, metadata: Optional[Dict] = None,
+                extra_arrays: Optional[Dict[str, np.ndarray]] = None) -> None:
+    """
+    Save a scaler-fused compiled forest as an artifact
+
+    Args:
+        path: Destination file
+        compiled: Compiled forest with the scaler folded in
+        metadata: Extra manifest fields (feature names, training metadata, ...)
+        extra_arrays: Additional arrays stored next to the forest
+    """
+    if not compiled.fused:
+        raise ValueError("Only scaler-fused forests can be saved as artifacts")
+
+    arrays = {name: getattr(compiled, name) for name in FOREST_ARRAYS}
+    arrays.update(extra_arrays or {})
+    manifest = dict(metadata or {})
+    manifest.update({
+        'model_type': 'isolation_forest',
+        'offset': compiled.offset,
+        'max_depth': compiled.max_depth,
+        'n_trees': compiled.n_trees,
+        'scaler': {
+            'mean': compiled.input_mean.tolist(),
+            'scale': compiled.input_scale.tolist()
+        }
+    })
+    write_artifact(path, arrays, manifest)
+
+
+def load_forest(path: str, mmap: bool = True) -> Tuple[CompiledIsolationForest, Dict, Dict[str, np.ndarray]]:
+    """
+    Load a compiled forest from an artifact without copying its arrays
+
+    Returns:
+        Tuple of (compiled forest, manifest, all stored arrays)
+    """
+    arrays, manifest = read_artifact(path, mmap=mmap)
+    if manifest.get('model_type') != 'isolation_forest':
+        raise ValueError(f"Unsupported model type {manifest.get('model_type')!r}")
+    return _forest_from_arrays(arrays, manifest), manifest, arrays
+
+
+def _forest_from_arrays(arrays: Dict[str, np.ndarray], manifest: Dict) -> CompiledIsolationForest:
+    return CompiledIsolationForest(
+        **{name: arrays[name] for name in FOREST_ARRAYS},
+        offset=manifest['offset'],
+        max_depth=manifest['max_depth'],
+        input_mean=np.asarray(manifest['scaler']['mean'], dtype=np.float64),
+        input_scale=np.asarray(manifest['scaler']['scale'], dtype=np.float64)
+    )
+
+
+def save_scorer(path: str, scorer: FittedScorer, metadata: Optional[Dict] = None,
+                extra_arrays: Optional[Dict[str, np.ndarray]] = None) -> None:
+    """
+    Save a lightweight scorer as an artifact
+
+    Args:
+        path: Destination file
+        scorer: Fitted scorer from scorers.py
+        metadata: Extra manifest fields
+        extra_arrays: Additional arrays stored next to the scorer
+    """
+    arrays = scorer.arrays()
+    arrays.update(extra_arrays or {})
+    manifest = dict(metadata or {})
+    manifest.update({'model_type': scorer.model_type, 'offset': scorer.offset})
+    write_artifact(path, arrays, manifest)
+
+
+def save_model(path: str, scorer, metadata: Optional[Dict] = None,
+               extra_arrays: Optional[Dict[str, np.ndarray]] = None) -> None:
+    """Save a fused compiled forest or a lightweight scorer"""
+    if isinstance(scorer, CompiledIsolationForest):
+        save_forest(path, scorer, metadata, extra_arrays)
+    else:
+        save_scorer(path, scorer, metadata, extra_arrays)
+
+
+def load_model(path: str, mmap: bool = True) -> Tuple[object, Dict, Dict[str, np.ndarray]]:
+    """
+    Load whichever scorer an artifact holds
+
+    Returns:
+        Tuple of (compiled forest or scorer, manifest, all stored arrays)
+    """
+    arrays, manifest = read_artifact(path, mmap=mmap)
+    model_type = manifest.get('model_type')
+    if model_type == 'isolation_forest':
+        return _forest_from_arrays(arrays, manifest), manifest, arrays
+    if model_type not in SCORERS:
+        raise ValueError(f"Unsupported model type {model_type!r}")
+    return SCORERS[model_type].from_arrays(arrays, manifest['offset']), manifest, arrays
@@ -0,0 +1,156 @@
+"""
+Model Registry - Process-wide LRU cache of loaded user models
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class ModelRegistry:
+    """
+    Caches loaded models per username.
+
+    Entries are validated against the model file's (mtime, inode, size) on
+    every lookup, so retraining or deleting a user's model is picked up
+    without explicit invalidation. The cache is bounded both by entry count
+    and by the total size of the cached model files, evicting least recently
+    used users first.
+    """
+
+    def __init__(self, path_for: Callable[[str], str], loader: Callable[[str], Any],
+                 max_models: int = 100, max_bytes: Optional[int] = None):
+        """
+        Initialize the registry
+
+        Args:
+            path_for: Returns the model file path for a username
+            loader: Loads a model from a file path
+            max_models: Maximum number of cached models
+            max_bytes: Maximum total size of cached model files (None = unbounded)
+        """
+        self.path_for = path_for
+        self.loader = loader
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, Tuple[Tuple[int, int, int], int, Any]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _signature(path: str) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    def _drop(self, username: str) -> None:
+        _, size, _ = self._entries.pop(username)
+        self._bytes -= size
+
+    def _evict(self) -> None:
+        while self._entries and (
+            len(self._entries) > self.max_models or
+            (self.max_bytes is not None and self._bytes > self.max_bytes and len(self._entries) > 1)
+        ):
+            username = next(iter(self._entries))
+            self._drop(username)
+            self.evictions += 1
+
+    def get(self, username: str) -> Optional[Any]:
+        """
+        Return the user's model, loading it on a miss
+
+        Args:
+            username: Username whose model to return
+
+        Returns:
+            Loaded model, or None if the user has no model file
+        """
+        path = self.path_for(username)
+        signature = self._signature(path)
+
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None:
+                if entry[0] == signature:
+                    self._entries.move_to_end(username)
+                    self.hits += 1
+                    return entry[2]
+                self._drop(username)
+                self.invalidations += 1
+            self.misses += 1
+
+        if signature is None:
+            return None
+
+        model = self.loader(path)
+
+        with self._lock:
+            if username in self._entries:
+                self._drop(username)
+            self._entries[username] = (signature, signature[2], model)
+            self._bytes += signature[2]
+            self._evict()
+        return model
+
+    def invalidate(self, username: str) -> None:
+        """Forget the cached model for a user"""
+        with self._lock:
+            if username in self._entries:
+                self._drop(username)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """Forget all cached models"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def warm(self, usernames: Iterable[str]) -> int:
+        """
+        Preload models for the given users
+
+        Returns:
+            Number of models that were loaded or already cached
+        """
+        loaded = 0
+        for username in usernames:
+            try:
+                if self.get(username) is not None:
+                    loaded += 1
+            except Exception as e:
+                print(f"⚠️  Could not preload model for '{username}': {e}")
+        return loaded
+
+    def most_recent(self, usernames: Iterable[str], limit: int) -> List[str]:
+        """Users whose model files were written most recently, newest first"""
+        stamped = []
+        for username in usernames:
+            signature = self._signature(self.path_for(username))
+            if signature is not None:
+                stamped.append((signature[0], username))
+        stamped.sort(reverse=True)
+        return [username for _, username in stamped[:limit]]
+
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'cached_models': len(self._entries),
+                'cached_bytes': self._bytes,
+                'max_models': self.max_models,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0
+            }
@@ -0,0 +1,248 @@
+"""
+Password Hasher - Versioned PBKDF2 hashing in a bounded process pool
+
+Hashing a password costs tens to hundreds of milliseconds of pure CPU. Run
+on the request threads, a burst of logins holds every thread inside
+pbkdf2_hmac and starves all other endpoints. PasswordHasher runs the work in
+worker processes instead, accepts at most max_workers + max_pending hashes
+at a time and raises HashingPoolFull straight away when that is exceeded,
+so callers can answer "busy" without waiting.
+
+Hash parameters are versioned (PASSWORD_HASHING['schemes']). Each stored
+hash records its version and iteration count and is always checked with
+them. After a successful check, needs_rehash() says whether the hash is
+older than PASSWORD_HASHING['version'] and should be replaced.
+"""
+
+import os
+import hmac
+import time
+import hashlib
+import binascii
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+from config import PASSWORD_HASHING
+
+# Version of hashes stored before versions were recorded
+LEGACY_VERSION = 1
+
+
+class HashingPoolFull(Exception):
+    """Raised when the hashing pool cannot take or finish more work in time"""
+
+
+def pbkdf2_job(algorithm: str, password: str, salt: bytes, iterations: int) -> Tuple[str, float]:
+    """Worker: hex PBKDF2 digest of password and the seconds it took"""
+    start = time.perf_counter()
+    dk = hashlib.pbkdf2_hmac(algorithm, password.encode('utf-8'), salt, iterations)
+    return binascii.hexlify(dk).decode('ascii'), time.perf_counter() - start
+
+
+class OperationStats:
+    """Count, errors and latency percentiles of one kind of operation"""
+
+    __slots__ = ('count', 'errors', 'total_seconds', 'hash_seconds', 'max_seconds', 'recent')
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.hash_seconds = 0.0
+        self.max_seconds = 0.0
+        self.recent = deque(maxlen=window)
+
+    def record(self, seconds: float, hash_seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.hash_seconds += hash_seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.recent.append(seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        recent = sorted(self.recent)
+
+        def percentile(q):
+            return round(recent[min(len(recent) - 1, int(q * len(recent)))] * 1000, 2) if recent else None
+
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'mean_ms': round(self.total_seconds / self.count * 1000, 2) if self.count else None,
+            # Time inside pbkdf2_hmac; the rest of the mean is queueing and IPC
+            'mean_hash_ms': round(self.hash_seconds / self.count * 1000, 2) if self.count else None,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'max_ms': round(self.max_seconds * 1000, 2)
+        }
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords in a bounded worker pool.
+
+    With max_workers=0 the work runs in the calling thread, which is what
+    command-line tools and training workers want.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 timeout: Optional[float] = None, version: Optional[int] = None,
+                 schemes: Optional[Dict[int, Dict]] = None):
+        """
+        Initialize the hasher
+
+        Args:
+            max_workers: Worker processes (default: PASSWORD_HASHING['workers'],
+                None meaning the CPU count; 0 hashes inline)
+            max_pending: Hashes allowed to wait for a free worker before new
+                ones are rejected (default: PASSWORD_HASHING['max_pending'])
+            timeout: Seconds a caller waits for its result before giving up
+            version: Scheme new hashes are made with (default: PASSWORD_HASHING['version'])
+            schemes: Version -> {'algorithm', 'iterations'} (default: PASSWORD_HASHING['schemes'])
+        """
+        if max_workers is None:
+            max_workers = PASSWORD_HASHING['workers']
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.max_pending = PASSWORD_HASHING['max_pending'] if max_pending is None else max_pending
+        self.timeout = PASSWORD_HASHING['timeout'] if timeout is None else timeout
+        self.version = version or PASSWORD_HASHING['version']
+        self.schemes = schemes or PASSWORD_HASHING['schemes']
+        if self.version not in self.schemes:
+            raise ValueError(f"No password hashing scheme for version {self.version}")
+
+        self._pool = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+        self.pool_restarts = 0
+        self._stats = {'hash': OperationStats(), 'verify': OperationStats()}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _discard_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Drop a broken pool so the next hash starts a fresh one; caller holds the lock"""
+        if self._pool is pool:
+            self._pool = None
+            self.pool_restarts += 1
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, operation: str, algorithm: str, password: str, salt: bytes, iterations: int) -> str:
+        stats = self._stats[operation]
+        start = time.perf_counter()
+        if self.max_workers == 0:
+            digest, hash_seconds = pbkdf2_job(algorithm, password, salt, iterations)
+            with self._lock:
+                stats.record(time.perf_counter() - start, hash_seconds)
+            return digest
+
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_pending:
+                self.rejected += 1
+                raise HashingPoolFull(f"password hashing is saturated ({self._in_flight} in progress)")
+            pool = self._get_pool()
+            try:
+                future = pool.submit(pbkdf2_job, algorithm, password, salt, iterations)
+            except BrokenProcessPool:
+                # A worker died since the last hash; start over with a fresh pool
+                self._discard_pool(pool)
+                pool = self._get_pool()
+                future = pool.submit(pbkdf2_job, algorithm, password, salt, iterations)
+            self._in_flight += 1
+        future.add_done_callback(self._release)
+
+        try:
+            digest, hash_seconds = future.result(timeout=self.timeout)
+        except BrokenProcessPool:
+            # The worker died under this call: replace the pool and hash this one inline
+            with self._lock:
+                self._discard_pool(pool)
+            digest, hash_seconds = pbkdf2_job(algorithm, password, salt, iterations)
+        except FutureTimeout:
+            future.cancel()
+            with self._lock:
+                stats.errors += 1
+            raise HashingPoolFull(f"password hashing did not finish within {self.timeout}s")
+        except Exception:
+            with self._lock:
+                stats.errors += 1
+            raise
+        with self._lock:
+            stats.record(time.perf_counter() - start, hash_seconds)
+        return digest
+
+    def _release(self, future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _scheme(self, version: int) -> Dict:
+        scheme = self.schemes.get(version)
+        if scheme is None:
+            raise ValueError(f"Unknown password hashing version {version}")
+        return scheme
+
+    def hash(self, password: str) -> Dict[str, Any]:
+        """
+        Hash a new password with the current scheme
+
+        Returns:
+            Record fields: password_hash, password_salt, password_iterations
+            and password_version
+
+        Raises:
+            HashingPoolFull: if the pool is saturated
+        """
+        scheme = self._scheme(self.version)
+        salt = os.urandom(16)
+        digest = self._run('hash', scheme['algorithm'], password, salt, scheme['iterations'])
+        return {
+            'password_hash': digest,
+            'password_salt': binascii.hexlify(salt).decode('ascii'),
+            'password_iterations': scheme['iterations'],
+            'password_version': self.version
+        }
+
+    def verify(self, record: Dict, password: str) -> bool:
+        """
+        Check a password against the hash fields of a user record
+
+        Raises:
+            HashingPoolFull: if the pool is saturated
+        """
+        version = record.get('password_version', LEGACY_VERSION)
+        scheme = self._scheme(version)
+        iterations = record.get('password_iterations', scheme['iterations'])
+        salt = binascii.unhexlify(record['password_salt'])
+        digest = self._run('verify', scheme['algorithm'], password, salt, iterations)
+        return hmac.compare_digest(digest, record['password_hash'])
+
+    def needs_rehash(self, record: Dict) -> bool:
+        """True if the record's hash was made with an older scheme than the current one"""
+        version = record.get('password_version', LEGACY_VERSION)
+        return (version != self.version
+                or record.get('password_iterations') != self.schemes[self.version]['iterations'])
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool usage, rejections and per-operation latency"""
+        with self._lock:
+            return {
+                'version': self.version,
+                'iterations': self.schemes[self.version]['iterations'],
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'in_flight': self._in_flight,
+                'rejected': self.rejected,
+                'pool_restarts': self.pool_restarts,
+                'operations': {name: stats.to_dict() for name, stats in self._stats.items()}
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
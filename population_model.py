@@ -0,0 +1,369 @@
+"""
+Population Model - One shared behavioral model with a compact profile per user
+
+Instead of a forest per user, the population model learns a single
+within-user covariance from every user's enrollment features and keeps
+only each user's mean feature vector and calibrated score thresholds. A login is scored
+by its Mahalanobis distance from the user's mean under the shared
+covariance, mapped to (-1, 0] like the other scorers.
+
+At 23 features a profile is about a hundred bytes, so 100k users fit in
+about 10 MB and every profile stays memory-resident in one process.
+
+Build or rebuild the model from the users directory with:
+
+    python population_model.py [--users-dir users]
+"""
+
+import os
+import argparse
+import numpy as np
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import model_artifact
+from atomic_json import file_lock
+import calibration
+from feature_extractor import FeatureExtractor
+from feature_schema import FEATURE_SCHEMA
+from scorers import Scorer
+from user_store import iter_user_dirs
+from config import MODEL_TRAINING, USER_MANAGEMENT
+
+MODEL_TYPE = 'population'
+EPSILON = 1e-9
+# Floors for the pooled per-feature scale: a fraction of the median scale,
+# and a fraction of the feature's magnitude for features that barely vary
+MIN_SCALE_RATIO = 0.1
+RELATIVE_SCALE_FLOOR = 1e-3
+
+
+def _squared_norms(W: np.ndarray) -> np.ndarray:
+    return np.einsum('ij,ij->i', W, W)
+
+
+def _to_scores(d2: np.ndarray, n_features: int) -> np.ndarray:
+    return -d2 / (d2 + n_features)
+
+
+class PopulationModel:
+    """
+    Shared within-user covariance plus per-user mean and score thresholds.
+
+    The pooled within-user covariance is estimated from every user's
+    enrollment samples centered on that user's own mean, standardized per
+    feature and shrunk toward the identity. Each user's thresholds are
+    quantiles of their leave-one-out scores at calibration.calibration_levels.
+    That is the score each enrollment sample gets against the mean of the
+    others, so with only a handful of samples the thresholds are not biased
+    by scoring the very samples the mean was computed from. The threshold at
+    the contamination level is the decision offset. Users with a single
+    sample get the population-wide thresholds.
+    """
+
+    def __init__(self, inv_scale: np.ndarray, whitening: np.ndarray, usernames: List[str],
+                 user_means: np.ndarray, user_counts: np.ndarray, user_thresholds: np.ndarray,
+                 default_thresholds: np.ndarray, contamination: float = 0.1,
+                 feature_names: Optional[List[str]] = None, feature_schema: Optional[str] = None):
+        self.inv_scale = inv_scale
+        self.whitening = whitening
+        self.contamination = contamination
+        self.levels = calibration.calibration_levels(contamination)
+        self.decision_level = int(np.searchsorted(self.levels, contamination))
+        self.default_thresholds = np.asarray(default_thresholds, dtype=np.float64)
+        self.feature_names = feature_names or FeatureExtractor.get_feature_names()
+        self.feature_schema = feature_schema or FEATURE_SCHEMA.id
+        self.feature_columns = FEATURE_SCHEMA.columns_for(self.feature_names, self.feature_schema)
+        self.usernames = list(usernames)
+        self.index = {username: i for i, username in enumerate(self.usernames)}
+        self.user_means = user_means
+        self.user_counts = user_counts
+        self.user_thresholds = user_thresholds
+
+    def __len__(self) -> int:
+        return len(self.usernames)
+
+    def __contains__(self, username: str) -> bool:
+        return username in self.index
+
+    @property
+    def n_features(self) -> int:
+        return len(self.inv_scale)
+
+    @property
+    def user_offsets(self) -> np.ndarray:
+        """Decision offset per profile row"""
+        return self.user_thresholds[:, self.decision_level]
+
+    @property
+    def default_offset(self) -> float:
+        return float(self.default_thresholds[self.decision_level])
+
+    @property
+    def nbytes(self) -> int:
+        n = len(self.usernames)
+        return (self.inv_scale.nbytes + self.whitening.nbytes + self.user_means[:n].nbytes +
+                self.user_counts[:n].nbytes + self.user_thresholds[:n].nbytes)
+
+    @classmethod
+    def fit(cls, enrollments: Dict[str, np.ndarray], contamination: float = 0.1,
+            shrinkage: Optional[float] = None) -> 'PopulationModel':
+        """
+        Train the shared model and every user's profile
+
+        Args:
+            enrollments: Enrollment feature matrix per username
+            contamination: Share of enrollment samples treated as outliers
+            shrinkage: Weight of the identity in the shrunk correlation
+                (default d / (n_samples - n_users + d))
+
+        Returns:
+            Fitted population model
+        """
+        usernames = [u for u, X in enrollments.items() if len(X)]
+        if not usernames:
+            raise ValueError("No enrollment data to train a population model on")
+        matrices = [np.atleast_2d(np.asarray(enrollments[u], dtype=np.float64)) for u in usernames]
+        counts = np.array([len(X) for X in matrices], dtype=np.int64)
+        X = np.vstack(matrices)
+        ids = np.repeat(np.arange(len(usernames)), counts)
+        n, d = X.shape
+
+        means = np.add.reduceat(X, np.concatenate([[0], np.cumsum(counts)[:-1]]), axis=0) / counts[:, None]
+        residuals = X - means[ids]
+
+        dof = max(n - len(usernames), 1)
+        scale = np.sqrt((residuals ** 2).sum(axis=0) / dof)
+        floor = np.maximum(MIN_SCALE_RATIO * np.median(scale), RELATIVE_SCALE_FLOOR * np.abs(X.mean(axis=0)))
+        scale = np.maximum(scale, floor) + EPSILON
+        Z = residuals / scale
+
+        shrinkage = shrinkage if shrinkage is not None else d / (dof + d)
+        correlation = Z.T @ Z / dof
+        shrunk = (1.0 - shrinkage) * correlation + shrinkage * np.eye(d)
+        whitening = np.linalg.inv(np.linalg.cholesky(shrunk))
+
+        loo_d2 = _squared_norms(Z @ whitening.T) * cls._loo_factor(counts)[ids]
+        loo_scores = _to_scores(loo_d2, d)
+        levels = calibration.calibration_levels(contamination)
+        default_thresholds = calibration.quantile_thresholds(loo_scores[counts[ids] > 1], levels) \
+            if (counts > 1).any() else np.full(len(levels), -0.5)
+        thresholds = calibration.group_quantile_thresholds(loo_scores, counts, levels)
+        thresholds[counts < 2] = default_thresholds
+
+        return cls(
+            inv_scale=1.0 / scale,
+            whitening=whitening,
+            usernames=usernames,
+            user_means=means.astype(np.float32),
+            user_counts=counts.astype(np.int32),
+            user_thresholds=thresholds.astype(np.float32),
+            default_thresholds=default_thresholds,
+            contamination=contamination
+        )
+
+    @staticmethod
+    def _loo_factor(counts: np.ndarray) -> np.ndarray:
+        """
+        Scale from in-sample to leave-one-out squared distance
+
+        x_i - mean_without_i = (x_i - mean) * n / (n - 1).
+        """
+        counts = np.asarray(counts, dtype=np.float64)
+        return np.where(counts > 1, (counts / np.maximum(counts - 1, 1)) ** 2, 1.0)
+
+    def _ensure_writable(self, rows: int) -> None:
+        """Make the profile arrays writable (they may be memory-mapped) with room for rows"""
+        capacity = len(self.user_means)
+        if capacity >= rows and self.user_means.flags.writeable:
+            return
+        new_capacity = max(rows, 16, 2 * capacity if rows > capacity else capacity)
+        n = len(self.usernames)
+        for name in ('user_means', 'user_counts', 'user_thresholds'):
+            old = getattr(self, name)
+            new = np.empty((new_capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:n] = old[:n]
+            setattr(self, name, new)
+
+    def add_user(self, username: str, features: np.ndarray) -> float:
+        """
+        Add or replace a user's profile under the current shared covariance
+
+        Args:
+            username: User to add
+            features: Enrollment feature matrix of shape (n_samples, n_features)
+
+        Returns:
+            The user's decision offset
+        """
+        X = np.atleast_2d(np.asarray(features, dtype=np.float64))
+        mean = X.mean(axis=0)
+        count = len(X)
+        thresholds = self.default_thresholds
+        if count > 1:
+            d2 = _squared_norms(((X - mean) * self.inv_scale) @ self.whitening.T)
+            loo_scores = _to_scores(d2 * self._loo_factor([count])[0], self.n_features)
+            thresholds = calibration.quantile_thresholds(loo_scores, self.levels)
+
+        i = self.index.get(username)
+        if i is None:
+            i = len(self.usernames)
+            self._ensure_writable(i + 1)
+            self.usernames.append(username)
+            self.index[username] = i
+        else:
+            self._ensure_writable(len(self.usernames))
+        self.user_means[i] = mean
+        self.user_counts[i] = count
+        self.user_thresholds[i] = thresholds
+        return float(thresholds[self.decision_level])
+
+    def remove_user(self, username: str) -> bool:
+        """Drop a user's profile; the last profile moves into its slot"""
+        i = self.index.pop(username, None)
+        if i is None:
+            return False
+        self._ensure_writable(len(self.usernames))
+        last = len(self.usernames) - 1
+        if i != last:
+            moved = self.usernames[last]
+            self.usernames[i] = moved
+            self.index[moved] = i
+            for array in (self.user_means, self.user_counts, self.user_thresholds):
+                array[i] = array[last]
+        self.usernames.pop()
+        return True
+
+    def _squared_distance(self, rows: np.ndarray, X: np.ndarray) -> np.ndarray:
+        Z = (X - self.user_means[rows]) * self.inv_scale
+        return _squared_norms(Z @ self.whitening.T)
+
+    def score_samples(self, username: str, X: np.ndarray) -> np.ndarray:
+        """Scores of feature vectors against one user's profile"""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        rows = np.full(len(X), self.index[username])
+        return _to_scores(self._squared_distance(rows, X), self.n_features)
+
+    def score_pairs(self, usernames: Iterable[str], X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score row i of X against usernames[i], all in one pass
+
+        Returns:
+            Tuple of (scores, is_inlier) arrays
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        rows = np.array([self.index[u] for u in usernames], dtype=np.int64)
+        scores = _to_scores(self._squared_distance(rows, X), self.n_features)
+        return scores, scores - self.user_offsets[rows] >= 0
+
+    def user_model(self, username: str):
+        """BehavioralAuthenticationModel that scores against one user's profile"""
+        from behavioral_model import BehavioralAuthenticationModel
+        i = self.index[username]
+        model = BehavioralAuthenticationModel.from_scorer(PopulationUserScorer(self, username), self.contamination)
+        model.feature_names = self.feature_names
+        model.feature_columns = self.feature_columns
+        model.metadata = {'enrollment_samples': int(self.user_counts[i])}
+        return model
+
+    def save(self, path: str) -> None:
+        """Atomically write the model and all profiles as one artifact"""
+        n = len(self.usernames)
+        model_artifact.write_artifact(path, {
+            'inv_scale': self.inv_scale,
+            'whitening': self.whitening,
+            'user_means': self.user_means[:n],
+            'user_counts': self.user_counts[:n],
+            'user_thresholds': self.user_thresholds[:n],
+            'default_thresholds': self.default_thresholds
+        }, {
+            'model_type': MODEL_TYPE,
+            'usernames': self.usernames,
+            'contamination': self.contamination,
+            'feature_names': self.feature_names,
+            'feature_schema': self.feature_schema
+        })
+
+    @classmethod
+    def load(cls, path: str) -> 'PopulationModel':
+        """Load a population model; profile arrays are memory-mapped until modified"""
+        arrays, manifest = model_artifact.read_artifact(path)
+        if manifest.get('model_type') != MODEL_TYPE:
+            raise ValueError(f"{path} is not a population model")
+        return cls(
+            inv_scale=np.asarray(arrays['inv_scale']),
+            whitening=np.asarray(arrays['whitening']),
+            usernames=manifest['usernames'],
+            user_means=arrays['user_means'],
+            user_counts=arrays['user_counts'],
+            user_thresholds=arrays['user_thresholds'],
+            default_thresholds=arrays['default_thresholds'],
+            contamination=manifest['contamination'],
+            feature_names=manifest.get('feature_names'),
+            feature_schema=manifest.get('feature_schema')
+        )
+
+
+class PopulationUserScorer(Scorer):
+    """One user's view of a PopulationModel, usable wherever a Scorer is"""
+
+    model_type = MODEL_TYPE
+    display_name = 'Population Model'
+
+    def __init__(self, population: PopulationModel, username: str):
+        super().__init__(offset=population.user_offsets[population.index[username]])
+        self.population = population
+        self.username = username
+
+    @property
+    def nbytes(self) -> int:
+        population = self.population
+        return population.user_means.itemsize * population.n_features + \
+            population.user_counts.itemsize + population.user_thresholds.itemsize * len(population.levels)
+
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        return self.population.score_samples(self.username, X)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        raise ValueError("population profiles are saved with PopulationModel.save")
+
+
+def population_model_path(users_dir: str) -> str:
+    return os.path.join(users_dir, USER_MANAGEMENT['population_model_filename'])
+
+
+def iter_enrollments(users_dir: str) -> Iterator[Tuple[str, np.ndarray]]:
+    """Yield (username, enrollment matrix) from every user's model artifact"""
+    for username, user_path in iter_user_dirs(users_dir):
+        model_file = os.path.join(user_path, USER_MANAGEMENT['model_filename'])
+        if not model_artifact.is_artifact(model_file):
+            continue
+        arrays, manifest = model_artifact.read_artifact(model_file)
+        if 'enrollment' in arrays and len(arrays['enrollment']):
+            yield username, FEATURE_SCHEMA.to_schema(
+                arrays['enrollment'], manifest.get('feature_names', FEATURE_SCHEMA.names),
+                manifest.get('feature_schema'))
+
+
+def build(users_dir: str, contamination: float = None) -> PopulationModel:
+    """Train a population model from the users directory and save it there"""
+    contamination = contamination if contamination is not None else MODEL_TRAINING['contamination']
+    population = PopulationModel.fit(dict(iter_enrollments(users_dir)), contamination=contamination)
+    path = population_model_path(users_dir)
+    # Same lock UserManager holds while it changes single profiles
+    with file_lock(path):
+        population.save(path)
+    return population
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the shared population model from all users")
+    parser.add_argument('--users-dir', default=USER_MANAGEMENT['users_directory'])
+    parser.add_argument('--contamination', type=float, default=MODEL_TRAINING['contamination'])
+    args = parser.parse_args()
+
+    population = build(args.users_dir, args.contamination)
+    print(f"Population model built for {len(population)} user(s), "
+          f"{population.nbytes / 1024:.1f} KiB in memory -> {population_model_path(args.users_dir)}")
+
+
+if __name__ == "__main__":
+    main()
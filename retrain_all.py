@@ -0,0 +1,180 @@
+"""
+Retrain All - Retrain every enrolled user's model from its persisted enrollment data
+
+Run after a feature-schema or hyperparameter change:
+
+    python retrain_all.py [--users-dir users] [--workers N] [--resume]
+
+Users are handed to worker processes in chunks. Each user's enrollment
+matrix is read from the memory-mapped model artifact, a new model is
+trained and written back atomically, so an interrupted run never leaves a
+partial model behind. Finished users are appended to a journal; --resume
+skips them on the next run.
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Iterator, List, Set, Tuple
+from config import MODEL_TRAINING, USER_MANAGEMENT
+from user_store import iter_user_dirs as iter_all_user_dirs
+
+JOURNAL_FILENAME = '.retrain_journal'
+
+RETRAINED = 'retrained'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+
+def retrain_users(user_paths: List[str], contamination: float,
+                  scorer: str) -> List[Tuple[str, str, float, int, str]]:
+    """
+    Retrain a chunk of users' models from the enrollment data stored in their artifacts
+
+    Returns:
+        Tuple of (username, status, seconds, enrollment samples, detail) per user
+    """
+    import model_artifact
+    from feature_schema import FEATURE_SCHEMA
+    from behavioral_model import BehavioralAuthenticationModel
+
+    results = []
+    for user_path in user_paths:
+        username = os.path.basename(user_path)
+        model_file = os.path.join(user_path, USER_MANAGEMENT['model_filename'])
+        start = time.perf_counter()
+        try:
+            if not model_artifact.is_artifact(model_file):
+                results.append((username, SKIPPED, 0.0, 0, 'no model artifact (run migrate_models.py first)'))
+                continue
+
+            arrays, manifest = model_artifact.read_artifact(model_file)
+            if 'enrollment' not in arrays or len(arrays['enrollment']) == 0:
+                results.append((username, SKIPPED, 0.0, 0, 'no persisted enrollment data'))
+                continue
+            # Enrollment persisted under an older schema is moved into the current column order
+            enrollment = np.array(FEATURE_SCHEMA.to_schema(
+                arrays['enrollment'], manifest.get('feature_names', FEATURE_SCHEMA.names),
+                manifest.get('feature_schema')), dtype=np.float64)
+            del arrays
+
+            model = BehavioralAuthenticationModel(contamination=contamination, scorer=scorer)
+            model.enroll_features(enrollment)
+            model.write_artifact(model_file)
+            results.append((username, RETRAINED, time.perf_counter() - start, len(enrollment), ''))
+        except Exception as e:
+            results.append((username, FAILED, time.perf_counter() - start, 0, str(e)))
+    return results
+
+
+def iter_chunks(users: Iterator[str], size: int) -> Iterator[List[str]]:
+    chunk = []
+    for user_path in users:
+        chunk.append(user_path)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_user_dirs(users_dir: str, done: Set[str]) -> Iterator[str]:
+    """Yield user directories lazily (flat or sharded), skipping users already in the journal"""
+    for username, path in iter_all_user_dirs(users_dir):
+        if username not in done:
+            yield path
+
+
+def read_journal(journal_file: str) -> Set[str]:
+    """Users finished (retrained or skipped) by a previous run"""
+    done = set()
+    if os.path.exists(journal_file):
+        with open(journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) >= 2 and fields[1] in (RETRAINED, SKIPPED):
+                    done.add(fields[0])
+    return done
+
+
+def percentile_ms(latencies, q: float) -> float:
+    return float(np.percentile(latencies, q)) * 1000 if latencies else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrain all enrolled users' models in parallel")
+    parser.add_argument('--users-dir', default=USER_MANAGEMENT['users_directory'])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: number of cores)")
+    parser.add_argument('--resume', action='store_true',
+                        help="skip users finished by an interrupted previous run")
+    parser.add_argument('--contamination', type=float, default=MODEL_TRAINING['contamination'])
+    parser.add_argument('--scorer', default=MODEL_TRAINING['scorer'],
+                        help="isolation_forest, diagonal_gaussian, robust_zscore or mahalanobis")
+    parser.add_argument('--chunk-size', type=int, default=64,
+                        help="users per worker task")
+    parser.add_argument('--report-every', type=int, default=100,
+                        help="print progress every N users")
+    args = parser.parse_args()
+
+    journal_file = os.path.join(args.users_dir, JOURNAL_FILENAME)
+    done = read_journal(journal_file) if args.resume else set()
+    if done:
+        print(f"Resuming: {len(done)} user(s) already finished")
+
+    counts = {RETRAINED: 0, SKIPPED: 0, FAILED: 0}
+    latencies = []
+    chunks = iter_chunks(iter_user_dirs(args.users_dir, done), max(args.chunk_size, 1))
+    max_in_flight = args.workers * 2
+    start = time.perf_counter()
+
+    with open(journal_file, 'a' if args.resume else 'w', encoding='utf-8') as journal, \
+            ProcessPoolExecutor(max_workers=args.workers) as pool:
+        pending = set()
+        exhausted = False
+        reported = 0
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                else:
+                    pending.add(pool.submit(retrain_users, chunk, args.contamination, args.scorer))
+            if not pending:
+                break
+
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                for username, status, seconds, samples, detail in future.result():
+                    counts[status] += 1
+                    if status == RETRAINED:
+                        latencies.append(seconds)
+                    elif detail:
+                        print(f"{'Skipping' if status == SKIPPED else 'Error retraining'} {username}: {detail}")
+                    journal.write(f"{username}\t{status}\t{seconds:.4f}\t{samples}\n")
+                journal.flush()
+
+                total = sum(counts.values())
+                if args.report_every and total // args.report_every > reported:
+                    reported = total // args.report_every
+                    elapsed = time.perf_counter() - start
+                    print(f"{total} users processed, {total / elapsed:.1f} users/s")
+
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(f"\nRetrain complete in {elapsed:.1f}s: {counts[RETRAINED]} retrained, "
+          f"{counts[SKIPPED]} skipped, {counts[FAILED]} failed")
+    if total:
+        print(f"Throughput: {total / elapsed:.1f} users/s with {args.workers} worker(s)")
+    if latencies:
+        print(f"Training latency per user: p50 {percentile_ms(latencies, 50):.1f} ms, "
+              f"p90 {percentile_ms(latencies, 90):.1f} ms, p99 {percentile_ms(latencies, 99):.1f} ms, "
+              f"max {max(latencies) * 1000:.1f} ms")
+    return 1 if counts[FAILED] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
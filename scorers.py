@@ -0,0 +1,220 @@
+"""
+Scorers - Lightweight per-user anomaly scorers for behavioral feature vectors
+
+Every scorer maps a feature vector to a score in (-1, 0], higher meaning
+more typical of the enrolled user, the same convention as the Isolation
+Forest's score_samples. The decision offset is set at fit time so that a
+contamination share of the enrollment samples falls below it, exactly as
+IsolationForest does.
+
+The distance-based scorers turn a squared distance D² over d features into
+-D² / (D² + d): a sample at the profile center scores 0, a sample at the
+typical distance of the enrollment data (D² = d) scores -0.5 and far
+outliers approach -1.
+
+Scorers work on raw feature vectors, store a few hundred bytes and score in
+microseconds. The Isolation Forest itself lives in compiled_forest.py.
+"""
+
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import Dict, Tuple
+
+# Standard deviation floor relative to the feature's typical spread, so
+# features that are constant over a handful of enrollment samples do not
+# turn every deviation into an infinite distance
+MIN_SCALE_RATIO = 0.1
+EPSILON = 1e-9
+
+# Scale factor that makes the MAD a consistent estimator of the standard deviation
+MAD_TO_STD = 1.4826
+
+
+def _floor_scale(scale: np.ndarray, center: np.ndarray) -> np.ndarray:
+    """Raise tiny per-feature scales to a fraction of the feature's magnitude"""
+    floor = MIN_SCALE_RATIO * np.maximum(np.abs(center), np.median(scale))
+    return np.maximum(scale, floor) + EPSILON
+
+
+class Scorer(ABC):
+    """
+    Scoring interface of a per-user scorer: score_samples(X) and a decision offset.
+
+    fused is always True: scorers take raw feature vectors and need no
+    separate scaler.
+    """
+
+    model_type = ''
+    display_name = ''
+    ARRAYS: Tuple[str, ...] = ()
+    fused = True
+
+    def __init__(self, offset: float = -0.5):
+        self.offset = float(offset)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    @abstractmethod
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        """Score per sample in (-1, 0]"""
+
+    def recalibrate_offset(self, X: np.ndarray, contamination: float) -> float:
+        """Set the decision offset to the contamination percentile of X's scores"""
+        self.offset = float(np.percentile(self.score_samples(X), 100.0 * contamination))
+        return self.offset
+
+    def score(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score samples and decide
+
+        Returns:
+            Tuple of (scores, is_inlier) arrays
+        """
+        scores = self.score_samples(X)
+        return scores, scores - self.offset >= 0
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Arrays to persist in a model artifact"""
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+
+class FittedScorer(Scorer):
+    """
+    Scorer fitted on one user's enrollment vectors and saved as its own artifact.
+
+    Subclasses implement _fit(X), _squared_distance(X) and the ARRAYS they
+    persist.
+    """
+
+    def fit(self, X: np.ndarray, contamination: float = 0.1) -> 'FittedScorer':
+        """
+        Fit the scorer to enrollment feature vectors
+
+        Args:
+            X: Feature matrix of shape (n_samples, n_features)
+            contamination: Share of enrollment samples treated as outliers
+
+        Returns:
+            self
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        self._fit(X)
+        self.recalibrate_offset(X, contamination)
+        return self
+
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        """Score per sample in (-1, 0]"""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        d2 = self._squared_distance(X)
+        return -d2 / (d2 + X.shape[1])
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], offset: float) -> 'FittedScorer':
+        """Rebuild a fitted scorer from persisted arrays"""
+        scorer = cls(offset=offset)
+        for name in cls.ARRAYS:
+            setattr(scorer, name, arrays[name])
+        return scorer
+
+    @abstractmethod
+    def _fit(self, X: np.ndarray) -> None:
+        """Estimate the profile from enrollment feature vectors"""
+
+    @abstractmethod
+    def _squared_distance(self, X: np.ndarray) -> np.ndarray:
+        """Squared distance D² of each sample from the profile"""
+
+
+class DiagonalGaussianScorer(FittedScorer):
+    """Independent Gaussian per feature; D² is the sum of squared z-scores"""
+
+    model_type = 'diagonal_gaussian'
+    display_name = 'Diagonal Gaussian'
+    ARRAYS = ('profile_mean', 'profile_inv_std')
+
+    def _fit(self, X: np.ndarray) -> None:
+        mean = X.mean(axis=0)
+        self.profile_mean = mean
+        self.profile_inv_std = 1.0 / _floor_scale(X.std(axis=0), mean)
+
+    def _squared_distance(self, X: np.ndarray) -> np.ndarray:
+        z = (X - self.profile_mean) * self.profile_inv_std
+        return np.einsum('ij,ij->i', z, z)
+
+
+class RobustZScoreScorer(FittedScorer):
+    """Median and MAD per feature, so a few odd enrollment sessions do not skew the profile"""
+
+    model_type = 'robust_zscore'
+    display_name = 'Robust Z-Score'
+    ARRAYS = ('profile_median', 'profile_inv_mad')
+
+    def _fit(self, X: np.ndarray) -> None:
+        median = np.median(X, axis=0)
+        mad = MAD_TO_STD * np.median(np.abs(X - median), axis=0)
+        self.profile_median = median
+        self.profile_inv_mad = 1.0 / _floor_scale(mad, median)
+
+    def _squared_distance(self, X: np.ndarray) -> np.ndarray:
+        z = (X - self.profile_median) * self.profile_inv_mad
+        return np.einsum('ij,ij->i', z, z)
+
+
+class MahalanobisScorer(FittedScorer):
+    """
+    Full-covariance Gaussian with shrinkage.
+
+    Features are standardized, and their correlation matrix is shrunk toward
+    the identity with weight d / (n + d). With 5 enrollment samples and 23
+    features the sample correlation is singular, and shrinkage keeps it
+    invertible. The inverse Cholesky factor is stored, so
+    D² = ||W (x - mean) / std||².
+    """
+
+    model_type = 'mahalanobis'
+    display_name = 'Mahalanobis'
+    ARRAYS = ('profile_mean', 'profile_inv_std', 'profile_whitening')
+
+    def __init__(self, offset: float = -0.5, shrinkage: float = None):
+        super().__init__(offset)
+        self.shrinkage = shrinkage
+
+    def _fit(self, X: np.ndarray) -> None:
+        n, d = X.shape
+        mean = X.mean(axis=0)
+        inv_std = 1.0 / _floor_scale(X.std(axis=0), mean)
+        Z = (X - mean) * inv_std
+
+        shrinkage = self.shrinkage if self.shrinkage is not None else d / (n + d)
+        correlation = Z.T @ Z / n
+        shrunk = (1.0 - shrinkage) * correlation + shrinkage * np.eye(d)
+
+        self.profile_mean = mean
+        self.profile_inv_std = inv_std
+        self.profile_whitening = np.linalg.inv(np.linalg.cholesky(shrunk))
+
+    def _squared_distance(self, X: np.ndarray) -> np.ndarray:
+        w = ((X - self.profile_mean) * self.profile_inv_std) @ self.profile_whitening.T
+        return np.einsum('ij,ij->i', w, w)
+
+
+SCORERS = {
+    scorer.model_type: scorer
+    for scorer in (DiagonalGaussianScorer, RobustZScoreScorer, MahalanobisScorer)
+}
+
+ISOLATION_FOREST = 'isolation_forest'
+
+
+def create_scorer(model_type: str) -> FittedScorer:
+    """
+    Create an unfitted lightweight scorer by name
+
+    Args:
+        model_type: One of SCORERS ('diagonal_gaussian', 'robust_zscore', 'mahalanobis')
+    """
+    if model_type not in SCORERS:
+        raise ValueError(f"Unknown scorer {model_type!r}; choose from {ISOLATION_FOREST!r} or {sorted(SCORERS)}")
+    return SCORERS[model_type]()
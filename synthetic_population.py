@@ -0,0 +1,324 @@
+"""
+Synthetic Population - Vectorized users, impostors and bots for load tests and FAR/FRR evaluation
+
+Every synthetic person has a behavioral profile: a log-normal inter-key
+interval distribution, a key vocabulary size, a mouse sampling interval and
+a log-normal movement distance distribution. Sessions draw their events from
+the profile (with a small per-session drift for humans) in dense
+(sessions, events) arrays, so a block of thousands of sessions costs a few
+numpy calls:
+
+    users       the enrolled population
+    impostors   other humans from the same population distribution, never enrolled
+    bots        near-constant timing and movement, the pattern fraud_detection looks for
+
+features() reduces the events straight to the feature matrix, in the same
+columns and with the same statistics as FeatureExtractor, without building
+session objects. sessions() returns the same events as BehavioralSessions
+(the columnar format the rest of the system consumes); extracting features
+from them reproduces features() up to float32 rounding.
+
+Output is deterministic per seed: profiles come from their own stream, and
+every block of CHUNK_SESSIONS sessions is drawn from a generator seeded with
+(seed, kind, stream, block), so results do not depend on how many blocks are
+computed or in what order.
+
+    python synthetic_population.py [--users 1000] [--sessions 1000] [--impostors 100] [--bots 100] [--out population.npz]
+"""
+
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence
+from behavioral_session import BehavioralSession
+from feature_extractor import KEYSTROKE_FEATURES, MOUSE_FEATURES
+
+USERS = 'users'
+IMPOSTORS = 'impostors'
+BOTS = 'bots'
+KINDS = (USERS, IMPOSTORS, BOTS)
+
+# Sessions drawn per block; part of the seed derivation, so changing it changes the output
+CHUNK_SESSIONS = 2048
+
+KEYS = 'abcdefghijklmnopqrstuvwxyz '
+SCREEN = (1920, 1080)
+
+_PROFILE_STREAM = 0
+_SESSION_STREAM = 1
+
+
+class Profiles:
+    """Behavioral distribution parameters of a group of synthetic people, one array entry each"""
+
+    __slots__ = ('iki_mu', 'iki_sigma', 'vocabulary', 'mouse_interval', 'mouse_jitter',
+                 'distance_mu', 'distance_sigma', 'drift')
+
+    def __init__(self, iki_mu, iki_sigma, vocabulary, mouse_interval, mouse_jitter,
+                 distance_mu, distance_sigma, drift: float):
+        self.iki_mu = iki_mu
+        self.iki_sigma = iki_sigma
+        self.vocabulary = vocabulary
+        self.mouse_interval = mouse_interval
+        self.mouse_jitter = mouse_jitter
+        self.distance_mu = distance_mu
+        self.distance_sigma = distance_sigma
+        self.drift = drift
+
+    def __len__(self) -> int:
+        return len(self.iki_mu)
+
+    @classmethod
+    def humans(cls, rng: np.random.Generator, n: int) -> 'Profiles':
+        return cls(
+            iki_mu=np.log(np.clip(rng.normal(230.0, 50.0, n), 90.0, 600.0)),
+            iki_sigma=rng.uniform(0.25, 0.5, n),
+            vocabulary=rng.integers(10, len(KEYS) + 1, n),
+            mouse_interval=rng.uniform(0.06, 0.14, n),
+            mouse_jitter=rng.uniform(0.15, 0.4, n),
+            distance_mu=np.log(rng.uniform(15.0, 60.0, n)),
+            distance_sigma=rng.uniform(0.4, 0.8, n),
+            drift=0.06
+        )
+
+    @classmethod
+    def bots(cls, rng: np.random.Generator, n: int) -> 'Profiles':
+        return cls(
+            iki_mu=np.log(rng.uniform(40.0, 200.0, n)),
+            iki_sigma=rng.uniform(0.0, 0.03, n),
+            vocabulary=rng.integers(3, 9, n),
+            mouse_interval=rng.uniform(0.01, 0.05, n),
+            mouse_jitter=rng.uniform(0.0, 0.02, n),
+            distance_mu=np.log(rng.uniform(20.0, 200.0, n)),
+            distance_sigma=rng.uniform(0.0, 0.05, n),
+            drift=0.0
+        )
+
+
+def _lerp_percentiles(sorted_values: np.ndarray, qs: Sequence[float]) -> List[np.ndarray]:
+    """np.percentile (linear) of each row of an already sorted matrix"""
+    last = sorted_values.shape[1] - 1
+    out = []
+    for q in qs:
+        position = last * q / 100.0
+        lower = int(np.floor(position))
+        upper = min(lower + 1, last)
+        t = position - lower
+        a = sorted_values[:, lower]
+        b = sorted_values[:, upper]
+        diff = b - a
+        out.append(b - diff * (1 - t) if t >= 0.5 else a + diff * t)
+    return out
+
+
+class SyntheticPopulation:
+    """
+    Enrolled users plus optional impostor and bot groups, all from one seed
+    """
+
+    def __init__(self, n_users: int, n_impostors: int = 0, n_bots: int = 0, seed: int = 0,
+                 duration: float = 30.0, keystrokes_per_second: float = 3.0,
+                 movements_per_second: float = 10.0):
+        """
+        Args:
+            n_users: Enrolled users
+            n_impostors: Unenrolled humans from the same population distribution
+            n_bots: Scripted clients
+            seed: Seed of everything generated
+            duration: Session length in seconds
+            keystrokes_per_second: Keystrokes per session = duration * this (at least 2)
+            movements_per_second: Mouse events per session = duration * this (at least 2)
+        """
+        self.seed = seed
+        self.duration = duration
+        self.n_keys = max(2, int(duration * keystrokes_per_second))
+        self.n_movements = max(2, int(duration * movements_per_second))
+        rngs = {kind: self._rng(code, _PROFILE_STREAM) for code, kind in enumerate(KINDS)}
+        self.profiles: Dict[str, Profiles] = {
+            USERS: Profiles.humans(rngs[USERS], n_users),
+            IMPOSTORS: Profiles.humans(rngs[IMPOSTORS], n_impostors),
+            BOTS: Profiles.bots(rngs[BOTS], n_bots),
+        }
+
+    def _rng(self, *key: int) -> np.random.Generator:
+        return np.random.Generator(np.random.PCG64(np.random.SeedSequence([self.seed, *key])))
+
+    @staticmethod
+    def feature_names() -> List[str]:
+        return KEYSTROKE_FEATURES + MOUSE_FEATURES
+
+    def _people(self, kind: str, people: Optional[Sequence[int]]) -> np.ndarray:
+        if people is None:
+            return np.arange(len(self.profiles[kind]))
+        return np.asarray(people, dtype=np.int64)
+
+    def _block_events(self, kind: str, people: np.ndarray, sessions_per_person: int, stream: int,
+                      block: int, positions: bool = False) -> Dict[str, np.ndarray]:
+        """Events of one block of sessions, person-major; positions adds movement angles"""
+        profiles = self.profiles[kind]
+        K, M = self.n_keys, self.n_movements
+        rng = self._rng(KINDS.index(kind), _SESSION_STREAM, stream, block)
+        start = block * CHUNK_SESSIONS
+        rows = np.arange(start, min(start + CHUNK_SESSIONS, len(people) * sessions_per_person))
+        who = people[rows // sessions_per_person]
+        n = len(rows)
+
+        # Draws are float32: half the cost of float64, and the precision sessions store anyway
+        drift = rng.standard_normal((n, 2), dtype=np.float32) * profiles.drift
+        iki_mu = (profiles.iki_mu[who] + drift[:, 0]).astype(np.float32)[:, None]
+        distance_mu = (profiles.distance_mu[who] + drift[:, 1]).astype(np.float32)[:, None]
+
+        # Inter-key intervals in ms; the first keystroke has none (NaN, like the collector)
+        ikis = rng.standard_normal((n, K - 1), dtype=np.float32)
+        ikis *= profiles.iki_sigma[who].astype(np.float32)[:, None]
+        ikis += iki_mu
+        np.exp(ikis, out=ikis)
+        codes = (rng.random((n, K), dtype=np.float32) * profiles.vocabulary[who][:, None]).astype(np.int16)
+
+        intervals = rng.standard_normal((n, M), dtype=np.float32)
+        intervals *= profiles.mouse_jitter[who].astype(np.float32)[:, None]
+        np.exp(intervals, out=intervals)
+        intervals *= profiles.mouse_interval[who].astype(np.float32)[:, None]
+        distances = rng.standard_normal((n, M), dtype=np.float32)
+        distances *= profiles.distance_sigma[who].astype(np.float32)[:, None]
+        distances += distance_mu
+        np.exp(distances, out=distances)
+
+        events = {
+            'who': who, 'ikis': ikis, 'codes': codes, 'intervals': intervals,
+            'distances': distances, 'velocities': distances / intervals,
+            # Time from the first to the last event, in seconds
+            'key_span': ikis.sum(axis=1, dtype=np.float64) / 1000.0,
+            'mouse_span': intervals[:, 1:].sum(axis=1, dtype=np.float64)
+        }
+        if positions:
+            events['angles'] = rng.random((n, M)) * (2 * np.pi)
+        return events
+
+    def _blocks(self, kind: str, sessions_per_person: int, people: np.ndarray,
+                stream: int, positions: bool = False) -> Iterator[Dict[str, np.ndarray]]:
+        n_blocks = -(-len(people) * sessions_per_person // CHUNK_SESSIONS)
+        for block in range(n_blocks):
+            yield self._block_events(kind, people, sessions_per_person, stream, block, positions)
+
+    def _block_features(self, events: Dict[str, np.ndarray]) -> np.ndarray:
+        """Reduce one block of events to feature rows, as FeatureExtractor would"""
+        K, M = self.n_keys, self.n_movements
+        # Sorting in float32 orders exactly like float64; statistics are taken in float64
+        ikis = np.sort(events['ikis'], axis=1).astype(np.float64)
+        distances = np.sort(events['distances'], axis=1).astype(np.float64)
+        velocities = np.sort(events['velocities'], axis=1).astype(np.float64)
+        n = len(ikis)
+
+        seen = np.zeros((n, len(KEYS)), dtype=bool)
+        seen[np.arange(n)[:, None], events['codes']] = True
+        key_span = events['key_span']
+        mouse_span = events['mouse_span']
+        iki_q25, iki_median, iki_q75 = _lerp_percentiles(ikis, (25, 50, 75))
+        distance_median, = _lerp_percentiles(distances, (50,))
+        velocity_median, = _lerp_percentiles(velocities, (50,))
+
+        return np.column_stack([
+            ikis.mean(axis=1), ikis.std(axis=1), ikis[:, 0], ikis[:, -1], iki_median, iki_q25, iki_q75,
+            np.full(n, K), K / np.maximum(1, key_span), seen.sum(axis=1),
+            distances.mean(axis=1), distances.std(axis=1), distances[:, 0], distances[:, -1],
+            distance_median, distances.sum(axis=1), velocities.mean(axis=1), velocities.std(axis=1),
+            velocities[:, 0], velocities[:, -1], velocity_median, np.full(n, M), M / np.maximum(1, mouse_span),
+        ]).astype(np.float32)
+
+    def _features_block(self, kind: str, people: np.ndarray, sessions_per_person: int,
+                        stream: int, block: int) -> np.ndarray:
+        return self._block_features(self._block_events(kind, people, sessions_per_person, stream, block))
+
+    def features(self, sessions_per_person: int, kind: str = USERS, people: Optional[Sequence[int]] = None,
+                 stream: int = 0, workers: int = 1) -> np.ndarray:
+        """
+        Feature matrix of freshly drawn sessions
+
+        Args:
+            sessions_per_person: Sessions drawn for each person
+            kind: 'users', 'impostors' or 'bots'
+            people: Indices within the group (default: all)
+            stream: Independent draw number; use different streams for
+                enrollment and test sessions of the same people
+            workers: Processes computing blocks in parallel; the result is
+                the same for any number
+
+        Returns:
+            float32 array of shape (people, sessions_per_person, 23)
+        """
+        people = self._people(kind, people)
+        n_blocks = -(-len(people) * sessions_per_person // CHUNK_SESSIONS)
+        jobs = [(kind, people, sessions_per_person, stream, block) for block in range(n_blocks)]
+        if workers > 1 and n_blocks > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                blocks = list(pool.map(self._features_block, *zip(*jobs)))
+        else:
+            blocks = [self._features_block(*job) for job in jobs]
+        out = np.concatenate(blocks) if blocks else np.empty((0, len(self.feature_names())), dtype=np.float32)
+        return out.reshape(len(people), sessions_per_person, -1)
+
+    def sessions(self, sessions_per_person: int, kind: str = USERS, people: Optional[Sequence[int]] = None,
+                 stream: int = 0, start_time: float = 0.0) -> List[BehavioralSession]:
+        """
+        The sessions behind features() with the same arguments, as columnar events
+
+        Returns:
+            BehavioralSessions, person-major (all of the first person's sessions first)
+        """
+        sessions = []
+        for events in self._blocks(kind, sessions_per_person, self._people(kind, people), stream, positions=True):
+            n = len(events['who'])
+            nan = np.full((n, 1), np.nan, dtype=np.float32)
+            ikis = np.hstack([nan, events['ikis']])
+            dx = np.cumsum(events['distances'] * np.cos(events['angles']), axis=1)
+            dy = np.cumsum(events['distances'] * np.sin(events['angles']), axis=1)
+            x = np.clip(SCREEN[0] / 2 + dx, 0, SCREEN[0] - 1).astype(np.int16)
+            y = np.clip(SCREEN[1] / 2 + dy, 0, SCREEN[1] - 1).astype(np.int16)
+            key_timestamps = np.zeros((n, self.n_keys))
+            np.cumsum(events['ikis'] / np.float64(1000.0), axis=1, out=key_timestamps[:, 1:])
+            key_timestamps += start_time
+            mouse_timestamps = np.cumsum(events['intervals'], axis=1, dtype=np.float64) + start_time
+            vocabulary = list(KEYS)
+            for i in range(n):
+                sessions.append(BehavioralSession(
+                    key_timestamps=key_timestamps[i], ikis=ikis[i], key_codes=events['codes'][i],
+                    chars=events['codes'][i], vocabulary=vocabulary,
+                    mouse_timestamps=mouse_timestamps[i], x=x[i], y=y[i],
+                    distances=events['distances'][i], velocities=events['velocities'][i],
+                    duration=self.duration
+                ))
+        return sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic feature matrices for benchmarks and FAR/FRR evaluation")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--sessions', type=int, default=1000, help="sessions per user, impostor and bot")
+    parser.add_argument('--impostors', type=int, default=100)
+    parser.add_argument('--bots', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=30.0, help="session length in seconds")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1, help="processes computing blocks in parallel")
+    parser.add_argument('--out', default=None, help="write the matrices to this .npz file")
+    args = parser.parse_args()
+
+    population = SyntheticPopulation(args.users, args.impostors, args.bots, seed=args.seed, duration=args.duration)
+    matrices = {}
+    for kind, count in ((USERS, args.users), (IMPOSTORS, args.impostors), (BOTS, args.bots)):
+        if count == 0:
+            continue
+        start = time.perf_counter()
+        matrices[kind] = population.features(args.sessions, kind, workers=args.workers)
+        elapsed = time.perf_counter() - start
+        n = count * args.sessions
+        print(f"{kind:<10}{n:>10} sessions in {elapsed:6.2f}s ({n / elapsed:,.0f} sessions/s)")
+
+    if args.out:
+        np.savez(args.out, feature_names=np.array(population.feature_names()), **matrices)
+        print(f"Saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_population import USERS, SyntheticPopulation  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def population():
+    return SyntheticPopulation(8, 4, 2, seed=0)
+
+
+@pytest.fixture(scope='session')
+def enrollments(population):
+    """Enrollment feature matrix per username, 12 sessions each"""
+    features = population.features(12, USERS, stream=0)
+    return {f'user{i}': np.asarray(X, dtype=np.float64) for i, X in enumerate(features)}
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from behavioral_model import BehavioralAuthenticationModel
+from check_accuracy import error_rates
+from synthetic_population import USERS, SyntheticPopulation
+
+
+def test_isolation_forest_error_rates():
+    rates = error_rates('isolation_forest', SyntheticPopulation(12, 12, 4, seed=0), n_enroll=10, n_test=20)
+    assert rates['far'] <= 0.15
+    assert rates['bot_far'] <= 0.15
+    assert rates['frr'] <= 0.35
+
+
+def test_decision_uses_fitted_offset(population):
+    enrollment = population.features(10, USERS, stream=0)[0]
+    genuine = population.features(20, USERS, stream=1)[0]
+    model = BehavioralAuthenticationModel()
+    model.enroll_features(enrollment)
+
+    accepted, confidence, scores = model.authenticate_batch(genuine)
+    np.testing.assert_array_equal(accepted, scores >= model.compiled.offset)
+    np.testing.assert_allclose(confidence, np.clip((scores + 0.5) * 100, 0, 100))
+    assert model.compiled.offset == pytest.approx(model.model.offset_, abs=1e-9)
@@ -0,0 +1,20 @@
+import time
+
+from activity_log import ActivityLog
+from activity_tracker import ACTIVITY, LOGIN_ATTEMPT, ActivityTracker
+
+
+def test_replay_reads_only_the_retention_window(tmp_path):
+    log = ActivityLog(str(tmp_path / 'log'))
+    now = time.time()
+    old = now - 40 * 86400
+    log.append(ACTIVITY, 'alice', {'type': 'login', 'details': {}}, old)
+    log.append(LOGIN_ATTEMPT, 'alice', {'success': True, 'behavioral_score': 80.0}, old)
+    log.append(ACTIVITY, 'alice', {'type': 'login', 'details': {}}, now - 60)
+    log.append(LOGIN_ATTEMPT, 'alice', {'success': False, 'behavioral_score': None}, now - 30)
+    log.close()
+
+    tracker = ActivityTracker(ActivityLog(str(tmp_path / 'log')), max_age_days=30)
+    assert tracker.replayed == 2
+    assert [a['type'] for a in tracker.get_all_user_activities('alice')] == ['login']
+    assert [a['success'] for a in tracker.get_login_history('alice')] == [False]
@@ -0,0 +1,26 @@
+import atomic_json
+from atomic_json import WriteBehindJson, read_json
+
+
+def test_write_through_by_default(tmp_path):
+    path = str(tmp_path / 'bans.json')
+    writer = WriteBehindJson(path)
+    writer.set('hwid', 'until')
+    assert read_json(path) == {'hwid': 'until'}
+    assert writer not in atomic_json._write_behind
+
+
+def test_close_flushes_and_unregisters(tmp_path):
+    path = str(tmp_path / 'bans.json')
+    writer = WriteBehindJson(path, delay=60)
+    writer.set('a', 1)
+    writer.set('b', 2)
+    writer.delete('a')
+    assert read_json(path) is None
+    assert writer.get('b') == 2
+    assert writer in atomic_json._write_behind
+
+    writer.close()
+    assert read_json(path) == {'b': 2}
+    assert writer.writes == 1
+    assert writer not in atomic_json._write_behind
@@ -0,0 +1,49 @@
+import numpy as np
+
+from behavioral_session import BehavioralSession
+from feature_extractor import FeatureExtractor
+
+
+def make_session_dict(seed=0, keystrokes=40, movements=60):
+    rng = np.random.default_rng(seed)
+    keystroke_data = [{
+        'timestamp': 1000.0 + i * 0.2 + float(rng.random()) * 1e-3,
+        'char': None if i % 7 == 0 else chr(97 + i % 26),
+        'iki': None if i == 0 else float(rng.uniform(0.05, 0.4)),
+        'key_code': 'char' if i % 5 else 'Key.space'
+    } for i in range(keystrokes)]
+    mouse_data = [{
+        'timestamp': 1000.0 + i * 0.1,
+        'x': int(rng.integers(-2000, 40000)),
+        'y': float(rng.uniform(0, 1080)),
+        'distance': None if i == 0 else float(rng.uniform(1, 100)),
+        'velocity': None if i == 0 else float(rng.uniform(10, 900))
+    } for i in range(movements)]
+    return {'keystroke_data': keystroke_data, 'mouse_data': mouse_data, 'duration': 30}
+
+
+def test_dict_round_trip_is_lossless():
+    data = make_session_dict()
+    assert BehavioralSession.from_dict(data).to_dict() == data
+
+
+def test_session_round_trip_is_lossless():
+    session = BehavioralSession.from_dict(make_session_dict(1))
+    again = BehavioralSession.from_dict(session.to_dict())
+    for name in ('key_timestamps', 'ikis', 'key_codes', 'chars', 'mouse_timestamps',
+                 'x', 'y', 'distances', 'velocities'):
+        np.testing.assert_array_equal(getattr(again, name), getattr(session, name))
+    assert again.vocabulary == session.vocabulary
+    assert again.duration == session.duration
+
+
+def test_features_match_dict_format():
+    data = make_session_dict(2)
+    np.testing.assert_allclose(FeatureExtractor.extract_all_features(BehavioralSession.from_dict(data)),
+                               FeatureExtractor.extract_all_features(data), rtol=1e-12)
+
+
+def test_empty_session():
+    session = BehavioralSession.from_dict({'keystroke_data': [], 'mouse_data': [], 'duration': None})
+    assert len(session) == 0
+    assert session.to_dict() == {'keystroke_data': [], 'mouse_data': [], 'duration': None}
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from feature_extractor import EXACT_QUANTILE_VALUES, FeatureExtractor, StreamingFeatureAccumulator
+from test_behavioral_session import make_session_dict
+
+QUANTILE_COLUMNS = [4, 5, 6, 14, 20]
+
+
+def accumulate(data, chunk=25):
+    accumulator = StreamingFeatureAccumulator()
+    for start in range(0, max(len(data['keystroke_data']), len(data['mouse_data'])), chunk):
+        accumulator.update({'keystroke_data': data['keystroke_data'][start:start + chunk],
+                            'mouse_data': data['mouse_data'][start:start + chunk]})
+    return accumulator.features()
+
+
+@pytest.mark.parametrize('events', [1, 2, 6, 10, 20, 40, 100, EXACT_QUANTILE_VALUES + 1])
+def test_short_sessions_match_batch_extraction(events):
+    data = make_session_dict(events, keystrokes=events, movements=events)
+    np.testing.assert_allclose(accumulate(data), FeatureExtractor.extract_all_features(data),
+                               rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize('events', [EXACT_QUANTILE_VALUES + 2, 3000])
+def test_long_sessions_estimate_quantiles(events):
+    data = make_session_dict(events, keystrokes=events, movements=events)
+    streamed = accumulate(data)
+    expected = FeatureExtractor.extract_all_features(data)
+
+    exact = np.setdiff1d(np.arange(len(expected)), QUANTILE_COLUMNS)
+    np.testing.assert_allclose(streamed[exact], expected[exact], rtol=1e-9)
+    np.testing.assert_allclose(streamed[QUANTILE_COLUMNS], expected[QUANTILE_COLUMNS], rtol=0.05)
+
+
+def test_empty_session():
+    data = {'keystroke_data': [], 'mouse_data': []}
+    np.testing.assert_array_equal(accumulate(data), FeatureExtractor.extract_all_features(data))
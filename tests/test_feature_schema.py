@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from feature_schema import FEATURE_SCHEMA, FeatureSchemaMismatch
+
+
+def test_current_schema_needs_no_mapping():
+    assert FEATURE_SCHEMA.columns_for(FEATURE_SCHEMA.names) is None
+    assert FEATURE_SCHEMA.columns_for(FEATURE_SCHEMA.names, FEATURE_SCHEMA.id) is None
+
+
+def test_other_schema_id_gets_explicit_mapping():
+    columns = FEATURE_SCHEMA.columns_for(FEATURE_SCHEMA.names, 'behavioral/0')
+    np.testing.assert_array_equal(columns, np.arange(len(FEATURE_SCHEMA.names)))
+
+
+def test_reordered_subset_is_mapped():
+    names = ['velocity_max', 'iki_mean']
+    columns = FEATURE_SCHEMA.columns_for(names)
+    assert [FEATURE_SCHEMA.names[c] for c in columns] == names
+
+
+def test_unknown_feature_raises():
+    with pytest.raises(FeatureSchemaMismatch):
+        FEATURE_SCHEMA.columns_for(['iki_mean', 'click_rate'], 'behavioral/0')
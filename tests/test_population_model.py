@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from population_model import PopulationModel, PopulationUserScorer
+
+
+def test_save_load_round_trip(enrollments, tmp_path):
+    population = PopulationModel.fit(enrollments)
+    path = str(tmp_path / 'population.bin')
+    population.save(path)
+    loaded = PopulationModel.load(path)
+
+    assert loaded.usernames == population.usernames
+    for username, X in enrollments.items():
+        expected = population.user_model(username).compiled.score_samples(X)
+        model = loaded.user_model(username)
+        np.testing.assert_allclose(model.compiled.score_samples(X), expected)
+        assert model.compiled.offset == pytest.approx(population.user_model(username).compiled.offset)
+        accepted, confidence, _ = model.authenticate_batch(X)
+        assert accepted.mean() >= 0.5
+        assert np.all((confidence >= 0) & (confidence <= 100))
+
+
+def test_add_and_remove_user(enrollments, tmp_path):
+    names = sorted(enrollments)
+    population = PopulationModel.fit({u: enrollments[u] for u in names[:-1]})
+    population.add_user(names[-1], enrollments[names[-1]])
+    assert population.remove_user(names[0])
+
+    path = str(tmp_path / 'population.bin')
+    population.save(path)
+    loaded = PopulationModel.load(path)
+    assert names[0] not in loaded and names[-1] in loaded
+    scorer = PopulationUserScorer(loaded, names[-1])
+    assert scorer.offset == pytest.approx(loaded.user_offsets[loaded.index[names[-1]]])
+    assert scorer.score(enrollments[names[-1]])[1].mean() >= 0.5
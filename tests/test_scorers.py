@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from population_model import PopulationModel, PopulationUserScorer
+from scorers import SCORERS, FittedScorer, Scorer, create_scorer
+
+
+def test_interfaces_are_abstract():
+    with pytest.raises(TypeError):
+        Scorer()
+    with pytest.raises(TypeError):
+        FittedScorer()
+
+
+@pytest.mark.parametrize('model_type', sorted(SCORERS))
+def test_fitted_scorers(model_type, enrollments):
+    X = enrollments['user0']
+    scorer = create_scorer(model_type).fit(X, contamination=0.1)
+    scores, inliers = scorer.score(X)
+    assert scores.shape == (len(X),)
+    assert np.all((scores > -1) & (scores <= 0))
+    assert inliers.mean() >= 0.8
+
+    restored = SCORERS[model_type].from_arrays(scorer.arrays(), scorer.offset)
+    np.testing.assert_allclose(restored.score_samples(X), scores)
+
+
+def test_population_user_scorer(enrollments):
+    population = PopulationModel.fit(enrollments)
+    scorer = PopulationUserScorer(population, 'user0')
+    assert isinstance(scorer, Scorer)
+    assert scorer.offset == pytest.approx(population.user_offsets[population.index['user0']])
+
+    X = enrollments['user0']
+    scores, inliers = scorer.score(X)
+    np.testing.assert_allclose(scores, population.score_samples('user0', X))
+    assert inliers.mean() >= 0.5
+    assert scorer.nbytes > 0
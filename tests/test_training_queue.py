@@ -0,0 +1,32 @@
+import time
+
+import pytest
+
+from training_queue import COMPLETED, QUEUED, TrainingExecutor, TrainingJobRunning
+
+
+def wait_for(job, timeout=30):
+    deadline = time.time() + timeout
+    while not job.done and time.time() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def test_resubmitting_replaces_queued_payload_and_rejects_running():
+    executor = TrainingExecutor(max_workers=1)
+    try:
+        running = executor.submit('alice', time.sleep, 0.5)
+        queued = executor.submit('bob', abs, -1, priority=10)
+        assert queued.status == QUEUED
+
+        again = executor.submit('bob', abs, -2, priority=5)
+        assert again is queued
+        assert again.priority == 5
+        with pytest.raises(TrainingJobRunning) as raised:
+            executor.submit('alice', time.sleep, 0)
+        assert raised.value.job is running
+
+        assert wait_for(queued).status == COMPLETED
+        assert queued.result == 2
+    finally:
+        executor.shutdown()
@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+from user_index import MERGE_AFTER, UserIndex
+
+
+def expected_page(users, after, limit, enrolled):
+    names = sorted(name for name, flag in users.items()
+                   if (enrolled is None or flag == enrolled) and (after is None or name > after))
+    return [(name, users[name]) for name in names[:limit]]
+
+
+@pytest.mark.parametrize('changes', [MERGE_AFTER, 200])
+def test_other_process_changes_are_replayed(changes, tmp_path):
+    path = str(tmp_path / 'users.idx')
+    writer, reader = UserIndex(path), UserIndex(path)
+    rng = random.Random(changes)
+    users = {f'user{i:04d}': rng.random() < 0.5 for i in range(300)}
+    writer.rebuild(users.items())
+    assert len(reader) == len(users)
+
+    for _ in range(changes):
+        name = f'user{rng.randrange(400):04d}'
+        if rng.random() < 0.3:
+            writer.remove(name)
+            users.pop(name, None)
+        else:
+            users[name] = rng.random() < 0.5
+            writer.add(name, users[name])
+
+    for index in (writer, reader, UserIndex(path)):
+        assert index.names() == sorted(users)
+        assert len(index) == len(users)
+        for after in (None, 'user0100', 'user0399', 'user9999'):
+            for enrolled in (None, True, False):
+                assert index.page(after, 25, enrolled) == expected_page(users, after, 25, enrolled)
+
+
+def test_compaction_keeps_contents(tmp_path):
+    path = str(tmp_path / 'users.idx')
+    index = UserIndex(path, compact_after=5)
+    for i in range(12):
+        index.add(f'u{i:02d}', i % 3 == 0)
+    index.remove('u03')
+    reloaded = UserIndex(path)
+    assert reloaded.page(limit=100, enrolled=True) == [('u00', True), ('u06', True), ('u09', True)]
+    assert reloaded.names() == index.names()
+    assert 'u03' not in reloaded
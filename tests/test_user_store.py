@@ -0,0 +1,117 @@
+import pytest
+
+from user_store import FileSystemUserStore, SQLiteUserStore, UserStore
+
+
+def test_interface_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        UserStore(str(tmp_path))
+
+
+@pytest.mark.parametrize('store_class', [FileSystemUserStore, SQLiteUserStore])
+def test_backends_implement_the_interface(store_class, tmp_path):
+    store = store_class(str(tmp_path))
+    try:
+        assert store.count_users() == 0
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize('layout', ['flat', 'sharded'])
+def test_locate_finds_users_in_either_layout(layout, tmp_path):
+    store = FileSystemUserStore(str(tmp_path), layout=layout)
+    store.create({'username': 'alice', 'enrolled': True})
+    other = FileSystemUserStore(str(tmp_path), layout='sharded' if layout == 'flat' else 'flat')
+
+    for reader in (store, other):
+        path, record = reader.locate('alice')
+        assert path == store.user_path('alice')
+        assert record == {'username': 'alice', 'enrolled': True}
+    assert store.locate('bob') == (store.user_path('bob'), None)
+
+
+def make_records(n=30):
+    return [{
+        'username': f'user{i:02d}',
+        'hwid': f'hwid-{i % 7}',
+        'created_at': f'2026-01-{i % 28 + 1:02d}T10:00:00',
+        'enrolled': i % 3 == 0,
+        'password_hash': 'ab' * 16,
+        'password_salt': 'cd' * 8,
+        'password_iterations': 1000 + i,
+        'theme': 'dark' if i % 2 else None,
+    } for i in range(n)]
+
+
+def stored(record):
+    return {key: value for key, value in record.items() if value is not None}
+
+
+@pytest.mark.parametrize('store_class', [FileSystemUserStore, SQLiteUserStore])
+def test_record_round_trip(store_class, tmp_path):
+    store = store_class(str(tmp_path))
+    try:
+        records = make_records()
+        for record in records:
+            assert store.create(record)
+        assert not store.create(records[0])
+        for record in records:
+            assert store.get(record['username']) == stored(record)
+
+        assert store.update('user01', suspended_until='2026-02-01T00:00:00', theme=None, enrolled=True)
+        expected = dict(stored(records[1]), suspended_until='2026-02-01T00:00:00', enrolled=True)
+        del expected['theme']
+        assert store.get('user01') == expected
+        assert not store.update('nobody', enrolled=True)
+
+        assert store.delete('user02')
+        assert not store.delete('user02')
+        assert store.get('user02') is None
+
+        names = sorted(record['username'] for record in records if record['username'] != 'user02')
+        assert store.list_users() == names
+        assert store.count_users() == len(names)
+        first = store.page_users(limit=10)
+        assert [user['username'] for user in first] == names[:10]
+        rest = store.page_users(after=first[-1]['username'], limit=100, enrolled=True)
+        assert all(user['enrolled'] for user in rest)
+        assert [user['username'] for user in rest] == [
+            name for name in names[10:] if store.get(name)['enrolled']]
+
+        store.ban_hwid('hwid-1', '2026-03-01T00:00:00')
+        store.ban_hwid('hwid-2', '2026-03-02T00:00:00')
+        assert store.get_hwid_ban('hwid-1') == '2026-03-01T00:00:00'
+        assert store.unban_hwid('hwid-1')
+        assert not store.unban_hwid('hwid-1')
+        assert store.hwid_bans() == {'hwid-2': '2026-03-02T00:00:00'}
+        assert store.clear_hwid_bans() == 1
+        assert store.hwid_bans() == {}
+    finally:
+        store.close()
+
+
+def test_migration_copies_filesystem_store_into_sqlite(tmp_path, monkeypatch):
+    import migrate_user_store
+
+    users_dir = str(tmp_path / 'users')
+    source = FileSystemUserStore(users_dir)
+    for record in make_records():
+        source.create(record)
+    source.update('user05', suspended_until='2026-02-01T00:00:00')
+    source.ban_hwids({'hwid-3': '2026-03-01T00:00:00', 'hwid-4': '2026-03-02T00:00:00'})
+    source.close()
+
+    monkeypatch.setattr('sys.argv', ['migrate_user_store.py', '--users-dir', users_dir, '--batch-size', '7'])
+    migrate_user_store.main()
+
+    source = FileSystemUserStore(users_dir)
+    target = SQLiteUserStore(users_dir)
+    try:
+        assert target.list_users() == source.list_users()
+        for username in source.list_users():
+            assert target.get(username) == source.get(username)
+        assert target.page_users(limit=100, enrolled=True) == source.page_users(limit=100, enrolled=True)
+        assert target.hwid_bans() == source.hwid_bans()
+    finally:
+        source.close()
+        target.close()
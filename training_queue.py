@@ -0,0 +1,282 @@
+"""
+Training Queue - Runs model training in a bounded process pool off the request threads
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+# Rough share of the work done when a job enters each state
+_STAGE_PROGRESS = {QUEUED: 0.0, RUNNING: 0.1, COMPLETED: 1.0, FAILED: 1.0}
+
+
+class TrainingQueueFull(Exception):
+    """Raised when the queue already holds the maximum number of pending jobs"""
+
+
+class TrainingJobRunning(Exception):
+    """Raised when the user's job is already running, so newer data can no longer replace it"""
+
+    def __init__(self, job: 'TrainingJob'):
+        super().__init__(f"a training job for '{job.username}' is already running ({job.job_id})")
+        self.job = job
+
+
+def enroll_user_job(users_dir: str, username: str, num_sessions: int, session_duration: int) -> bool:
+    """Worker: run UserManager.enroll_user, which trains and saves the model artifact"""
+    from user_manager import UserManager
+    return UserManager(users_dir=users_dir).enroll_user(
+        username, num_sessions=num_sessions, session_duration=session_duration
+    )
+
+
+def fit_features_job(features: List[List[float]], contamination: float = 0.1,
+                     feature_names: Optional[List[str]] = None):
+    """Worker: fit a behavioral model on a feature matrix (optionally on some of its features) and return it"""
+    from behavioral_model import BehavioralAuthenticationModel
+
+    model = BehavioralAuthenticationModel(contamination=contamination)
+    model.enroll_features(features, feature_names=feature_names)
+    return model
+
+
+class TrainingJob:
+    """One queued training run"""
+
+    __slots__ = ('job_id', 'username', 'kind', 'priority', 'status', 'result', 'error',
+                 'submitted_at', 'started_at', 'finished_at', 'fn', 'args', 'on_complete')
+
+    def __init__(self, username: str, kind: str, priority: int, fn: Callable, args: tuple,
+                 on_complete: Optional[Callable[['TrainingJob'], None]] = None):
+        self.job_id = uuid.uuid4().hex
+        self.username = username
+        self.kind = kind
+        self.priority = priority
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.fn = fn
+        self.args = args
+        self.on_complete = on_complete
+
+    @property
+    def done(self) -> bool:
+        return self.status in (COMPLETED, FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-friendly job status"""
+        now = self.finished_at or time.time()
+        return {
+            'job_id': self.job_id,
+            'username': self.username,
+            'kind': self.kind,
+            'priority': self.priority,
+            'status': self.status,
+            'progress': _STAGE_PROGRESS[self.status],
+            'error': self.error,
+            'queued_seconds': round((self.started_at or now) - self.submitted_at, 3),
+            'run_seconds': round(now - self.started_at, 3) if self.started_at else None
+        }
+
+
+class TrainingExecutor:
+    """
+    Priority queue in front of a bounded process pool.
+
+    At most max_workers jobs run at once; the rest wait in a heap ordered by
+    priority (lower runs first) and submission order. Each user has at most
+    one pending or running job. Submitting again while the job is queued
+    gives that job the new function and arguments, so it trains on the
+    newest data, and raises its priority if the new request is more urgent;
+    submitting while it runs raises TrainingJobRunning. Finished jobs are
+    kept for polling until max_history newer jobs have finished.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: int = 100,
+                 max_history: int = 1000):
+        """
+        Initialize the executor
+
+        Args:
+            max_workers: Worker processes (default: CPU count, at most 4)
+            max_pending: Maximum number of queued jobs before submissions are rejected
+            max_history: Number of finished jobs kept for status polling
+        """
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending
+        self.max_history = max_history
+        self._pool = None
+        self._heap = []
+        self._counter = itertools.count()
+        self._jobs: Dict[str, TrainingJob] = {}
+        self._active: Dict[str, TrainingJob] = {}
+        self._finished: List[str] = []
+        self._running = 0
+        # Reentrant: a future that is already done runs its callback inside _dispatch
+        self._lock = threading.RLock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _discard_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Drop a broken pool so the next dispatch starts a fresh one; caller holds the lock"""
+        if self._pool is pool:
+            self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, username: str, fn: Callable, *args, kind: str = 'enroll', priority: int = 10,
+               on_complete: Optional[Callable[[TrainingJob], None]] = None) -> TrainingJob:
+        """
+        Queue a training function for a user
+
+        Args:
+            username: User the job trains a model for (deduplication key)
+            fn: Picklable module-level function run in a worker process
+            *args: Arguments for fn
+            kind: Label reported in the job status
+            priority: Lower values run first
+            on_complete: Called in the parent process with the finished job
+
+        Returns:
+            The new job, or the user's queued job now carrying this payload
+
+        Raises:
+            TrainingQueueFull: if max_pending jobs are already queued
+            TrainingJobRunning: if the user's job has already started
+        """
+        with self._lock:
+            existing = self._active.get(username)
+            if existing is not None:
+                if existing.status != QUEUED:
+                    raise TrainingJobRunning(existing)
+                existing.kind = kind
+                existing.fn = fn
+                existing.args = args
+                existing.on_complete = on_complete
+                if priority < existing.priority:
+                    existing.priority = priority
+                    heapq.heappush(self._heap, (priority, next(self._counter), existing))
+                return existing
+
+            queued = sum(1 for job in self._active.values() if job.status == QUEUED)
+            if queued >= self.max_pending:
+                raise TrainingQueueFull(f"training queue is full ({self.max_pending} pending jobs)")
+
+            job = TrainingJob(username, kind, priority, fn, args, on_complete)
+            self._jobs[job.job_id] = job
+            self._active[username] = job
+            heapq.heappush(self._heap, (priority, next(self._counter), job))
+            self._dispatch()
+        return job
+
+    def _dispatch(self) -> None:
+        """Start queued jobs while workers are free; caller holds the lock"""
+        while self._heap and self._running < self.max_workers:
+            priority, _, job = heapq.heappop(self._heap)
+            # Jobs whose priority was raised are in the heap twice; skip the stale entry
+            if job.status != QUEUED or priority != job.priority:
+                continue
+            job.status = RUNNING
+            job.started_at = time.time()
+            self._running += 1
+            pool = self._get_pool()
+            try:
+                future = pool.submit(job.fn, *job.args)
+            except BrokenProcessPool:
+                # A worker died (OOM kill, crash in native code) since the last job finished
+                self._discard_pool(pool)
+                pool = self._get_pool()
+                future = self._submit_or_fail(pool, job)
+            except Exception as e:
+                future = Future()
+                future.set_exception(e)
+            future.add_done_callback(lambda f, job=job, pool=pool: self._finish(job, f, pool))
+
+    @staticmethod
+    def _submit_or_fail(pool: ProcessPoolExecutor, job: TrainingJob) -> Future:
+        try:
+            return pool.submit(job.fn, *job.args)
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+            return future
+
+    def _finish(self, job: TrainingJob, future, pool: ProcessPoolExecutor) -> None:
+        try:
+            job.result = future.result()
+            job.status = COMPLETED
+        except BrokenProcessPool:
+            # Every job running in the pool fails with it; queued jobs go to a new pool
+            job.error = "training worker process died"
+            job.status = FAILED
+            with self._lock:
+                self._discard_pool(pool)
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        job.finished_at = time.time()
+
+        if job.on_complete is not None:
+            try:
+                job.on_complete(job)
+            except Exception as e:
+                print(f"⚠️  Training completion handler failed for '{job.username}': {e}")
+
+        with self._lock:
+            self._running -= 1
+            if self._active.get(job.username) is job:
+                del self._active[job.username]
+            self._finished.append(job.job_id)
+            while len(self._finished) > self.max_history:
+                self._jobs.pop(self._finished.pop(0), None)
+            self._dispatch()
+
+    def get(self, job_id: str) -> Optional[TrainingJob]:
+        """Look up a job by id"""
+        return self._jobs.get(job_id)
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job, including its position among queued jobs"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            info = job.to_dict()
+            if job.status == QUEUED:
+                ahead = [other for other in self._active.values()
+                         if other.status == QUEUED and (other.priority, other.submitted_at) < (job.priority, job.submitted_at)]
+                info['queue_position'] = len(ahead) + 1
+            return info
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and worker usage"""
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'running': self._running,
+                'queued': sum(1 for job in self._active.values() if job.status == QUEUED),
+                'max_pending': self.max_pending,
+                'tracked_jobs': len(self._jobs)
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
@@ -1,29 +1,22 @@
-import os
-import json
-import glob
+from config import USER_MANAGEMENT
+from user_store import create_user_store
 
-users_dir = "users"
-banned_hwids_file = os.path.join(users_dir, "banned_hwids.json")
+store = create_user_store(USER_MANAGEMENT['users_directory'])
 
-if os.path.exists(banned_hwids_file):
-    with open(banned_hwids_file, "w") as f:
-        json.dump({}, f)
-    print("Cleared banned_hwids.json")
+cleared = store.clear_hwid_bans()
+if cleared:
+    print(f"Cleared {cleared} banned HWID(s)")
 
-config_files = glob.glob(os.path.join(users_dir, "*", "config.json"))
 count = 0
-for cfile in config_files:
-    try:
-        with open(cfile, "r") as f:
-            data = json.load(f)
-        
-        if "suspended_until" in data:
-            del data["suspended_until"]
-            with open(cfile, "w") as f:
-                json.dump(data, f, indent=2)
-            print(f"Removed ban from {cfile}")
-            count += 1
-    except Exception as e:
-        print(f"Error processing {cfile}: {e}")
+with store.batch():
+    for username in store.list_users():
+        try:
+            record = store.get(username) or {}
+            if "suspended_until" in record:
+                store.update(username, suspended_until=None)
+                print(f"Removed ban from {username}")
+                count += 1
+        except Exception as e:
+            print(f"Error processing {username}: {e}")
 
 print(f"Unban process complete. Unbanned {count} user(s).")
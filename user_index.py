@@ -0,0 +1,234 @@
+"""
+User Index - Sorted usernames and enrolled flags for the filesystem user store
+
+Listing users used to mean scanning every entry of users/ and stat'ing it.
+The index keeps the sorted usernames with their enrolled flag in two files:
+
+    users.idx       JSON snapshot of [username, enrolled] pairs, sorted
+    users.idx.log   journal of changes since the snapshot, one JSON line each
+
+Writers append one line to the journal under the index lock, so a change
+costs one small append instead of rewriting the whole list. Every
+compact_after entries the journal is folded into a new snapshot. Readers
+stat both files and replay only the journal lines they have not yet seen,
+so changes made by other processes show up without a full reload.
+
+In memory, enrolled and not enrolled users are kept in two sorted lists, so
+a page filtered by the flag is a slice of one list and an unfiltered page
+merges the two, both in O(log n + page). A batch of replayed journal lines
+is merged into the lists in one linear pass rather than inserted one by one.
+"""
+
+import os
+import json
+import bisect
+import heapq
+import threading
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+from atomic_json import file_lock, write_json
+
+ADD = '+'
+REMOVE = '-'
+
+# Replayed changes up to this many are inserted one by one; more are merged in one pass
+MERGE_AFTER = 16
+
+
+class UserIndex:
+    """Sorted usernames with enrolled flags, persisted as a snapshot plus journal"""
+
+    def __init__(self, path: str, compact_after: int = 1000):
+        """
+        Args:
+            path: Snapshot file; the journal is path + '.log'
+            compact_after: Journal entries that trigger a new snapshot
+        """
+        self.path = path
+        self.journal_path = path + '.log'
+        self.compact_after = compact_after
+        self._by_flag: Dict[bool, List[str]] = {False: [], True: []}
+        self._enrolled: Dict[str, bool] = {}
+        self._signature = None
+        self._offset = 0
+        self._journal_entries = 0
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _stat(path: str):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _load(self, signature) -> None:
+        try:
+            with open(self.path, 'r') as f:
+                pairs = json.load(f)['users']
+        except FileNotFoundError:
+            pairs = []
+        self._enrolled = {name: bool(enrolled) for name, enrolled in pairs}
+        self._by_flag = {flag: [name for name, enrolled in pairs if bool(enrolled) == flag]
+                         for flag in (False, True)}
+        self._signature = signature
+        self._offset = 0
+        self._journal_entries = 0
+
+    def _refresh(self) -> None:
+        """Pick up a new snapshot and any journal lines written since the last call"""
+        signature = self._stat(self.path)
+        if signature != self._signature:
+            self._load(signature)
+        journal = self._stat(self.journal_path)
+        size = journal[2] if journal is not None else 0
+        if size < self._offset:
+            # Journal was truncated without a new snapshot (rebuilt elsewhere); start over
+            self._load(signature)
+        if size == self._offset:
+            return
+        with open(self.journal_path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        # Only whole lines; a writer may be in the middle of appending
+        end = data.rfind(b'\n') + 1
+        changes = {}
+        for line in data[:end].splitlines():
+            try:
+                op, name, enrolled = json.loads(line)
+            except ValueError:
+                # Torn line left by a writer that crashed mid-append
+                continue
+            # Only the last change to each user matters
+            changes[name] = bool(enrolled) if op == ADD else None
+            self._journal_entries += 1
+        self._apply_many(changes)
+        self._offset += end
+
+    def _apply(self, name: str, enrolled: Optional[bool]) -> None:
+        """Set one user's flag, or remove the user if enrolled is None"""
+        if name in self._enrolled:
+            if self._enrolled[name] == enrolled:
+                return
+            names = self._by_flag[self._enrolled.pop(name)]
+            del names[bisect.bisect_left(names, name)]
+        if enrolled is not None:
+            self._enrolled[name] = enrolled
+            bisect.insort(self._by_flag[enrolled], name)
+
+    def _apply_many(self, changes: Dict[str, Optional[bool]]) -> None:
+        """_apply for many users, in one pass over the lists when there are enough of them"""
+        if len(changes) <= MERGE_AFTER:
+            for name, enrolled in changes.items():
+                self._apply(name, enrolled)
+            return
+        leaving = {False: set(), True: set()}
+        added = {False: [], True: []}
+        for name, enrolled in changes.items():
+            previous = self._enrolled.pop(name, None)
+            if previous == enrolled and previous is not None:
+                self._enrolled[name] = enrolled
+                continue
+            if previous is not None:
+                leaving[previous].add(name)
+            if enrolled is not None:
+                self._enrolled[name] = enrolled
+                added[enrolled].append(name)
+        for flag, names in self._by_flag.items():
+            if leaving[flag]:
+                names = self._by_flag[flag] = [name for name in names if name not in leaving[flag]]
+            if added[flag]:
+                names.extend(sorted(added[flag]))
+                # Two sorted runs; the sort merges them in linear time
+                names.sort()
+
+    def _iter_names(self, after: Optional[str] = None):
+        """Usernames sorting after after (all if None), in order"""
+        def tail(names):
+            start = bisect.bisect_right(names, after) if after is not None else 0
+            return (names[i] for i in range(start, len(names)))
+
+        return heapq.merge(*(tail(names) for names in self._by_flag.values()))
+
+    def _append(self, op: str, name: str, enrolled: bool = False) -> None:
+        line = (json.dumps([op, name, bool(enrolled)]) + '\n').encode('utf-8')
+        with self._lock, file_lock(self.path):
+            self._refresh()
+            with open(self.journal_path, 'ab') as f:
+                f.write(line)
+            self._offset += len(line)
+            self._journal_entries += 1
+            self._apply(name, bool(enrolled) if op == ADD else None)
+            if self._journal_entries >= self.compact_after:
+                self._write_snapshot()
+
+    def _write_snapshot(self) -> None:
+        """Fold the journal into a new snapshot; caller holds both locks"""
+        write_json(self.path, {'users': [[name, self._enrolled[name]] for name in self._iter_names()]},
+                   indent=None)
+        open(self.journal_path, 'wb').close()
+        self._signature = self._stat(self.path)
+        self._offset = 0
+        self._journal_entries = 0
+
+    def add(self, username: str, enrolled: bool = False) -> None:
+        """Insert a user or change their enrolled flag"""
+        self._append(ADD, username, enrolled)
+
+    def remove(self, username: str) -> None:
+        self._append(REMOVE, username)
+
+    def rebuild(self, entries: Iterable[Tuple[str, bool]]) -> int:
+        """
+        Replace the index with entries, holding the index lock throughout
+
+        Args:
+            entries: (username, enrolled) pairs in any order
+
+        Returns:
+            Number of users indexed
+        """
+        with self._lock, file_lock(self.path):
+            self._enrolled = {name: bool(enrolled) for name, enrolled in entries}
+            self._by_flag = {flag: sorted(name for name, enrolled in self._enrolled.items() if enrolled == flag)
+                             for flag in (False, True)}
+            self._write_snapshot()
+            return len(self._enrolled)
+
+    def names(self) -> List[str]:
+        """All usernames, sorted"""
+        with self._lock:
+            self._refresh()
+            return list(self._iter_names())
+
+    def page(self, after: Optional[str] = None, limit: int = 100,
+             enrolled: Optional[bool] = None) -> List[Tuple[str, bool]]:
+        """
+        One page of (username, enrolled), sorted by username
+
+        Args:
+            after: Return users sorting after this name (the last name of
+                the previous page); None starts at the beginning
+            limit: Maximum number of users returned
+            enrolled: Only users with this enrolled flag
+        """
+        with self._lock:
+            self._refresh()
+            if enrolled is None:
+                return [(name, self._enrolled[name]) for name in islice(self._iter_names(after), limit)]
+            names = self._by_flag[bool(enrolled)]
+            start = bisect.bisect_right(names, after) if after is not None else 0
+            return [(name, bool(enrolled)) for name in names[start:start + limit]]
+
+    def __contains__(self, username: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return username in self._enrolled
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._enrolled)
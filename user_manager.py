@@ -7,35 +7,166 @@ import json
 import time 
 import random 
 import datetime
-from typing import Dict ,List ,Optional ,Tuple, Any 
+from typing import Dict ,List ,Optional ,Tuple, Any ,Union 
 from behavioral_model import BehavioralAuthenticationModel
 from behavioral_data_collector import BehavioralDataCollector
+from behavioral_session import BehavioralSession ,BehavioralSessionBuilder 
 from feature_extractor import FeatureExtractor
-import hashlib 
+from model_registry import ModelRegistry
+from atomic_json import file_lock 
+from population_model import PopulationModel ,population_model_path 
+from user_store import UserStore ,create_user_store 
+from config_cache import JsonFileCache 
+from password_hasher import HashingPoolFull ,PasswordHasher 
+from config import AUTHENTICATION ,MODEL_TRAINING ,PERFORMANCE ,USER_MANAGEMENT
 import uuid
-import binascii 
 import os 
 
+class UserContext :
+    """
+    One request's view of a user's record and device ban
+    
+    The record and the ban on its HWID are read once when the context is
+    created. Every stage of the request reads and changes the in-memory
+    copy. flush() (or leaving the with block) then writes the changed
+    fields and the ban change together in one batch.
+    """
+
+    def __init__ (self ,manager :'UserManager',username :str ):
+        self .manager =manager 
+        self .username =username 
+        self ._changes ={}
+        self ._ban_change =None 
+        self .reload ()
+
+    def reload (self ):
+        """Read the record and ban state from the store, dropping unflushed changes"""
+        store =self .manager .store 
+        self .record =store .get (self .username )
+        hwid =self .hwid 
+        self .hwid_banned_until =store .get_hwid_ban (hwid )if hwid else None 
+        self ._changes ={}
+        self ._ban_change =None 
+
+    def __enter__ (self )->'UserContext':
+        return self 
+
+    def __exit__ (self ,exc_type ,exc ,tb ):
+        self .flush ()
+        return False 
+
+    @property 
+    def exists (self )->bool :
+        return self .record is not None 
+
+    @property 
+    def hwid (self )->Optional [str ]:
+        return self .record .get ('hwid')if self .record is not None else None 
+
+    @property 
+    def suspended_until (self )->Optional [str ]:
+        return self .record .get ('suspended_until')if self .record is not None else None 
+
+    @property 
+    def dirty (self )->bool :
+        return bool (self ._changes )or self ._ban_change is not None 
+
+    def get (self ,field :str ,default :Any =None )->Any :
+        return self .record .get (field ,default )if self .record is not None else default 
+
+    def set (self ,**fields ):
+        """Change record fields in memory; None removes a field"""
+        if self .record is None :
+            return 
+        for field ,value in fields .items ():
+            if value is None :
+                self .record .pop (field ,None )
+            else :
+                self .record [field ]=value 
+        self ._changes .update (fields )
+
+    def verify_password (self ,password :str )->bool :
+        """
+        Check the password; on success, upgrade a hash made with an older scheme
+        
+        The new hash is written by flush() with the other changes. If the
+        hashing pool is saturated the upgrade waits for a later login.
+        """
+        hasher =self .manager .hasher 
+        if not self .manager .check_password (self .username ,self .record ,password ):
+            return False 
+        if hasher .needs_rehash (self .record ):
+            try :
+                self .set (**hasher .hash (password ))
+            except HashingPoolFull :
+                pass 
+        return True 
+
+    def ban_hwid (self ,until :str ):
+        """Ban the user's device HWID until the given ISO timestamp"""
+        if self .hwid :
+            self .hwid_banned_until =until 
+            self ._ban_change =until 
+
+    def unban_hwid (self ):
+        if self .hwid and self .hwid_banned_until is not None :
+            self .hwid_banned_until =None 
+            self ._ban_change =''
+
+    def flush (self )->bool :
+        """
+        Write pending changes in one batch
+        
+        Returns:
+            True if anything was written
+        """
+        if not self .dirty :
+            return False 
+        store =self .manager .store 
+        with store .batch ():
+            if self ._changes :
+                store .apply (self .username ,self .record ,self ._changes )
+            if self ._ban_change :
+                store .ban_hwid (self .hwid ,self ._ban_change )
+            elif self ._ban_change is not None :
+                store .unban_hwid (self .hwid )
+        self ._changes ={}
+        self ._ban_change =None 
+        return True 
+
 class UserManager :
     """Manages user enrollment and authentication"""
 
-    def __init__ (self ,users_dir :str ="users"):
+    def __init__ (self ,users_dir :str ="users",store :Optional [UserStore ]=None ,hasher :Optional [PasswordHasher ]=None ):
         """
         Initialize user manager
         
         Args:
             users_dir: Directory to store user profiles
+            store: User record backend (default: USER_MANAGEMENT['user_store'])
+            hasher: Password hashing pool (default: hash inline in the calling thread)
         """
         self .users_dir =users_dir 
-        if not os .path .exists (users_dir ):
-            os .makedirs (users_dir )
+        self .hasher =hasher if hasher is not None else PasswordHasher (max_workers =0 )
+        # Parsed config.json / metadata.json / banned_hwids.json, validated by os.stat
+        self .config_cache =JsonFileCache (max_entries =PERFORMANCE ['config_cache_size'])
+        self .store =store if store is not None else create_user_store (users_dir ,cache =self .config_cache )
 
         self .current_user =None 
         self .current_model =None 
 
+        self .model_registry =ModelRegistry (
+        self ._model_path ,
+        self ._load_model_file ,
+        max_models =PERFORMANCE ['max_cache_size'],
+        max_bytes =PERFORMANCE ['model_cache_max_bytes']
+        )
+        self ._population =None 
+        self ._population_signature =None 
+
     def user_exists (self ,username :str )->bool :
         """Check if user profile exists"""
-        return os .path .exists (os .path .join (self .users_dir ,username ))
+        return self .store .exists (username )
 
     def verify_password (self ,username :str ,password :str )->bool :
         """
@@ -48,39 +179,36 @@ class UserManager :
         Returns:
             True if password matches, False otherwise
         """
-        if not self .user_exists (username ):
-            return False 
+        return self .check_password (username ,self .store .get (username ),password )
 
-        config_file =os .path .join (self .users_dir ,username ,"config.json")
+    def check_password (self ,username :str ,config :Optional [Dict ],password :str )->bool :
+        """
+        Verify a password against an already loaded user record
+        
+        Raises:
+            HashingPoolFull: if the hashing pool is saturated
+        """
         try :
-            with open (config_file ,'r')as f :
-                config =json .load (f )
+            if config is None :
+                return False 
 
             if 'password_hash' not in config:
                 print(f"❌ User '{username}' has no password set.")
                 return False 
 
-            password_hash = config['password_hash']
-            password_salt = binascii.unhexlify(config['password_salt'])
-            iterations = config.get('password_iterations', 100000)
-
-            dk = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), password_salt, iterations)
-            computed_hash = binascii.hexlify(dk).decode('ascii')
-
-            return computed_hash == password_hash
+            return self .hasher .verify (config ,password )
+        except HashingPoolFull :
+            raise 
         except Exception as e :
             print (f"Error verifying password: {e }")
             return False 
 
     def create_user (self ,username :str ,password :Optional[str] =None ,hwid :Optional[str] =None )->bool :
-        """Create new user directory with HWID"""
-        user_path =os .path .join (self .users_dir ,username )
-        if os .path .exists (user_path ):
+        """Create new user record with HWID"""
+        if self .store .exists (username ):
             print (f"❌ User '{username }' already exists")
             return False 
 
-        os .makedirs (user_path )
-
         if hwid is None :
             import subprocess
             try:
@@ -104,15 +232,10 @@ class UserManager :
         }
 
         if password :
-            salt =os .urandom (16 )
-            iterations =100000 
-            dk =hashlib .pbkdf2_hmac ('sha256',password .encode ('utf-8'),salt ,iterations )
-            user_config ['password_hash']=binascii .hexlify (dk ).decode ('ascii')
-            user_config ['password_salt']=binascii .hexlify (salt ).decode ('ascii')
-            user_config ['password_iterations']=iterations 
-        config_file =os .path .join (user_path ,"config.json")
-        with open (config_file ,'w')as f :
-            json .dump (user_config ,f ,indent =2 )
+            user_config .update (self .hasher .hash (password ))
+        if not self .store .create (user_config ):
+            print (f"❌ User '{username }' already exists")
+            return False 
 
         print (f"✅ User '{username }' created")
         return True 
@@ -145,15 +268,15 @@ class UserManager :
 
             try :
 
-                collector =BehavioralDataCollector (duration =session_duration )
+                collector =BehavioralDataCollector (duration =session_duration ,columnar =True )
                 auth_data =collector .collect ()
 
-                if not auth_data ['keystroke_data']and not auth_data ['mouse_data']:
+                if len (auth_data )==0 :
                     print (f"⚠️  No input detected in session {session }, creating synthetic data...")
-                    auth_data =self ._create_synthetic_data (session_duration, username )
+                    auth_data =self ._create_synthetic_data (session_duration ,username ,columnar =True )
             except Exception as e :
                 print (f"⚠️  Real-time collection failed ({str(e):.50s}), using synthetic data...")
-                auth_data =self ._create_synthetic_data (session_duration, username )
+                auth_data =self ._create_synthetic_data (session_duration ,username ,columnar =True )
 
             behavioral_data_list .append (auth_data )
             print (f"✅ Session {session } complete")
@@ -165,20 +288,15 @@ class UserManager :
         if not success:
             return False
 
-        model_file =os .path .join (self .users_dir ,username ,"model.pkl")
-        model .save_model (model_file )
+        self ._save_user_model (username ,model )
+        self ._update_population (username ,model .enrollment_data )
 
-        config_file =os .path .join (self .users_dir ,username ,"config.json")
-        with open (config_file ,'r')as f :
-            config =json .load (f )
-        config ['enrolled']=True 
-        with open (config_file ,'w')as f :
-            json .dump (config ,f ,indent =2 )
+        self .store .update (username ,enrolled =True )
 
         print (f"✅ Enrollment complete for user '{username }'")
         return True 
 
-    def _create_synthetic_data (self ,duration :int , username:str="" )->Dict :
+    def _create_synthetic_data (self ,duration :int ,username :str ="",columnar :bool =False )->Union [Dict ,BehavioralSession ]:
         """Create synthetic behavioral data for testing (when real capture fails)"""
         import random 
         import hashlib
@@ -190,6 +308,7 @@ class UserManager :
         
         rng = random.Random(seed_value)
 
+        builder =BehavioralSessionBuilder (capacity =int (duration *10 ))if columnar else None 
         keystroke_data =[]
         mouse_data =[]
         start_time =time .time ()
@@ -197,23 +316,38 @@ class UserManager :
 
         for i in range (int (duration *3 )):
             current_time +=rng.uniform (0.2 ,0.5 )
+            char =rng .choice ('abcdefghijklmnopqrstuvwxyz ')
+            iki =rng .uniform (150 ,400 )
+            if builder is not None :
+                builder .add_keystroke (current_time ,iki ,'char',char )
+                continue 
             keystroke_data .append ({
             'timestamp':current_time ,
-            'char':rng.choice ('abcdefghijklmnopqrstuvwxyz '),
-            'iki':rng.uniform (150 ,400 ),
+            'char':char ,
+            'iki':iki ,
             'key_code':'char'
             })
 
         for i in range (int (duration *10 )):
             current_time =start_time +(i /(duration *10 ))*duration 
+            x =rng .randint (0 ,1920 )
+            y =rng .randint (0 ,1080 )
+            distance =rng .uniform (10 ,100 )
+            velocity =rng .uniform (100 ,500 )
+            if builder is not None :
+                builder .add_mouse (current_time ,x ,y ,distance ,velocity )
+                continue 
             mouse_data .append ({
             'timestamp':current_time ,
-            'x':rng.randint (0 ,1920 ),
-            'y':rng.randint (0 ,1080 ),
-            'distance':rng.uniform (10 ,100 ),
-            'velocity':rng.uniform (100 ,500 )
+            'x':x ,
+            'y':y ,
+            'distance':distance ,
+            'velocity':velocity 
             })
 
+        if builder is not None :
+            return builder .build (duration =duration )
+
         return {
         'keystroke_data':keystroke_data ,
         'mouse_data':mouse_data ,
@@ -235,39 +369,38 @@ class UserManager :
         if not self .user_exists (username ):
             return False , 0.0, f"❌ User '{username }' does not exist"
 
-        config_file =os .path .join (self .users_dir ,username ,"config.json")
         try:
-            with open(config_file, 'r') as f:
-                config = json.load(f)
-            if 'suspended_until' in config:
-                del config['suspended_until']
-                with open(config_file, 'w') as f:
-                    json.dump(config, f, indent=2)
+            config =self .store .get (username )or {}
+            if 'suspended_until'in config :
+                self .store .update (username ,suspended_until =None )
         except Exception:
             pass
 
-        model_file =os .path .join (self .users_dir ,username ,"model.pkl")
-        if not os .path .exists (model_file ):
+        model =self .load_user_model (username )
+        if model is None :
             return False , 0.0, f"❌ No model found for user '{username }'. Please enroll first."
 
-        model =BehavioralAuthenticationModel ()
-        model .load_model (model_file )
-
         print (f"\n🔓 Authenticating user: {username }")
 
         try :
-            collector =BehavioralDataCollector (duration =session_duration )
+            collector =BehavioralDataCollector (duration =session_duration ,columnar =True )
             auth_data =collector .collect ()
 
-            if not auth_data ['keystroke_data']and not auth_data ['mouse_data']:
+            if len (auth_data )==0 :
                 print (f"⚠️  No input detected, using synthetic data...")
-                auth_data =self ._create_synthetic_data (session_duration, username )
+                auth_data =self ._create_synthetic_data (session_duration ,username ,columnar =True )
         except Exception as e :
             print (f"⚠️  Real-time collection failed ({str(e):.50s}), using synthetic data...")
-            auth_data =self ._create_synthetic_data (session_duration, username )
+            auth_data =self ._create_synthetic_data (session_duration ,username ,columnar =True )
 
         is_authentic ,confidence ,message =model .authenticate (auth_data )
 
+        if is_authentic and AUTHENTICATION ['update_on_success']:
+            try :
+                self .update_user (username ,[auth_data ])
+            except Exception as e :
+                print (f"⚠️  Could not update model for '{username }': {e }")
+
         if session_duration == 1:
             import random
             confidence = random.uniform(85.0, 99.0)
@@ -288,59 +421,225 @@ class UserManager :
             print (f"🚨 Robot behavior detected! Suspending {username} for 1 day.")
             suspend_time = datetime.datetime.now() + datetime.timedelta(days=1)
             try:
-                with open(config_file, 'r') as f:
-                    config = json.load(f)
-                config['suspended_until'] = suspend_time.isoformat()
-                with open(config_file, 'w') as f:
-                    json.dump(config, f, indent=2)
+                self .store .update (username ,suspended_until =suspend_time .isoformat ())
                 message = f"🚨 ROBOT DETECTED! Account suspended for 1 day until {suspend_time.strftime('%Y-%m-%d %H:%M:%S')}"
             except Exception as e:
                 print(f"Error saving suspension state: {e}")
 
         return is_authentic ,confidence, message 
 
+    def update_user (self ,username :str ,new_samples :List [Union [Dict ,BehavioralSession ]])->bool :
+        """
+        Fold new behavioral samples into a user's model without retraining it
+        
+        Args:
+            username: Enrolled user to update
+            new_samples: Behavioral data from sessions known to belong to the user
+            
+        Returns:
+            True if the model was updated and saved
+        """
+        path =self ._model_path (username )
+        if not os .path .exists (path ):
+            print (f"❌ No model found for user '{username }'")
+            return False 
+
+        # Update a private copy so requests holding the cached model are unaffected
+        model =self ._load_model_file (path )
+        if not model .update (new_samples ):
+            return False 
+
+        self ._save_user_model (username ,model )
+        self ._update_population (username ,model .enrollment_data )
+        return True 
+
+    def _save_user_model (self ,username :str ,model :BehavioralAuthenticationModel ):
+        """Write the user's model artifact and drop a superseded legacy pickle"""
+        user_path =self .store .user_path (username )
+        os .makedirs (user_path ,exist_ok =True )
+        model .save_model (os .path .join (user_path ,USER_MANAGEMENT ['model_filename']))
+        legacy_file =os .path .join (user_path ,USER_MANAGEMENT ['legacy_model_filename'])
+        if os .path .exists (legacy_file ):
+            os .remove (legacy_file )
+
+    def _model_path (self ,username :str )->str :
+        """Path of the user's model artifact, or of a not yet migrated legacy pickle"""
+        user_path =self .store .user_path (username )
+        model_file =os .path .join (user_path ,USER_MANAGEMENT ['model_filename'])
+        legacy_file =os .path .join (user_path ,USER_MANAGEMENT ['legacy_model_filename'])
+        if not os .path .exists (model_file )and os .path .exists (legacy_file ):
+            return legacy_file 
+        return model_file 
+
+    @staticmethod 
+    def _load_model_file (path :str )->BehavioralAuthenticationModel :
+        model =BehavioralAuthenticationModel ()
+        model .load_model (path )
+        return model 
+
+    def load_user_model (self ,username :str )->Optional [BehavioralAuthenticationModel ]:
+        """
+        Get the user's trained model, or None if the user is not enrolled
+        
+        With MODEL_TRAINING['population_model'] enabled, users in the
+        population model are scored against their profile in it; everyone
+        else comes from the per-user model cache.
+        """
+        if MODEL_TRAINING ['population_model']:
+            population =self .population_model 
+            if population is not None and username in population :
+                return population .user_model (username )
+        return self .model_registry .get (username )
+
+    @property 
+    def population_model (self )->Optional [PopulationModel ]:
+        """Shared population model, reloaded when its file changes; None if not built"""
+        path =population_model_path (self .users_dir )
+        signature =ModelRegistry ._signature (path )
+        if signature !=self ._population_signature :
+            self ._population =PopulationModel .load (path )if signature is not None else None 
+            self ._population_signature =signature 
+        return self ._population 
+
+    def _update_population (self ,username :str ,features )->None :
+        """
+        Replace (features given) or drop a user's profile in the population file
+        
+        The file is re-read, changed and written under its lock, so changes
+        from other processes (web enrollment trains in a worker process) are
+        kept, and every process picks up the result through the file
+        signature. Without a population file there is nothing to do.
+        """
+        path =population_model_path (self .users_dir )
+        if not os .path .exists (path ):
+            return 
+        with file_lock (path ):
+            if not os .path .exists (path ):
+                return 
+            population =PopulationModel .load (path )
+            if features is None :
+                if not population .remove_user (username ):
+                    return 
+            else :
+                population .add_user (username ,features )
+            population .save (path )
+        self ._population =population 
+        self ._population_signature =ModelRegistry ._signature (path )
+
+    def build_population_model (self )->PopulationModel :
+        """Train the shared population model from every user's enrollment data"""
+        import population_model 
+        population =population_model .build (self .users_dir )
+        self ._population =population 
+        self ._population_signature =ModelRegistry ._signature (population_model_path (self .users_dir ))
+        print (f"✅ Population model built for {len (population )} users")
+        return population 
+
+    def warm_model_cache (self ,limit :Optional [int ]=None )->int :
+        """
+        Preload the models of the most recently retrained users
+        
+        Args:
+            limit: Number of users to preload (default: PERFORMANCE['model_cache_warm_users'])
+            
+        Returns:
+            Number of models loaded
+        """
+        if limit is None :
+            limit =PERFORMANCE ['model_cache_warm_users']
+        if limit <=0 :
+            return 0 
+        usernames =self .model_registry .most_recent (self .list_users (),limit )
+        return self .model_registry .warm (usernames )
+
     def list_users (self )->List [str ]:
         """List all enrolled users"""
-        users =[d for d in os .listdir (self .users_dir )
-        if os .path .isdir (os .path .join (self .users_dir ,d ))]
-        return users 
+        return self .store .list_users ()
 
     def delete_user (self ,username :str )->bool :
         """Delete user profile"""
-        user_path =os .path .join (self .users_dir ,username )
-        if not os .path .exists (user_path ):
+        if not self .store .delete (username ):
             print (f"❌ User '{username }' does not exist")
             return False 
 
-        import shutil 
-        shutil .rmtree (user_path )
+        self .model_registry .invalidate (username )
+        self ._update_population (username ,None )
         print (f"✅ User '{username }' deleted")
         return True 
 
     def get_user_info (self ,username :str )->Optional [Dict ]:
         """Get user profile information including HWID"""
-        metadata_file =os .path .join (self .users_dir ,username ,"metadata.json")
-        config_file =os .path .join (self .users_dir ,username ,"config.json")
+        user_path ,config =self .store .locate (username )
+        metadata_file =os .path .join (user_path ,USER_MANAGEMENT ['metadata_filename'])
 
         info ={'username':username ,'status':'Active'}
 
-        if os .path .exists (metadata_file ):
-            with open (metadata_file ,'r')as f :
-                info .update (json .load (f ))
+        info .update (self .config_cache .get (metadata_file )or {})
 
-        if os .path .exists (config_file ):
-            with open (config_file ,'r')as f :
-                config =json .load (f )
-                info ['hwid']=config .get ('hwid','unknown')
-                info ['created_at']=config .get ('created_at','unknown')
-                info ['enrolled']=config .get ('enrolled',False )
+        if config is not None :
+            info ['hwid']=config .get ('hwid','unknown')
+            info ['created_at']=config .get ('created_at','unknown')
+            info ['enrolled']=config .get ('enrolled',False )
 
         return info if info else None 
 
     def get_all_users (self )->List [str ]:
         """Get all user usernames"""
-        users =[]
-        for d in os .listdir (self .users_dir ):
-            if os .path .isdir (os .path .join (self .users_dir ,d )):
-                users .append (d )
-        return sorted (users )
+        return self .store .list_users ()
+
+    def page_users (self ,after :Optional [str ]=None ,limit :int =100 ,enrolled :Optional [bool ]=None )->List [Dict ]:
+        """
+        One page of users sorted by username, without scanning the users directory
+        
+        Args:
+            after: Last username of the previous page (None for the first page)
+            limit: Maximum number of users
+            enrolled: Only users with this enrolled flag
+            
+        Returns:
+            {'username', 'enrolled'} dictionaries
+        """
+        return self .store .page_users (after ,limit ,enrolled )
+
+    def count_users (self )->int :
+        return self .store .count_users ()
+
+    def user_context (self ,username :str )->UserContext :
+        """
+        Load a user's record and device ban once for a request
+        
+        Example:
+            with user_manager.user_context(username) as user:
+                if user.exists and user.verify_password(password):
+                    user.set(suspended_until=None)
+        """
+        return UserContext (self ,username )
+
+    def get_user_record (self ,username :str )->Optional [Dict ]:
+        """Stored user record (hwid, enrollment and suspension fields), or None"""
+        return self .store .get (username )
+
+    def update_user_record (self ,username :str ,**fields )->bool :
+        """
+        Set fields of a user's record in one write
+        
+        Args:
+            username: User to update
+            **fields: Fields to set; None removes the field (e.g. suspended_until=None)
+            
+        Returns:
+            True if the user exists
+        """
+        return self .store .update (username ,**fields )
+
+    def get_hwid_ban (self ,hwid :str )->Optional [str ]:
+        """ISO timestamp a device HWID is banned until, or None"""
+        return self .store .get_hwid_ban (hwid )
+
+    def ban_hwid (self ,hwid :str ,until :str ):
+        """Ban a device HWID until the given ISO timestamp"""
+        self .store .ban_hwid (hwid ,until )
+
+    def unban_hwid (self ,hwid :str )->bool :
+        """Lift a device HWID ban"""
+        return self .store .unban_hwid (hwid )
@@ -0,0 +1,606 @@
+"""
+User Store - Storage backends for user records and HWID bans
+
+A user record is the dictionary that used to live in users/<name>/config.json:
+username, hwid, created_at, enrolled, password hash fields and an optional
+suspended_until. Fields set to None are removed. Model artifacts stay files
+under users/<name>/, where they can be memory-mapped; user_path() says where.
+
+User directories are laid out per USER_MANAGEMENT['user_layout']: 'flat'
+keeps users/<name>/, 'sharded' keeps users/ab/cd/<name>/ where ab and cd
+are the first hex digits of sha1(name), so no directory grows past a few
+entries. user_path() finds a user in either layout, which lets
+migrate_user_layout.py move directories while the app is running.
+
+Two backends implement the UserStore interface:
+
+    FileSystemUserStore  one config.json per user directory plus
+                         banned_hwids.json, written atomically under
+                         per-file locks; fine for small installs
+    SQLiteUserStore      one indexed row per user and per banned HWID in a
+                         WAL-mode database, so logins read without blocking
+                         writers and batched writes share one transaction
+
+USER_MANAGEMENT['user_store'] picks the backend. Existing users/ trees are
+copied into SQLite with:
+
+    python migrate_user_store.py [--users-dir users]
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from atomic_json import WriteBehindJson, file_lock, read_json, update_json, write_json
+from config_cache import JsonFileCache
+from user_index import UserIndex
+from config import USER_MANAGEMENT
+
+CONFIG_FILENAME = 'config.json'
+BANNED_HWIDS_FILENAME = 'banned_hwids.json'
+
+FILESYSTEM = 'filesystem'
+SQLITE = 'sqlite'
+
+FLAT = 'flat'
+SHARDED = 'sharded'
+
+# Record fields with their own SQLite column; anything else goes into the extra JSON column
+COLUMNS = ('username', 'hwid', 'created_at', 'enrolled', 'password_hash', 'password_salt',
+           'password_iterations', 'suspended_until')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    hwid TEXT,
+    created_at TEXT,
+    enrolled INTEGER NOT NULL DEFAULT 0,
+    password_hash TEXT,
+    password_salt TEXT,
+    password_iterations INTEGER,
+    suspended_until TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS users_hwid ON users (hwid);
+CREATE INDEX IF NOT EXISTS users_suspended ON users (suspended_until) WHERE suspended_until IS NOT NULL;
+CREATE TABLE IF NOT EXISTS hwid_bans (
+    hwid TEXT PRIMARY KEY,
+    suspended_until TEXT NOT NULL
+);
+"""
+
+
+def is_shard_name(name: str) -> bool:
+    return len(name) == 2 and all(c in '0123456789abcdef' for c in name)
+
+
+def _is_shard_dir(path: str) -> bool:
+    """A shard directory holds only directories; a user directory holds files"""
+    with os.scandir(path) as entries:
+        return not any(entry.is_file() for entry in entries)
+
+
+def layout_path(users_dir: str, username: str, layout: str) -> str:
+    """Where a user's directory goes in the given layout"""
+    if layout == FLAT:
+        return os.path.join(users_dir, username)
+    if layout == SHARDED:
+        digest = hashlib.sha1(username.encode('utf-8')).hexdigest()
+        return os.path.join(users_dir, digest[:2], digest[2:4], username)
+    raise ValueError(f"Unknown user layout {layout!r}; choose {FLAT!r} or {SHARDED!r}")
+
+
+def iter_user_dirs(users_dir: str) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (username, directory) for every user, in either layout
+
+    Directories are streamed with os.scandir, so a tree that is partly
+    flat and partly sharded (mid-migration) is listed completely.
+    """
+    with os.scandir(users_dir) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            if not (is_shard_name(entry.name) and _is_shard_dir(entry.path)):
+                yield entry.name, entry.path
+                continue
+            with os.scandir(entry.path) as shards:
+                for shard in shards:
+                    if not (shard.is_dir() and is_shard_name(shard.name)):
+                        continue
+                    with os.scandir(shard.path) as users:
+                        for user in users:
+                            if user.is_dir():
+                                yield user.name, user.path
+
+
+class UserStore(ABC):
+    """
+    Interface of a user record backend.
+
+    Every method takes and returns plain dictionaries, so callers do not
+    depend on the backend. Writes inside a batch() block are applied
+    together.
+    """
+
+    def __init__(self, users_dir: str, layout: Optional[str] = None):
+        self.users_dir = users_dir
+        self.layout = layout or USER_MANAGEMENT['user_layout']
+        if self.layout not in (FLAT, SHARDED):
+            raise ValueError(f"Unknown user layout {self.layout!r}; choose {FLAT!r} or {SHARDED!r}")
+        self._other_layout = FLAT if self.layout == SHARDED else SHARDED
+        os.makedirs(users_dir, exist_ok=True)
+
+    def _find(self, username: str, layout: str) -> Optional[str]:
+        path = layout_path(self.users_dir, username, layout)
+        if not os.path.isdir(path):
+            return None
+        if layout == FLAT and is_shard_name(username) and _is_shard_dir(path):
+            # users/ab/ is a shard directory, not user 'ab'
+            return None
+        return path
+
+    def user_path(self, username: str) -> str:
+        """
+        Directory holding the user's model artifacts
+
+        The configured layout's path, unless the user only exists in the
+        other layout (not migrated yet, or migrated ahead of a config change).
+        """
+        return (self._find(username, self.layout) or self._find(username, self._other_layout)
+                or layout_path(self.users_dir, username, self.layout))
+
+    def locate(self, username: str) -> Tuple[str, Optional[Dict]]:
+        """The user's directory and record, for callers that need both"""
+        return self.user_path(username), self.get(username)
+
+    @abstractmethod
+    def exists(self, username: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, username: str) -> Optional[Dict]:
+        """The user's record, or None if there is no such user"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def create(self, record: Dict) -> bool:
+        """Insert a new record; False if the username is taken"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, username: str, **fields) -> bool:
+        """Set fields of an existing record (None removes a field); False if there is no such user"""
+        raise NotImplementedError
+
+    def apply(self, username: str, record: Dict, changes: Dict) -> bool:
+        """
+        Persist changes already applied to a loaded copy of the record
+
+        Only the changed fields are written, on top of the stored record, so
+        changes made by others since record was loaded are kept.
+        """
+        return self.update(username, **changes)
+
+    def put_many(self, records: Iterable[Dict]) -> int:
+        """Insert or replace many records at once; returns the number written"""
+        with self.batch():
+            count = 0
+            for record in records:
+                self._put(record)
+                count += 1
+        return count
+
+    @abstractmethod
+    def delete(self, username: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_users(self) -> List[str]:
+        """All usernames, sorted"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def page_users(self, after: Optional[str] = None, limit: int = 100,
+                   enrolled: Optional[bool] = None) -> List[Dict]:
+        """
+        One page of users sorted by username
+
+        Args:
+            after: Last username of the previous page (None for the first page)
+            limit: Maximum number of users returned
+            enrolled: Only users with this enrolled flag
+
+        Returns:
+            {'username', 'enrolled'} dictionaries
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def count_users(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_hwid_ban(self, hwid: str) -> Optional[str]:
+        """ISO timestamp the HWID is banned until, or None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def ban_hwid(self, hwid: str, until: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def unban_hwid(self, hwid: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def hwid_bans(self) -> Dict[str, str]:
+        """Every banned HWID with the ISO timestamp it is banned until"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear_hwid_bans(self) -> int:
+        raise NotImplementedError
+
+    def batch(self):
+        """Context manager grouping writes; a no-op for backends without transactions"""
+        return nullcontext()
+
+    def close(self) -> None:
+        pass
+
+    @abstractmethod
+    def _put(self, record: Dict) -> None:
+        raise NotImplementedError
+
+
+class FileSystemUserStore(UserStore):
+    """
+    users/<name>/config.json per user and users/banned_hwids.json, as before.
+
+    Every write is an atomic replace, and updates are locked
+    read-modify-writes (atomic_json), so concurrent logins, web workers and
+    admin scripts no longer overwrite each other's changes. HWID ban changes
+    are written through by default; a positive ban_write_delay coalesces
+    them for that many seconds into one write of banned_hwids.json, and
+    reads in this process see them immediately.
+
+    With a JsonFileCache, reads of unchanged files cost one os.stat and
+    this store's own writes go straight into the cache.
+
+    Listing and paging read a UserIndex (users/users.idx) that every
+    create, delete and enrolled change updates, instead of scanning the
+    users directory. A missing index is built by one scan on first use.
+    """
+
+    def __init__(self, users_dir: str, cache: Optional[JsonFileCache] = None,
+                 ban_write_delay: Optional[float] = None, layout: Optional[str] = None):
+        super().__init__(users_dir, layout)
+        self.cache = cache
+        if ban_write_delay is None:
+            ban_write_delay = USER_MANAGEMENT['ban_write_delay']
+        self._bans = WriteBehindJson(self._bans_file(), ban_write_delay, cache)
+        self._user_index = UserIndex(os.path.join(users_dir, USER_MANAGEMENT['user_index_filename']))
+
+    @property
+    def index(self) -> UserIndex:
+        if not self._user_index.exists():
+            self.rebuild_index()
+        return self._user_index
+
+    def rebuild_index(self) -> int:
+        """Index every user directory on disk; returns the number of users"""
+        def entries():
+            for username, path in iter_user_dirs(self.users_dir):
+                record = self._read_json(os.path.join(path, CONFIG_FILENAME)) or {}
+                yield username, record.get('enrolled', False)
+
+        return self._user_index.rebuild(entries())
+
+    def _read_json(self, path: str):
+        return read_json(path, None, self.cache)
+
+    def _write_json(self, path: str, data) -> None:
+        with file_lock(path):
+            write_json(path, data, self.cache)
+
+    def _config_file(self, username: str) -> str:
+        return os.path.join(self.user_path(username), CONFIG_FILENAME)
+
+    def _bans_file(self) -> str:
+        return os.path.join(self.users_dir, BANNED_HWIDS_FILENAME)
+
+    def exists(self, username: str) -> bool:
+        return os.path.exists(self.user_path(username))
+
+    def get(self, username: str) -> Optional[Dict]:
+        return self.locate(username)[1]
+
+    def locate(self, username: str) -> Tuple[str, Optional[Dict]]:
+        # A config.json in the configured layout's directory settles where the
+        # user lives, so the common case costs the one stat the cache makes
+        user_path = layout_path(self.users_dir, username, self.layout)
+        record = self._read_json(os.path.join(user_path, CONFIG_FILENAME))
+        if record is not None:
+            return user_path, record
+        user_path = self.user_path(username)
+        record = self._read_json(os.path.join(user_path, CONFIG_FILENAME))
+        if record is None and os.path.exists(user_path):
+            record = {'username': username}
+        return user_path, record
+
+    def create(self, record: Dict) -> bool:
+        user_path = self.user_path(record['username'])
+        try:
+            os.makedirs(user_path)
+        except FileExistsError:
+            return False
+        self._put(record)
+        return True
+
+    def _put(self, record: Dict) -> None:
+        os.makedirs(self.user_path(record['username']), exist_ok=True)
+        self._write_json(self._config_file(record['username']),
+                         {k: v for k, v in record.items() if v is not None})
+        self.index.add(record['username'], record.get('enrolled', False))
+
+    def update(self, username: str, **fields) -> bool:
+        def mutate(record):
+            if record is None:
+                if not self.exists(username):
+                    return None
+                record = {'username': username}
+            record.update(fields)
+            return {k: v for k, v in record.items() if v is not None}
+
+        for attempt in range(2):
+            # file_lock cannot create its lock file without the user's directory
+            if not self.exists(username):
+                return False
+            try:
+                updated = update_json(self._config_file(username), mutate, None, self.cache) is not None
+                break
+            except FileNotFoundError:
+                # migrate_user_layout.py moved the directory mid-update, or the
+                # user was deleted meanwhile; look it up again
+                if attempt:
+                    if not self.exists(username):
+                        return False
+                    raise
+        if updated and 'enrolled' in fields:
+            self.index.add(username, bool(fields['enrolled']))
+        return updated
+
+    def delete(self, username: str) -> bool:
+        user_path = self.user_path(username)
+        if not os.path.exists(user_path):
+            return False
+        import shutil
+        shutil.rmtree(user_path)
+        if self.cache is not None:
+            self.cache.invalidate_prefix(user_path + os.sep)
+        self.index.remove(username)
+        return True
+
+    def list_users(self) -> List[str]:
+        return self.index.names()
+
+    def page_users(self, after: Optional[str] = None, limit: int = 100,
+                   enrolled: Optional[bool] = None) -> List[Dict]:
+        return [{'username': username, 'enrolled': flag}
+                for username, flag in self.index.page(after, limit, enrolled)]
+
+    def count_users(self) -> int:
+        return len(self.index)
+
+    def hwid_bans(self) -> Dict[str, str]:
+        return self._bans.items()
+
+    def get_hwid_ban(self, hwid: str) -> Optional[str]:
+        return self._bans.get(hwid)
+
+    def ban_hwid(self, hwid: str, until: str) -> None:
+        self._bans.set(hwid, until)
+
+    def ban_hwids(self, bans: Dict[str, str]) -> None:
+        for hwid, until in bans.items():
+            self._bans.set(hwid, until)
+
+    def unban_hwid(self, hwid: str) -> bool:
+        if self._bans.get(hwid) is None:
+            return False
+        self._bans.delete(hwid)
+        return True
+
+    def clear_hwid_bans(self) -> int:
+        count = len(self.hwid_bans())
+        self._bans.replace({})
+        return count
+
+    def close(self) -> None:
+        self._bans.close()
+
+
+class SQLiteUserStore(UserStore):
+    """
+    User rows and HWID bans in a WAL-mode SQLite database.
+
+    Each thread gets its own connection. Readers see the last committed
+    state and never wait for a writer. Every write is a transaction;
+    writes inside batch() share a single one.
+    """
+
+    def __init__(self, users_dir: str, database: Optional[str] = None, layout: Optional[str] = None):
+        super().__init__(users_dir, layout)
+        self.database = database or os.path.join(users_dir, USER_MANAGEMENT['user_database_filename'])
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.database, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        if self._local.depth:
+            yield conn
+            return
+        self._local.depth += 1
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._local.depth -= 1
+
+    def batch(self):
+        return self._transaction()
+
+    @staticmethod
+    def _to_row(record: Dict) -> Tuple:
+        extra = {k: v for k, v in record.items() if k not in COLUMNS and v is not None}
+        values = [record.get(column) for column in COLUMNS]
+        values[COLUMNS.index('enrolled')] = int(bool(record.get('enrolled', False)))
+        return tuple(values) + (json.dumps(extra) if extra else None,)
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> Dict:
+        record = {column: row[column] for column in COLUMNS if row[column] is not None}
+        record['enrolled'] = bool(row['enrolled'])
+        if row['extra']:
+            record.update(json.loads(row['extra']))
+        return record
+
+    def exists(self, username: str) -> bool:
+        return self._connect().execute(
+            'SELECT 1 FROM users WHERE username = ?', (username,)).fetchone() is not None
+
+    def get(self, username: str) -> Optional[Dict]:
+        row = self._connect().execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+        return self._from_row(row) if row is not None else None
+
+    def create(self, record: Dict) -> bool:
+        try:
+            with self._transaction() as conn:
+                conn.execute(f"INSERT INTO users ({', '.join(COLUMNS)}, extra) "
+                             f"VALUES ({', '.join('?' * (len(COLUMNS) + 1))})", self._to_row(record))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def _put(self, record: Dict) -> None:
+        with self._transaction() as conn:
+            conn.execute(f"INSERT OR REPLACE INTO users ({', '.join(COLUMNS)}, extra) "
+                         f"VALUES ({', '.join('?' * (len(COLUMNS) + 1))})", self._to_row(record))
+
+    def put_many(self, records: Iterable[Dict]) -> int:
+        rows = [self._to_row(record) for record in records]
+        with self._transaction() as conn:
+            conn.executemany(f"INSERT OR REPLACE INTO users ({', '.join(COLUMNS)}, extra) "
+                             f"VALUES ({', '.join('?' * (len(COLUMNS) + 1))})", rows)
+        return len(rows)
+
+    def update(self, username: str, **fields) -> bool:
+        if not fields:
+            return self.exists(username)
+        with self._transaction() as conn:
+            if any(name not in COLUMNS for name in fields):
+                # Fields outside the fixed columns live in the extra JSON; rewrite the row
+                row = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+                if row is None:
+                    return False
+                record = self._from_row(row)
+                record.update(fields)
+                self._put(record)
+                return True
+            if 'enrolled' in fields:
+                fields['enrolled'] = int(bool(fields['enrolled']))
+            assignments = ', '.join(f"{name} = ?" for name in fields)
+            cursor = conn.execute(f"UPDATE users SET {assignments} WHERE username = ?",
+                                  tuple(fields.values()) + (username,))
+            return cursor.rowcount > 0
+
+    def delete(self, username: str) -> bool:
+        with self._transaction() as conn:
+            deleted = conn.execute('DELETE FROM users WHERE username = ?', (username,)).rowcount > 0
+        user_path = self.user_path(username)
+        if os.path.exists(user_path):
+            import shutil
+            shutil.rmtree(user_path)
+        return deleted
+
+    def list_users(self) -> List[str]:
+        return [row[0] for row in self._connect().execute('SELECT username FROM users ORDER BY username')]
+
+    def page_users(self, after: Optional[str] = None, limit: int = 100,
+                   enrolled: Optional[bool] = None) -> List[Dict]:
+        query = 'SELECT username, enrolled FROM users WHERE username > ?'
+        params = [after or '']
+        if enrolled is not None:
+            query += ' AND enrolled = ?'
+            params.append(int(enrolled))
+        rows = self._connect().execute(query + ' ORDER BY username LIMIT ?', params + [limit])
+        return [{'username': row[0], 'enrolled': bool(row[1])} for row in rows]
+
+    def count_users(self) -> int:
+        return self._connect().execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    def get_hwid_ban(self, hwid: str) -> Optional[str]:
+        row = self._connect().execute(
+            'SELECT suspended_until FROM hwid_bans WHERE hwid = ?', (hwid,)).fetchone()
+        return row[0] if row is not None else None
+
+    def ban_hwid(self, hwid: str, until: str) -> None:
+        with self._transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO hwid_bans (hwid, suspended_until) VALUES (?, ?)', (hwid, until))
+
+    def ban_hwids(self, bans: Dict[str, str]) -> None:
+        with self._transaction() as conn:
+            conn.executemany('INSERT OR REPLACE INTO hwid_bans (hwid, suspended_until) VALUES (?, ?)',
+                             list(bans.items()))
+
+    def unban_hwid(self, hwid: str) -> bool:
+        with self._transaction() as conn:
+            return conn.execute('DELETE FROM hwid_bans WHERE hwid = ?', (hwid,)).rowcount > 0
+
+    def hwid_bans(self) -> Dict[str, str]:
+        return dict(self._connect().execute('SELECT hwid, suspended_until FROM hwid_bans').fetchall())
+
+    def clear_hwid_bans(self) -> int:
+        with self._transaction() as conn:
+            return conn.execute('DELETE FROM hwid_bans').rowcount
+
+    def close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def create_user_store(users_dir: str, backend: Optional[str] = None,
+                      cache: Optional[JsonFileCache] = None) -> UserStore:
+    """
+    Create the configured user store
+
+    Args:
+        users_dir: Users directory (model artifacts, and the database for SQLite)
+        backend: 'filesystem' or 'sqlite' (default USER_MANAGEMENT['user_store'])
+        cache: Parsed-file cache for the filesystem backend
+    """
+    backend = backend or USER_MANAGEMENT['user_store']
+    if backend == FILESYSTEM:
+        return FileSystemUserStore(users_dir, cache)
+    if backend == SQLITE:
+        return SQLiteUserStore(users_dir)
+    raise ValueError(f"Unknown user store {backend!r}; choose {FILESYSTEM!r} or {SQLITE!r}")
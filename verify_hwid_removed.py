@@ -38,13 +38,11 @@ with open ("user_manager.py","r")as f :
 print ("\n[3] Checking stored user credentials...")
 users_dir ="users"
 if os .path .exists (users_dir ):
-    users =[d for d in os .listdir (users_dir )if os .path .isdir (os .path .join (users_dir ,d ))]
-    for username in users [:3 ]:
-        config_file =os .path .join (users_dir ,username ,"config.json")
-        if os .path .exists (config_file ):
-            with open (config_file ,'r')as f :
-                config =json .load (f )
-
+    from user_store import create_user_store 
+    store =create_user_store (users_dir )
+    for username in store .list_users ()[:3 ]:
+        config =store .get (username )
+        if config is not None :
             has_password ='password_hash'in config 
             has_hwid ='hwid'in config 
 
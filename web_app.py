@@ -2,20 +2,27 @@
 Flask Web Application - Behavioral Authentication System
 """
 
-from flask import Flask ,render_template ,request ,jsonify ,session ,redirect ,url_for
+from flask import Flask ,render_template ,request ,jsonify ,session ,redirect ,url_for ,after_this_request 
 from flask_cors import CORS
 from functools import lru_cache ,wraps 
 from datetime import datetime ,timedelta 
 import json 
 import os 
+import time 
+import threading 
 import subprocess
+from collections import OrderedDict 
 import numpy as np
 from behavioral_model import BehavioralAuthenticationModel
-from feature_extractor import FeatureExtractor
+from feature_extractor import StreamingFeatureAccumulator
+from feature_schema import FEATURE_SCHEMA ,CLIENT_FEATURES 
 from activity_tracker import activity_tracker
 from user_manager import UserManager
+from password_hasher import HashingPoolFull ,PasswordHasher 
 from license_manager import LicenseManager
 from fraud_detection import fraud_detector
+from training_queue import TrainingExecutor ,TrainingQueueFull ,TrainingJobRunning ,enroll_user_job ,fit_features_job ,COMPLETED 
+from config import AUTHENTICATION ,PASSWORD_HASHING ,PERFORMANCE 
 
 app =Flask (__name__ )
 
@@ -54,11 +61,26 @@ USERS_DB ={}
 USERS_SESSIONS ={}
 BEHAVIORAL_MODELS ={}
 BEHAVIORAL_DATA_BUFFER ={}
+# username -> [last used, accumulator, lock], least recently used first
+BEHAVIORAL_STREAMS =OrderedDict ()
+BEHAVIORAL_STREAMS_LOCK =threading .Lock ()
 
-user_manager =UserManager (users_dir ="users")
+# PBKDF2 runs in worker processes so a burst of logins cannot tie up every request thread
+password_hasher =PasswordHasher (
+max_workers =PASSWORD_HASHING ['workers'],
+max_pending =PASSWORD_HASHING ['max_pending']
+)
+
+user_manager =UserManager (users_dir ="users",hasher =password_hasher )
+user_manager .warm_model_cache ()
 
 license_manager =LicenseManager (licenses_dir ="licenses")
 
+training_executor =TrainingExecutor (
+max_workers =PERFORMANCE ['training_workers'],
+max_pending =PERFORMANCE ['training_queue_size']
+)
+
 socketio .init_app (app )
 
 @app .after_request 
@@ -143,39 +165,32 @@ def api_login ():
                 'fraud_evaluation':fraud_evaluation 
             }),403 
 
+        # The user's record and device ban are read once here; every stage below
+        # works on this copy and the changes are written together after the response
+        user =user_manager .user_context (username )
+
+        @after_this_request 
+        def flush_user_context (response ):
+            try :
+                user .flush ()
+            except Exception as e :
+                print (f"Error saving user state for {username }: {e }")
+            return response 
+
         try:
-            import json, os
-            cfile = os.path.join(user_manager.users_dir, username, "config.json")
-            user_config = {}
-            if os.path.exists(cfile):
-                with open(cfile, 'r') as f:
-                    user_config = json.load(f)
-                    
-            user_hwid = user_config.get('hwid')
-            
+            if user.hwid_banned_until:
+                suspended_until = datetime.fromisoformat(user.hwid_banned_until)
+                if datetime.now() < suspended_until:
+                    return jsonify({'success': False, 'error': f"🚨 Device HWID suspended until {suspended_until.strftime('%I:%M %p')}. Hardware Ban Active."}), 403
+                else:
+                    user.unban_hwid()
 
-            banned_hwids_file = os.path.join(user_manager.users_dir, 'banned_hwids.json')
-            if os.path.exists(banned_hwids_file) and user_hwid:
-                with open(banned_hwids_file, 'r') as f:
-                    banned_hwids = json.load(f)
-                    
-                if user_hwid in banned_hwids:
-                    suspended_until = datetime.fromisoformat(banned_hwids[user_hwid])
-                    if datetime.now() < suspended_until:
-                        return jsonify({'success': False, 'error': f"🚨 Device HWID suspended until {suspended_until.strftime('%I:%M %p')}. Hardware Ban Active."}), 403
-                    else:
-                        del banned_hwids[user_hwid]
-                        with open(banned_hwids_file, 'w') as f:
-                            json.dump(banned_hwids, f, indent=2)
-
-            if 'suspended_until' in user_config:
-                suspended_until = datetime.fromisoformat(user_config['suspended_until'])
+            if user.suspended_until:
+                suspended_until = datetime.fromisoformat(user.suspended_until)
                 if datetime.now() < suspended_until:
                     return jsonify({'success': False, 'error': f"🚨 Account suspended until {suspended_until.strftime('%I:%M %p')} due to suspicious robotic behavior."}), 403
                 else:
-                    del user_config['suspended_until']
-                    with open(cfile, 'w') as f:
-                        json.dump(user_config, f, indent=2)
+                    user.set(suspended_until=None)
 
         except Exception as e:
             print(f"Error checking suspensions: {e}")
@@ -194,9 +209,10 @@ def api_login ():
                 activity_tracker .track_login_attempt (username ,False ,0.6 )
                 return jsonify ({'success':False ,'error':'User not authorized for this license'}),401 
 
-            if not user_manager .user_exists (username ):
+            if not user .exists :
                 try :
                     user_manager .create_user (username ,password =None )
+                    user .reload ()
                 except :
                     pass 
 
@@ -208,11 +224,11 @@ def api_login ():
             if not password :
                 return jsonify ({'success':False ,'error':'password or license key required'}),400 
 
-            if not user_manager .user_exists (username ):
+            if not user .exists :
                 activity_tracker .track_login_attempt (username ,False ,0.9 )
                 return jsonify ({'success':False ,'error':'user not found'}),401 
 
-            if not user_manager .verify_password (username ,password ):
+            if not user .verify_password (password ):
                 activity_tracker .track_login_attempt (username ,False ,0.7 )
                 return jsonify ({'success':False ,'error':'incorrect password'}),401 
 
@@ -228,29 +244,34 @@ def api_login ():
 
             
 
-        if user_manager .user_exists (username )and username in BEHAVIORAL_MODELS:
+        if user .exists and username in BEHAVIORAL_MODELS:
             try :
 
-                features ={
-                'iki_mean':behavioral_data .get ('iki_mean',0 ),
-                'iki_std':behavioral_data .get ('iki_std',0 ),
-                'keystroke_rate':behavioral_data .get ('keystroke_rate',0 ),
-                'mouse_velocity':behavioral_data .get ('mouse_velocity',0 ),
-                'click_rate':behavioral_data .get ('click_rate',0 ),
-                }
-
                 model =BEHAVIORAL_MODELS [username ]
-                feature_vector =np .array ([list (features .values ())])
-
-                anomaly_prediction =model .model .predict (feature_vector )
-                behavioral_score =float (anomaly_prediction [0 ])
-                behavioral_score =(behavioral_score +1 )/2 
-
-                behavioral_analysis ={
-                'anomaly_score':behavioral_score ,
-                'features_analyzed':list (features .keys ()),
-                'result':'authentic'if behavioral_score >0.3 else 'suspicious'
-                }
+                defaulted =FEATURE_SCHEMA .missing (behavioral_data ,model .feature_names )
+
+                if defaulted :
+                    # Scoring would compare made-up zeros against the profile; leave the score neutral
+                    behavioral_analysis ={
+                    'feature_schema':FEATURE_SCHEMA .id ,
+                    'features':model .feature_names ,
+                    'defaulted_features':defaulted ,
+                    'result':'incomplete'
+                    }
+                else :
+                    feature_vector =FEATURE_SCHEMA .from_client (behavioral_data )[None ,:]
+
+                    inliers ,confidences ,scores =model .authenticate_batch (feature_vector )
+                    behavioral_score =1.0 if inliers [0 ]else 0.0 
+
+                    behavioral_analysis ={
+                    'anomaly_score':float (scores [0 ]),
+                    'confidence':float (confidences [0 ]),
+                    'feature_schema':FEATURE_SCHEMA .id ,
+                    'features':model .feature_names ,
+                    'defaulted_features':[],
+                    'result':'authentic'if behavioral_score >0.3 else 'suspicious'
+                    }
                 
                 if behavioral_score < 0.3:
                     is_robot = True
@@ -261,46 +282,12 @@ def api_login ():
                 
 
         if is_robot:
-            import json
-            import os
-            
             suspend_time = datetime.now() + timedelta(days=1)
             
 
-            user_hwid = "Unknown"
-            try:
-                cfile = os.path.join(user_manager.users_dir, username, "config.json")
-                if os.path.exists(cfile):
-                    with open(cfile, 'r') as f:
-                        user_hwid = json.load(f).get('hwid', 'Unknown')
-            except Exception:
-                pass
-            
-
-            try:
-                config_file = os.path.join(user_manager.users_dir, username, "config.json")
-                with open(config_file, 'r') as f:
-                    config = json.load(f)
-                config['suspended_until'] = suspend_time.isoformat()
-                with open(config_file, 'w') as f:
-                    json.dump(config, f, indent=2)
-            except Exception:
-                pass
-                
-
-            try:
-                if user_hwid and user_hwid != "Unknown":
-                    banned_hwids_file = os.path.join(user_manager.users_dir, 'banned_hwids.json')
-                    banned_hwids = {}
-                    if os.path.exists(banned_hwids_file):
-                        with open(banned_hwids_file, 'r') as f:
-                            banned_hwids = json.load(f)
-                            
-                    banned_hwids[user_hwid] = suspend_time.isoformat()
-                    with open(banned_hwids_file, 'w') as f:
-                        json.dump(banned_hwids, f, indent=2)
-            except Exception:
-                pass
+            user_hwid = user.hwid or "Unknown"
+            user.set(suspended_until=suspend_time.isoformat())
+            user.ban_hwid(suspend_time.isoformat())
 
             activity_tracker.track_activity(username, 'fraud_blocked', {
                 'ip': request.remote_addr,
@@ -335,6 +322,8 @@ def api_login ():
         'auth_method':auth_method ,
         'behavioral_analysis':behavioral_analysis 
         }),200 
+    except HashingPoolFull as e :
+        return jsonify ({'success':False ,'error':f'server busy, try again shortly ({e })'}),503 ,{'Retry-After':'1'}
     except Exception as e :
         return jsonify ({'success':False ,'error':str (e )}),400 
 
@@ -368,6 +357,8 @@ def api_register ():
 
         try :
             user_manager .create_user (username ,password )
+        except HashingPoolFull as e :
+            return jsonify ({'success':False ,'error':f'server busy, try again shortly ({e })'}),503 ,{'Retry-After':'1'}
         except Exception as e :
             return jsonify ({'success':False ,'error':f'failed to create user: {str (e )}'}),500 
 
@@ -415,6 +406,11 @@ def collect_behavioral_data ():
         data =request .json or {}
         behavioral_data =data .get ('data',{})
 
+        # Enrollment trains on CLIENT_FEATURES; a sample without all of them would train on zeros
+        missing =FEATURE_SCHEMA .missing (behavioral_data ,CLIENT_FEATURES )
+        if missing :
+            return jsonify ({'success':False ,'error':f"behavioral sample is missing features: {', '.join (missing )}",'missing_features':missing }),400 
+
         if username not in BEHAVIORAL_DATA_BUFFER :
             BEHAVIORAL_DATA_BUFFER [username ]=[]
 
@@ -431,6 +427,108 @@ def collect_behavioral_data ():
     except Exception as e :
         return jsonify ({'success':False ,'error':str (e )}),400 
 
+def live_stream (username :str ,reset :bool =False ):
+    """
+    The user's running feature accumulator and the lock guarding it
+
+    Streams idle for longer than live_stream_ttl are dropped, and past
+    max_live_streams the least recently used ones go first.
+    """
+    now =time .monotonic ()
+    with BEHAVIORAL_STREAMS_LOCK :
+        entry =BEHAVIORAL_STREAMS .get (username )
+        if entry is None or reset :
+            entry =BEHAVIORAL_STREAMS [username ]=[now ,StreamingFeatureAccumulator (),threading .Lock ()]
+        entry [0 ]=now 
+        BEHAVIORAL_STREAMS .move_to_end (username )
+        cutoff =now -PERFORMANCE ['live_stream_ttl']
+        while BEHAVIORAL_STREAMS :
+            oldest =next (iter (BEHAVIORAL_STREAMS .values ()))
+            if len (BEHAVIORAL_STREAMS )<=PERFORMANCE ['max_live_streams']and oldest [0 ]>=cutoff :
+                break 
+            BEHAVIORAL_STREAMS .popitem (last =False )
+        return entry [1 ],entry [2 ]
+
+@app .route ('/api/behavioral/stream',methods =['POST'])
+def stream_behavioral_events ():
+    """Fold a chunk of live events into the user's running features and score them"""
+    try :
+        username =session .get ('user')
+        if not username :
+            return jsonify ({'success':False ,'error':'not authenticated'}),401 
+
+        data =request .json or {}
+
+        accumulator ,lock =live_stream (username ,bool (data .get ('reset')))
+        with lock :
+            accumulator .update ({
+            'keystroke_data':data .get ('keystroke_data',[]),
+            'mouse_data':data .get ('mouse_data',[])
+            })
+            features =accumulator .features ()
+            events_seen =accumulator .event_count 
+
+        response ={
+        'success':True ,
+        'events_seen':events_seen ,
+        'features':dict (zip (FEATURE_SCHEMA .names ,features .tolist ()))
+        }
+
+        model =user_manager .load_user_model (username )
+        if model is not None :
+            is_authentic ,confidence ,message =model .authenticate_features (features )
+            response ['authenticated']=is_authentic 
+            response ['confidence']=confidence 
+            response ['message']=message 
+
+        return jsonify (response ),200 
+    except Exception as e :
+        return jsonify ({'success':False ,'error':str (e )}),400 
+
+@app .route ('/api/behavioral/score-batch',methods =['POST'])
+def score_behavioral_batch ():
+    """Score many recorded sessions or feature vectors against a user's model"""
+    try :
+        username =session .get ('user')
+        if not username :
+            return jsonify ({'success':False ,'error':'not authenticated'}),401 
+
+        data =request .json or {}
+        if data .get ('username')not in (None ,username ):
+            return jsonify ({'success':False ,'error':'sessions can only be scored against your own model'}),403 
+        threshold =float (data .get ('threshold',AUTHENTICATION ['default_threshold']))
+        sessions =data .get ('sessions')
+        features =data .get ('features')
+
+        if sessions is None and features is None :
+            return jsonify ({'success':False ,'error':'sessions or features required'}),400 
+
+        batch =sessions if sessions is not None else features 
+        if not isinstance (batch ,list )or not batch :
+            return jsonify ({'success':False ,'error':'sessions or features must be a non-empty list'}),400 
+        max_batch =AUTHENTICATION ['max_batch_sessions']
+        if len (batch )>max_batch :
+            return jsonify ({'success':False ,'error':f'at most {max_batch } sessions per call'}),413 
+
+        model =user_manager .load_user_model (username )
+        if model is None :
+            return jsonify ({'success':False ,'error':f'no model found for user {username }'}),404 
+
+        if sessions is None :
+            batch =np .asarray (features ,dtype =np .float64 ).reshape (len (features ),-1 )
+        decisions ,confidences ,scores =model .authenticate_batch (batch ,threshold )
+
+        return jsonify ({
+        'success':True ,
+        'username':username ,
+        'count':len (scores ),
+        'authenticated':decisions .tolist (),
+        'confidence':confidences .tolist (),
+        'anomaly_score':scores .tolist ()
+        }),200 
+    except Exception as e :
+        return jsonify ({'success':False ,'error':str (e )}),400 
+
 @app .route ('/api/behavioral/enroll',methods =['POST'])
 def enroll_behavioral ():
     """Enroll user with behavioral data"""
@@ -446,53 +544,65 @@ def enroll_behavioral ():
 
         try :
 
-            model =BehavioralAuthenticationModel (contamination =0.1 )
+            existing =BEHAVIORAL_MODELS .get (username )
+            if data .get ('incremental',True )and existing is not None and existing .is_trained :
+                since =existing .metadata .get ('updated_at')or existing .metadata .get ('trained_at','')
+                new_entries =[entry for entry in BEHAVIORAL_DATA_BUFFER [username ]if entry ['timestamp']>since ]
+                updated =bool (new_entries )and existing .update (
+                FEATURE_SCHEMA .from_client_batch ([entry ['data']for entry in new_entries ])
+                )
 
-            training_data =[]
-            for entry in BEHAVIORAL_DATA_BUFFER [username ]:
-                bd =entry ['data']
+                activity_tracker .track_activity (username ,'enrollment_updated',{
+                'samples_used':len (new_entries )
+                })
 
-                features =[
-                bd .get ('iki_mean',0 ),
-                bd .get ('iki_std',0 ),
-                bd .get ('keystroke_rate',0 ),
-                bd .get ('mouse_velocity',0 ),
-                bd .get ('mouse_acceleration',0 ),
-                bd .get ('click_rate',0 ),
-                bd .get ('mouse_distance',0 ),
-                bd .get ('total_keystrokes',0 ),
-                ]
-                training_data .append (features )
+                return jsonify ({
+                'success':True ,
+                'message':f'Behavioral model for {username } updated with {len (new_entries )} new samples'if updated else 'No new behavioral samples since last enrollment',
+                'samples_used':len (new_entries ),
+                'status':'updated'if updated else 'unchanged'
+                }),200 
 
-            if training_data :
+            training_data =FEATURE_SCHEMA .from_client_batch ([entry ['data']for entry in BEHAVIORAL_DATA_BUFFER [username ]])
 
-                X =np .array (training_data )
-                model .scaler .fit (X )
-                X_scaled =model .scaler .transform (X )
-                model .model .fit (X_scaled )
-                model .is_trained =True 
+            if len (training_data ):
+                samples_used =len (training_data )
 
-                BEHAVIORAL_MODELS [username ]=model 
+                def on_trained (job ):
+                    success =job .status ==COMPLETED 
+                    if success :
+                        BEHAVIORAL_MODELS [username ]=job .result 
+                        if username in USERS_DB :
+                            USERS_DB [username ]['enrolled']=True 
 
-                USERS_DB [username ]['enrolled']=True 
+                        activity_tracker .track_activity (username ,'enrollment_completed',{
+                        'samples_used':samples_used 
+                        })
 
-                activity_tracker .track_activity (username ,'enrollment_completed',{
-                'samples_used':len (BEHAVIORAL_DATA_BUFFER [username ])
-                })
+                        activity_tracker .store_behavioral_profile (username ,{
+                        'enrolled':True ,
+                        'samples':samples_used ,
+                        'timestamp':datetime .now ().isoformat ()
+                        })
+                    socketio .emit ('enroll_result',{'username':username ,'success':success ,'job_id':job .job_id })
 
-                activity_tracker .store_behavioral_profile (username ,{
-                'enrolled':True ,
-                'samples':len (BEHAVIORAL_DATA_BUFFER [username ]),
-                'timestamp':datetime .now ().isoformat ()
-                })
+                job =training_executor .submit (
+                username ,fit_features_job ,training_data ,0.1 ,CLIENT_FEATURES ,
+                kind ='behavioral_enroll',priority =int (data .get ('priority',10 )),on_complete =on_trained 
+                )
 
                 return jsonify ({
                 'success':True ,
-                'message':f'User {username } enrolled successfully with {len (BEHAVIORAL_DATA_BUFFER [username ])} behavioral samples!',
-                'samples_used':len (BEHAVIORAL_DATA_BUFFER [username ]),
-                'status':'enrolled'
-                }),200 
-
+                'message':f'Enrollment for {username } queued with {samples_used } behavioral samples',
+                'samples_used':samples_used ,
+                'job_id':job .job_id ,
+                'status':job .status 
+                }),202 
+
+        except TrainingQueueFull as e :
+            return jsonify ({'success':False ,'error':str (e )}),503 
+        except TrainingJobRunning as e :
+            return jsonify ({'success':False ,'error':str (e ),'job_id':e .job .job_id }),409 
         except Exception as e :
             return jsonify ({'success':False ,'error':f'enrollment training failed: {str (e )}'}),400 
 
@@ -604,19 +714,45 @@ def api_enroll_user(username):
         if not user_manager.user_exists(username):
             return jsonify({'success': False, 'error': f'User {username} not found'}), 404
 
-        success = user_manager.enroll_user(username, num_sessions=1, session_duration=1)
-        if success:
-            activity_tracker.store_behavioral_profile(username, {
-                'enrolled': True,
-                'timestamp': datetime.now().isoformat()
-            })
-            return jsonify({'success': True, 'message': f'Successfully enrolled {username}'}), 200
-        else:
-            return jsonify({'success': False, 'error': 'Enrollment failed'}), 400
+        def on_enrolled(job):
+            success = job.status == COMPLETED and bool(job.result)
+            if success:
+                activity_tracker.store_behavioral_profile(username, {
+                    'enrolled': True,
+                    'timestamp': datetime.now().isoformat()
+                })
+            socketio.emit('enroll_result', {'username': username, 'success': success, 'job_id': job.job_id})
+
+        data = request.json or {}
+        job = training_executor.submit(
+            username, enroll_user_job, user_manager.users_dir, username, 1, 1,
+            kind='user_enroll', priority=int(data.get('priority', 10)), on_complete=on_enrolled
+        )
+        return jsonify({
+            'success': True,
+            'message': f'Enrollment for {username} queued',
+            'job_id': job.job_id,
+            'status': job.status
+        }), 202
+    except TrainingQueueFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    except TrainingJobRunning as e:
+        return jsonify({'success': False, 'error': str(e), 'job_id': e.job.job_id}), 409
     except Exception as e:
         print(f"[ERROR] Enrollment failed: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/training/jobs/<job_id>', methods=['GET'])
+def training_job_status(job_id):
+    """Status and progress of a queued training job"""
+    if not session.get('user'):
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+
+    status = training_executor.status(job_id)
+    if status is None:
+        return jsonify({'success': False, 'error': 'job not found'}), 404
+    return jsonify({'success': True, 'job': status, 'queue': training_executor.stats()}), 200
+
 @app.route('/api/user/<username>/authenticate', methods=['POST'])
 def api_authenticate_user(username):
     """Authenticate a user using the user_manager model (Optimized for Web GUI)"""
@@ -634,13 +770,7 @@ def api_authenticate_user(username):
         if confidence < 30:
             suspend_until = datetime.now() + timedelta(minutes=1)
             try:
-                cfg_path = os.path.join(user_manager.users_dir, username, 'config.json')
-                if os.path.exists(cfg_path):
-                    with open(cfg_path, 'r') as f:
-                        cfg = json.load(f)
-                    cfg['suspended_until'] = suspend_until.isoformat()
-                    with open(cfg_path, 'w') as f:
-                        json.dump(cfg, f, indent=2)
+                user_manager.update_user_record(username, suspended_until=suspend_until.isoformat())
             except Exception as e:
                 print(f"Error suspending user {username}: {e}")
 
@@ -700,6 +830,26 @@ def api_status ():
     'version':'1.0'
     }),200 
 
+@app .route ('/api/models/cache',methods =['GET'])
+def model_cache_stats ():
+    """Get model and config cache hit/miss/eviction statistics"""
+    if not session .get ('user'):
+        return jsonify ({'success':False ,'error':'not authenticated'}),401 
+
+    return jsonify ({
+    'success':True ,
+    'cache':user_manager .model_registry .stats (),
+    'config_cache':user_manager .config_cache .stats ()
+    }),200 
+
+@app .route ('/api/auth/hashing',methods =['GET'])
+def password_hashing_stats ():
+    """Get password hashing pool usage, rejections and latency"""
+    if not session .get ('user'):
+        return jsonify ({'success':False ,'error':'not authenticated'}),401 
+
+    return jsonify ({'success':True ,'hashing':password_hasher .stats ()}),200 
+
 @app .route ('/api/licenses/generate',methods =['POST'])
 def generate_license ():
     """Generate a new license key"""
@@ -930,14 +1080,7 @@ def verify_hwid (username ):
         if not is_match and len(stored_hwid) == 36 and current_hwid.startswith('S-1-5'):
             print(f"[HWID] Auto-healing legacy UUID format for {username} to real SID")
             try:
-                import json
-                import os
-                user_config_path = os.path.join(user_manager.users_dir, username, 'config.json')
-                with open(user_config_path, 'r') as f:
-                    config = json.load(f)
-                config['hwid'] = current_hwid
-                with open(user_config_path, 'w') as f:
-                    json.dump(config, f, indent=2)
+                user_manager.update_user_record(username, hwid=current_hwid)
                 
                 stored_hwid = current_hwid
                 is_match = True
@@ -1140,10 +1283,21 @@ def handle_live_update ():
 @app .route ('/api/users',methods =['GET'])
 @app .route ('/api/users/list',methods =['GET'])
 def users_list ():
-    """Get list of all registered users"""
+    """
+    Get registered users
+    
+    Query parameters limit and after (the last username of the previous
+    page) return one page in username order; without limit every user is
+    returned.
+    """
     try :
+        limit =request .args .get ('limit',type =int )
+        after =request .args .get ('after')or None 
 
-        all_users =user_manager .get_all_users ()
+        if limit :
+            all_users =[item ['username']for item in user_manager .page_users (after ,limit )]
+        else :
+            all_users =user_manager .get_all_users ()
         all_system_licenses = license_manager.get_all_licenses()
 
         users_data =[]
@@ -1177,11 +1331,15 @@ def users_list ():
                 'license_owner': user_license_owner
                 })
 
-        return jsonify ({
+        result ={
         'success':True ,
         'users':users_data ,
         'total_users':len (users_data )
-        }),200 
+        }
+        if limit :
+            result ['total_users']=user_manager .count_users ()
+            result ['next_after']=all_users [-1 ]if len (all_users )==limit else None 
+        return jsonify (result ),200 
     except Exception as e :
         return jsonify ({'success':False ,'error':str (e )}),400 
 